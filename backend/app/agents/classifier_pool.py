@@ -0,0 +1,81 @@
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from itertools import chain
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+WARMUP_EMAIL = {
+    'subject': 'Pricing for 40 seats',
+    'sender': 'warmup@example.com',
+    'snippet': 'Could we book a demo next week?',
+    'is_relevant': False,
+    'confidence_reason': '',
+    'matched_rule': '',
+}
+
+worker_agent = None
+
+
+def init_worker() -> None:
+    global worker_agent
+    from .email_agent import build_rules_batch_agent
+
+    worker_agent = build_rules_batch_agent()
+    worker_agent.invoke({'emails': [dict(WARMUP_EMAIL)]})
+
+
+def worker_ready(_: int) -> int:
+    return os.getpid()
+
+
+def classify_chunk(emails: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    return worker_agent.invoke({'emails': emails})['emails']
+
+
+class ClassifierPool:
+    def __init__(self, processes: int, chunk_size: int, min_batch: int):
+        self.processes = processes
+        self.chunk_size = chunk_size
+        self.min_batch = min_batch
+        self._executor: ProcessPoolExecutor | None = None
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.processes > 0
+
+    def should_dispatch(self, size: int) -> bool:
+        return self.enabled and size >= max(self.min_batch, 1)
+
+    def executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.processes,
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=init_worker,
+                )
+            return self._executor
+
+    def start(self) -> list[int]:
+        return sorted(set(self.executor().map(worker_ready, range(self.processes))))
+
+    def classify(self, emails: list[dict[str, Any]]) -> list[dict[str, Any]]:
+        chunks = [emails[start:start + self.chunk_size] for start in range(0, len(emails), self.chunk_size)]
+        try:
+            return list(chain.from_iterable(self.executor().map(classify_chunk, chunks)))
+        except BrokenProcessPool:
+            logger.exception('Classifier worker pool broke, restarting it on the next batch')
+            self.stop(wait=False)
+            raise
+
+    def stop(self, wait: bool = True) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait, cancel_futures=True)
@@ -1,6 +1,13 @@
+import re
+from collections import Counter
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
 from typing import TypedDict
 
-from langgraph.graph import END, START, StateGraph
+from ..config import settings
+from ..metrics import CLASSIFICATIONS, stage
+from .classifier_pool import ClassifierPool
+from .llm_classifier import LLMClassifier
 
 
 class EmailState(TypedDict):
@@ -9,34 +16,174 @@ class EmailState(TypedDict):
     snippet: str
     is_relevant: bool
     confidence_reason: str
+    matched_rule: str
+
+
+class EmailBatchState(TypedDict):
+    emails: list[EmailState]
 
 
 KEYWORDS = {'lead', 'pricing', 'quote', 'demo', 'partnership', 'proposal', 'buy'}
 SPAM_HINTS = {'lottery', 'bitcoin', 'winner', 'prince', 'casino'}
 
 
+def compile_rule_pattern(words: set[str]) -> re.Pattern[str]:
+    alternatives = '|'.join(re.escape(word) for word in sorted(words, key=len, reverse=True))
+    return re.compile(rf'\b({alternatives})s?\b')
+
+
+RULE_PATTERN = compile_rule_pattern(KEYWORDS | SPAM_HINTS)
+
+
+def first_spam_hint(hits: list[str]) -> str | None:
+    return next((hit for hit in hits if hit in SPAM_HINTS), None)
+
+
+def spam_hint(subject: str | None, snippet: str | None) -> str | None:
+    return first_spam_hint(RULE_PATTERN.findall(f"{subject or ''} {snippet or ''}".lower()))
+
+
 def classify_email(state: EmailState) -> EmailState:
     text = f"{state['subject']} {state['snippet']}".lower()
-    if any(token in text for token in SPAM_HINTS):
+    hits = RULE_PATTERN.findall(text)
+    spam_hit = first_spam_hint(hits)
+    if spam_hit:
         state['is_relevant'] = False
         state['confidence_reason'] = 'Spam-like keywords detected.'
+        state['matched_rule'] = f'spam:{spam_hit}'
         return state
 
-    if any(token in text for token in KEYWORDS):
+    if hits:
         state['is_relevant'] = True
         state['confidence_reason'] = 'Lead-oriented keywords found.'
+        state['matched_rule'] = f'lead:{hits[0]}'
     else:
         state['is_relevant'] = False
         state['confidence_reason'] = 'No lead signal found.'
+        state['matched_rule'] = ''
     return state
 
 
-def build_agent():
+def classify_email_batch(state: EmailBatchState) -> EmailBatchState:
+    return {'emails': [classify_email(dict(email)) for email in state['emails']]}
+
+
+def needs_llm(email: EmailState) -> bool:
+    return not email['matched_rule']
+
+
+def build_agent(llm: LLMClassifier | None = None):
+    from langgraph.graph import END, START, StateGraph
+
+    if llm is None and settings.LLM_CLASSIFIER_ENABLED:
+        llm = LLMClassifier()
+
     graph = StateGraph(EmailState)
     graph.add_node('classify_email', classify_email)
     graph.add_edge(START, 'classify_email')
-    graph.add_edge('classify_email', END)
+    if llm is None:
+        graph.add_edge('classify_email', END)
+    else:
+        graph.add_node('llm_classify', lambda state: llm.classify([state])[0])
+        graph.add_conditional_edges(
+            'classify_email',
+            lambda state: 'llm_classify' if needs_llm(state) else END,
+            ['llm_classify', END],
+        )
+        graph.add_edge('llm_classify', END)
     return graph.compile()
 
 
-email_agent = build_agent()
+def build_batch_agent(llm: LLMClassifier | None = None):
+    from langgraph.graph import END, START, StateGraph
+
+    if llm is None and settings.LLM_CLASSIFIER_ENABLED:
+        llm = LLMClassifier()
+
+    graph = StateGraph(EmailBatchState)
+    graph.add_node('classify_email_batch', classify_email_batch)
+    graph.add_edge(START, 'classify_email_batch')
+    if llm is None:
+        graph.add_edge('classify_email_batch', END)
+    else:
+        graph.add_node('llm_classify', lambda state: {'emails': llm.classify(state['emails'])})
+        graph.add_conditional_edges(
+            'classify_email_batch',
+            lambda state: 'llm_classify' if any(needs_llm(email) for email in state['emails']) else END,
+            ['llm_classify', END],
+        )
+        graph.add_edge('llm_classify', END)
+    return graph.compile()
+
+
+def build_rules_batch_agent():
+    from langgraph.graph import END, START, StateGraph
+
+    graph = StateGraph(EmailBatchState)
+    graph.add_node('classify_email_batch', classify_email_batch)
+    graph.add_edge(START, 'classify_email_batch')
+    graph.add_edge('classify_email_batch', END)
+    return graph.compile()
+
+
+def classification_tier(matched_rule: str) -> str:
+    if matched_rule == 'llm:cache':
+        return 'llm_cache'
+    return matched_rule.split(':', 1)[0] or 'none'
+
+
+def record_outcomes(results: list[EmailState]) -> None:
+    if not settings.METRICS_ENABLED:
+        return
+    outcomes = Counter((classification_tier(email['matched_rule']), email['is_relevant']) for email in results)
+    for (tier, relevant), count in outcomes.items():
+        CLASSIFICATIONS.labels(tier=tier, relevant=str(relevant).lower()).inc(count)
+
+
+def classify_emails(emails: list[EmailState]) -> list[EmailState]:
+    with stage('classify'):
+        results = classify_in_tiers(emails)
+    record_outcomes(results)
+    return results
+
+
+def classify_in_tiers(emails: list[EmailState]) -> list[EmailState]:
+    if classifier_pool.should_dispatch(len(emails)):
+        try:
+            results = classifier_pool.classify(emails)
+        except BrokenProcessPool:
+            return get_batch_email_agent().invoke({'emails': emails})['emails']
+        if llm_classifier is not None and any(needs_llm(email) for email in results):
+            results = llm_classifier.classify(results)
+        return results
+    return get_batch_email_agent().invoke({'emails': emails})['emails']
+
+
+async def aclassify_emails(emails: list[EmailState]) -> list[EmailState]:
+    with stage('classify'):
+        results = (await get_batch_email_agent().ainvoke({'emails': emails}))['emails']
+    record_outcomes(results)
+    return results
+
+
+@lru_cache(maxsize=1)
+def get_email_agent():
+    return build_agent(llm_classifier)
+
+
+@lru_cache(maxsize=1)
+def get_batch_email_agent():
+    return build_batch_agent(llm_classifier)
+
+
+def warm_agents() -> None:
+    get_batch_email_agent()
+    get_email_agent()
+
+
+llm_classifier = LLMClassifier() if settings.LLM_CLASSIFIER_ENABLED else None
+classifier_pool = ClassifierPool(
+    processes=settings.CLASSIFIER_PROCESSES,
+    chunk_size=settings.CLASSIFIER_PROCESS_CHUNK_SIZE,
+    min_batch=settings.CLASSIFIER_PROCESS_MIN_BATCH,
+)
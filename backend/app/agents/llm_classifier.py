@@ -0,0 +1,184 @@
+import hashlib
+import json
+import re
+import threading
+from collections import OrderedDict
+from typing import Any
+
+from sqlalchemy import select
+from sqlalchemy.orm import sessionmaker
+
+from ..config import settings
+from ..database import SessionLocal, dialect_insert
+from ..metrics import stage
+from ..models import ClassificationCacheEntry
+
+SYSTEM_PROMPT = (
+    'You triage inbound emails for a sales team. For every email in the JSON array you receive, decide whether '
+    'it is a genuine sales lead (someone interested in buying, pricing, a demo, a quote or a partnership) or not '
+    '(newsletters, notifications, spam, internal chatter). Reply with only a JSON array of objects with the keys '
+    '"index" (copied from the input), "relevant" (true or false) and "reason" (at most 12 words).'
+)
+SUBJECT_PREFIX = re.compile(r'^(?:\s*(?:re|fw|fwd|aw)\s*:\s*)+', re.IGNORECASE)
+WHITESPACE = re.compile(r'\s+')
+
+Verdict = tuple[bool, str]
+
+
+def content_hash(email: dict[str, Any]) -> str:
+    subject = SUBJECT_PREFIX.sub('', email['subject'])
+    normalized = WHITESPACE.sub(' ', f"{subject}\n{email['snippet']}").strip().lower()
+    return hashlib.sha256(normalized.encode()).hexdigest()
+
+
+def get_chat_model():
+    from langchain_openai import ChatOpenAI
+
+    return ChatOpenAI(model=settings.LLM_MODEL, api_key=settings.OPENAI_API_KEY, temperature=0)
+
+
+class ClassificationCache:
+    def __init__(self, max_size: int, session_factory: sessionmaker | None = SessionLocal):
+        self.max_size = max_size
+        self.session_factory = session_factory
+        self._entries: OrderedDict[str, Verdict] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _remember(self, key: str, verdict: Verdict) -> None:
+        self._entries[key] = verdict
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def get_many(self, keys: set[str]) -> dict[str, Verdict]:
+        found: dict[str, Verdict] = {}
+        with self._lock:
+            for key in keys:
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                    found[key] = self._entries[key]
+
+        missing = list(keys - found.keys())
+        if missing and self.session_factory is not None:
+            with self.session_factory() as db:
+                rows = db.execute(
+                    select(
+                        ClassificationCacheEntry.content_hash,
+                        ClassificationCacheEntry.is_relevant,
+                        ClassificationCacheEntry.reason,
+                    ).where(ClassificationCacheEntry.content_hash.in_(missing))
+                ).all()
+            with self._lock:
+                for key, is_relevant, reason in rows:
+                    found[key] = (is_relevant, reason)
+                    self._remember(key, found[key])
+        return found
+
+    def put_many(self, verdicts: dict[str, Verdict], model: str) -> None:
+        if not verdicts:
+            return
+        with self._lock:
+            for key, verdict in verdicts.items():
+                self._remember(key, verdict)
+        if self.session_factory is not None:
+            with self.session_factory() as db:
+                insert = dialect_insert(db.get_bind())
+                db.execute(
+                    insert(ClassificationCacheEntry)
+                    .values(
+                        [
+                            {'content_hash': key, 'is_relevant': is_relevant, 'reason': reason, 'model': model}
+                            for key, (is_relevant, reason) in verdicts.items()
+                        ]
+                    )
+                    .on_conflict_do_nothing(index_elements=[ClassificationCacheEntry.content_hash])
+                )
+                db.commit()
+
+
+def build_prompt(emails: list[dict[str, Any]]) -> list[tuple[str, str]]:
+    items = [
+        {'index': index, 'subject': email['subject'], 'sender': email['sender'], 'snippet': email['snippet']}
+        for index, email in enumerate(emails)
+    ]
+    return [('system', SYSTEM_PROMPT), ('human', json.dumps(items))]
+
+
+def parse_verdicts(content: str, count: int) -> dict[int, Verdict]:
+    text = content.strip()
+    if text.startswith('```'):
+        text = text.strip('`').removeprefix('json').strip()
+    try:
+        items = json.loads(text)
+    except json.JSONDecodeError:
+        return {}
+    if not isinstance(items, list):
+        return {}
+
+    verdicts: dict[int, Verdict] = {}
+    for item in items:
+        if not isinstance(item, dict) or not isinstance(item.get('index'), int) or 'relevant' not in item:
+            continue
+        if 0 <= item['index'] < count:
+            verdicts[item['index']] = (bool(item['relevant']), str(item.get('reason', ''))[:500])
+    return verdicts
+
+
+class LLMClassifier:
+    def __init__(
+        self,
+        chat_model=None,
+        cache: ClassificationCache | None = None,
+        batch_size: int | None = None,
+        max_concurrency: int | None = None,
+        model_name: str | None = None,
+    ):
+        self._chat_model = chat_model
+        self.cache = cache or ClassificationCache(settings.LLM_CACHE_SIZE)
+        self.batch_size = batch_size or settings.LLM_BATCH_SIZE
+        self.max_concurrency = max_concurrency or settings.LLM_MAX_CONCURRENCY
+        self.model_name = model_name or settings.LLM_MODEL
+
+    @property
+    def chat_model(self):
+        if self._chat_model is None:
+            self._chat_model = get_chat_model()
+        return self._chat_model
+
+    def ask_model(self, pending: list[tuple[str, dict[str, Any]]]) -> dict[str, Verdict]:
+        chunks = [pending[start:start + self.batch_size] for start in range(0, len(pending), self.batch_size)]
+        if not chunks:
+            return {}
+        with stage('classify.llm'):
+            responses = self.chat_model.batch(
+                [build_prompt([email for _, email in chunk]) for chunk in chunks],
+                config={'max_concurrency': self.max_concurrency},
+                return_exceptions=True,
+            )
+
+        verdicts: dict[str, Verdict] = {}
+        for chunk, response in zip(chunks, responses):
+            if isinstance(response, Exception):
+                continue
+            for index, verdict in parse_verdicts(response.content, len(chunk)).items():
+                verdicts[chunk[index][0]] = verdict
+        return verdicts
+
+    def classify(self, emails: list[dict[str, Any]]) -> list[dict[str, Any]]:
+        ambiguous = [email for email in emails if not email['matched_rule']]
+        keys = [content_hash(email) for email in ambiguous]
+        cached = self.cache.get_many(set(keys))
+
+        misses: dict[str, dict[str, Any]] = {}
+        for key, email in zip(keys, ambiguous):
+            if key not in cached:
+                misses.setdefault(key, email)
+        answered = self.ask_model(list(misses.items()))
+        self.cache.put_many(answered, self.model_name)
+
+        for key, email in zip(keys, ambiguous):
+            verdict, rule = (cached[key], 'llm:cache') if key in cached else (answered.get(key), 'llm')
+            if verdict is not None:
+                email['is_relevant'], email['confidence_reason'] = verdict
+                email['matched_rule'] = rule
+        return emails
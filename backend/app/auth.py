@@ -1,19 +1,74 @@
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
 from datetime import datetime, timedelta, timezone
 
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
 from passlib.context import CryptContext
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from .config import settings
-from .database import get_db
-from .models import User
+from .database import get_async_db
+from .executors import password_executor, run_in_executor
+from .models import GmailAccount, User
 
 pwd_context = CryptContext(schemes=['bcrypt'], deprecated='auto')
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl='/auth/login')
 
 
+@dataclass(frozen=True)
+class Principal:
+    user_id: int
+    email: str
+    account_id: int | None
+
+
+class PrincipalCache:
+    def __init__(self, max_size: int, ttl_seconds: float):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries: OrderedDict[str, tuple[Principal, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, subject: str) -> Principal | None:
+        with self._lock:
+            entry = self._entries.get(subject)
+            if entry is None:
+                return None
+            if entry[1] <= time.monotonic():
+                del self._entries[subject]
+                return None
+            self._entries.move_to_end(subject)
+            return entry[0]
+
+    def put(self, principal: Principal) -> None:
+        with self._lock:
+            self._entries[principal.email] = (principal, time.monotonic() + self.ttl_seconds)
+            self._entries.move_to_end(principal.email)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, subject: str) -> None:
+        with self._lock:
+            self._entries.pop(subject, None)
+
+    def invalidate_user(self, user_id: int) -> None:
+        with self._lock:
+            for subject in [s for s, (p, _) in self._entries.items() if p.user_id == user_id]:
+                del self._entries[subject]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+principal_cache = PrincipalCache(max_size=settings.AUTH_CACHE_SIZE, ttl_seconds=settings.AUTH_CACHE_TTL_SECONDS)
+
+
 def hash_password(password: str) -> str:
     return pwd_context.hash(password)
 
@@ -22,6 +77,14 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
 
+async def ahash_password(password: str) -> str:
+    return await run_in_executor(password_executor, hash_password, password)
+
+
+async def averify_password(plain_password: str, hashed_password: str) -> bool:
+    return await run_in_executor(password_executor, verify_password, plain_password, hashed_password)
+
+
 def create_access_token(subject: str) -> str:
     expire = datetime.now(timezone.utc) + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     payload = {'sub': subject, 'exp': expire}
@@ -54,21 +117,58 @@ def validate_oauth_state_token(state_token: str) -> dict:
     return payload
 
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> User:
-    creds_exception = HTTPException(
+def credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail='Invalid authentication credentials',
         headers={'WWW-Authenticate': 'Bearer'},
     )
+
+
+def token_subject(token: str) -> str:
     try:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        email = payload.get('sub')
-        if email is None:
-            raise creds_exception
     except JWTError as exc:
-        raise creds_exception from exc
-
-    user = db.query(User).filter(User.email == email).first()
+        raise credentials_exception() from exc
+    email = payload.get('sub')
+    if email is None:
+        raise credentials_exception()
+    return email
+
+
+async def load_principal(db: AsyncSession, email: str) -> Principal | None:
+    row = (
+        await db.execute(
+            select(User.id, User.email, GmailAccount.id)
+            .outerjoin(GmailAccount, GmailAccount.user_id == User.id)
+            .where(User.email == email)
+            .order_by(GmailAccount.id)
+            .limit(1)
+        )
+    ).first()
+    return Principal(user_id=row[0], email=row[1], account_id=row[2]) if row else None
+
+
+async def get_current_principal(
+    token: str = Depends(oauth2_scheme),
+    db: AsyncSession = Depends(get_async_db),
+) -> Principal:
+    email = token_subject(token)
+    principal = principal_cache.get(email)
+    if principal is None:
+        principal = await load_principal(db, email)
+        if principal is None:
+            raise credentials_exception()
+        principal_cache.put(principal)
+    return principal
+
+
+async def get_current_user(
+    principal: Principal = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_async_db),
+) -> User:
+    user = await db.get(User, principal.user_id)
     if user is None:
-        raise creds_exception
+        principal_cache.invalidate(principal.email)
+        raise credentials_exception()
     return user
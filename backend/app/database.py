@@ -1,12 +1,42 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import declarative_base, sessionmaker
 
 from .config import settings
 
-engine = create_engine(settings.DATABASE_URL, pool_pre_ping=True)
+ASYNC_DRIVERS = {'postgresql': 'postgresql+asyncpg', 'sqlite': 'sqlite+aiosqlite'}
+
+
+def pool_options(url: str) -> dict:
+    parsed = make_url(url)
+    if parsed.get_backend_name() == 'sqlite' and (
+        parsed.get_driver_name() == 'aiosqlite' or parsed.database in (None, '', ':memory:')
+    ):
+        return {}
+    return {
+        'pool_size': settings.DB_POOL_SIZE,
+        'max_overflow': settings.DB_MAX_OVERFLOW,
+        'pool_timeout': settings.DB_POOL_TIMEOUT_SECONDS,
+        'pool_recycle': settings.DB_POOL_RECYCLE_SECONDS,
+    }
+
+
+def async_database_url(url: str) -> str:
+    parsed = make_url(url)
+    return parsed.set(drivername=ASYNC_DRIVERS.get(parsed.get_backend_name(), parsed.drivername)).render_as_string(
+        hide_password=False
+    )
+
+
+engine = create_engine(settings.DATABASE_URL, pool_pre_ping=True, **pool_options(settings.DATABASE_URL))
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+ASYNC_DATABASE_URL = settings.ASYNC_DATABASE_URL or async_database_url(settings.DATABASE_URL)
+async_engine = create_async_engine(ASYNC_DATABASE_URL, pool_pre_ping=True, **pool_options(ASYNC_DATABASE_URL))
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
 
 def get_db():
     db = SessionLocal()
@@ -14,3 +44,25 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+def dialect_insert(bind):
+    name = bind.dialect.name
+    if name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    elif name == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise RuntimeError(f'ON CONFLICT inserts need PostgreSQL or SQLite, not {name}')
+    return insert
+
+
+def try_advisory_xact_lock(db, namespace: int, key: int) -> bool:
+    if db.get_bind().dialect.name != 'postgresql':
+        return True
+    return bool(db.scalar(select(func.pg_try_advisory_xact_lock(namespace, key))))
@@ -0,0 +1,54 @@
+import asyncio
+import contextvars
+import threading
+from collections.abc import Callable
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+from functools import partial
+from typing import Any, TypeVar
+
+from .config import settings
+
+T = TypeVar('T')
+
+
+class CountingThreadPoolExecutor(ThreadPoolExecutor):
+    def __init__(self, max_workers: int, thread_name_prefix: str = ''):
+        super().__init__(max_workers=max_workers, thread_name_prefix=thread_name_prefix)
+        self._queued = 0
+        self._running = 0
+        self._counts_lock = threading.Lock()
+
+    def submit(self, fn: Callable[..., T], /, *args: Any, **kwargs: Any) -> Future:
+        with self._counts_lock:
+            self._queued += 1
+        try:
+            return super().submit(self._run, fn, *args, **kwargs)
+        except BaseException:
+            with self._counts_lock:
+                self._queued -= 1
+            raise
+
+    def _run(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        with self._counts_lock:
+            self._queued -= 1
+            self._running += 1
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            with self._counts_lock:
+                self._running -= 1
+
+    def queued(self) -> int:
+        return self._queued
+
+    def running(self) -> int:
+        return self._running
+
+
+password_executor = CountingThreadPoolExecutor(settings.PASSWORD_HASH_WORKERS, thread_name_prefix='password')
+blocking_io_executor = CountingThreadPoolExecutor(settings.BLOCKING_IO_WORKERS, thread_name_prefix='blocking-io')
+
+
+async def run_in_executor(executor: Executor, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    context = contextvars.copy_context()
+    return await asyncio.get_running_loop().run_in_executor(executor, partial(context.run, fn, *args, **kwargs))
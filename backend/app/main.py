@@ -1,14 +1,85 @@
-from fastapi import FastAPI
+import logging
+import threading
+import time
 
-from .database import Base, engine
-from .routers import auth, automation
+from fastapi import Depends, FastAPI, Header, HTTPException
+from fastapi.responses import PlainTextResponse
 
+from .agents.email_agent import classifier_pool, warm_agents
+from .config import settings
+from .database import async_engine, engine
+from .executors import blocking_io_executor, password_executor
+from .metrics import (
+    CONTENT_TYPE,
+    ProfilingMiddleware,
+    metrics_token_matches,
+    render_metrics,
+    watch_engine,
+    watch_executor,
+    watch_pool,
+)
+from .routers import auth, automation, push
+from .services.gmail_client import warm_gmail_client
+from .services.gmail_watch import WatchRenewer
+from .services.outbox import OutboxWorker
+from .services.partitions import PartitionMaintainer
+from .services.push_auth import push_auth_configured
+from .services.scheduler import polling_scheduler
+from .services.whatsapp import twilio_session
+
+logger = logging.getLogger(__name__)
 app = FastAPI(title='Lead Email Automation API')
+outbox_worker = OutboxWorker()
+watch_renewer = WatchRenewer()
+partition_maintainer = PartitionMaintainer()
+app.add_middleware(ProfilingMiddleware)
+
+watch_engine('db', engine)
+watch_engine('db_async', async_engine.sync_engine)
+watch_executor('blocking_io', blocking_io_executor, settings.BLOCKING_IO_WORKERS)
+watch_executor('password_hash', password_executor, settings.PASSWORD_HASH_WORKERS)
+watch_pool('outbox', lambda: outbox_worker.concurrency, lambda: outbox_worker.in_flight)
+watch_pool('scheduler', lambda: polling_scheduler.max_concurrency, lambda: polling_scheduler.in_flight)
+watch_pool('classifier_processes', lambda: classifier_pool.processes)
+
+
+def warm_up() -> None:
+    started = time.perf_counter()
+    try:
+        warm_agents()
+        warm_gmail_client()
+        twilio_session()
+        if classifier_pool.enabled:
+            classifier_pool.start()
+    except Exception:
+        logger.exception('Background warm-up failed')
+        return
+    logger.info('Background warm-up finished in %.2fs', time.perf_counter() - started)
 
 
 @app.on_event('startup')
 def on_startup():
-    Base.metadata.create_all(bind=engine)
+    if settings.WARM_UP_ON_STARTUP:
+        threading.Thread(target=warm_up, name='warm-up', daemon=True).start()
+    if settings.OUTBOX_WORKER_IN_PROCESS:
+        outbox_worker.start()
+    if settings.SCHEDULER_ENABLED or settings.GMAIL_PUSH_ENABLED:
+        polling_scheduler.start()
+    if settings.GMAIL_PUSH_ENABLED:
+        if not push_auth_configured():
+            logger.error('GMAIL_PUSH_ENABLED without GMAIL_PUSH_TOKEN or GMAIL_PUSH_AUDIENCE; rejecting all pushes')
+        watch_renewer.start()
+    if settings.PROCESSED_EMAILS_PARTITIONED:
+        partition_maintainer.start()
+
+
+@app.on_event('shutdown')
+def on_shutdown():
+    classifier_pool.stop()
+    partition_maintainer.stop()
+    watch_renewer.stop()
+    polling_scheduler.stop()
+    outbox_worker.stop()
 
 
 @app.get('/health')
@@ -16,5 +87,24 @@ def health():
     return {'status': 'ok'}
 
 
+def require_metrics_token(authorization: str = Header('')) -> None:
+    if not settings.METRICS_TOKEN:
+        raise HTTPException(status_code=404, detail='Metrics endpoints are disabled')
+    scheme, _, token = authorization.partition(' ')
+    if scheme.lower() != 'bearer' or not metrics_token_matches(token):
+        raise HTTPException(status_code=401, detail='Invalid metrics token', headers={'WWW-Authenticate': 'Bearer'})
+
+
+@app.get('/metrics', response_class=PlainTextResponse, dependencies=[Depends(require_metrics_token)])
+def metrics():
+    return PlainTextResponse(render_metrics(), media_type=CONTENT_TYPE)
+
+
+@app.get('/scheduler/metrics', dependencies=[Depends(require_metrics_token)])
+def scheduler_metrics():
+    return polling_scheduler.metrics()
+
+
 app.include_router(auth.router)
 app.include_router(automation.router)
+app.include_router(push.router)
@@ -0,0 +1,201 @@
+import hmac
+import threading
+import time
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from prometheus_client import CONTENT_TYPE_LATEST as CONTENT_TYPE
+from prometheus_client import REGISTRY, Counter, Gauge, Histogram, disable_created_metrics, generate_latest
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import QueuePool
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .config import settings
+from .executors import CountingThreadPoolExecutor
+
+PREFIX = 'lead_automation_'
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+disable_created_metrics()
+
+STAGE_SECONDS = Histogram(
+    PREFIX + 'stage_seconds', 'Wall time per pipeline stage.', ('stage',), buckets=LATENCY_BUCKETS
+)
+API_CALLS = Counter(
+    PREFIX + 'api_calls', 'Outbound API calls by method and outcome.', ('provider', 'method', 'outcome')
+)
+DB_QUERIES = Counter(PREFIX + 'db_queries', 'SQL statements executed.')
+CLASSIFICATIONS = Counter(
+    PREFIX + 'classifications', 'Classified emails by deciding tier and verdict.', ('tier', 'relevant')
+)
+OUTBOX_JOBS = Counter(
+    PREFIX + 'outbox_jobs', 'Settled outbox job attempts by kind and resulting status.', ('kind', 'status')
+)
+RATE_LIMITED = Counter(PREFIX + 'rate_limited', 'Calls rejected by a local rate limit or open circuit.', ('provider',))
+RUN_SECONDS = Histogram(PREFIX + 'run_seconds', 'Wall time per processing run.', ('source',), buckets=LATENCY_BUCKETS)
+RUN_API_CALLS = Histogram(
+    PREFIX + 'run_api_calls', 'Outbound API calls per run.', ('source', 'provider'), buckets=COUNT_BUCKETS
+)
+RUN_DB_QUERIES = Histogram(
+    PREFIX + 'run_db_queries', 'SQL statements per processing run.', ('source',), buckets=COUNT_BUCKETS
+)
+POOL_IN_USE = Gauge(PREFIX + 'pool_in_use', 'Busy connections or workers per pool.', ('pool',))
+POOL_SIZE = Gauge(PREFIX + 'pool_size', 'Capacity per pool.', ('pool',))
+POOL_QUEUED = Gauge(PREFIX + 'pool_queued', 'Work waiting for a free worker per pool.', ('pool',))
+
+
+class Profile:
+    def __init__(self):
+        self.stages: dict[str, list[float]] = {}
+        self.counts: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def add_stage(self, name: str, seconds: float, calls: int = 1) -> None:
+        with self._lock:
+            entry = self.stages.setdefault(name, [0, 0.0])
+            entry[0] += calls
+            entry[1] += seconds
+
+    def count(self, name: str, amount: int = 1) -> None:
+        with self._lock:
+            self.counts[name] = self.counts.get(name, 0) + amount
+
+    def merge(self, other: 'Profile') -> None:
+        for name, (calls, seconds) in other.stages.items():
+            self.add_stage(name, seconds, int(calls))
+        for name, amount in other.counts.items():
+            self.count(name, amount)
+
+    def server_timing(self, total: float) -> str:
+        entries = [f'total;dur={total * 1000:.1f}']
+        entries += [
+            f'{name};dur={seconds * 1000:.1f};desc="x{calls:g}"' for name, (calls, seconds) in self.stages.items()
+        ]
+        entries += [f'{name};desc="{amount}"' for name, amount in self.counts.items()]
+        return ', '.join(entries)
+
+
+current_profile: ContextVar[Profile | None] = ContextVar('current_profile', default=None)
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    if not settings.METRICS_ENABLED:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        STAGE_SECONDS.labels(stage=name).observe(elapsed)
+        profile = current_profile.get()
+        if profile is not None:
+            profile.add_stage(name, elapsed)
+
+
+def count_api_call(provider: str, method: str, outcome: str = 'ok', amount: int = 1) -> None:
+    if not settings.METRICS_ENABLED:
+        return
+    API_CALLS.labels(provider=provider, method=method, outcome=outcome).inc(amount)
+    profile = current_profile.get()
+    if profile is not None:
+        profile.count(f'{provider}_calls', amount)
+
+
+@contextmanager
+def track_run(source: str) -> Iterator[Profile]:
+    parent = current_profile.get()
+    profile = Profile()
+    token = current_profile.set(profile)
+    started = time.perf_counter()
+    try:
+        yield profile
+    finally:
+        current_profile.reset(token)
+        if settings.METRICS_ENABLED:
+            RUN_SECONDS.labels(source=source).observe(time.perf_counter() - started)
+            RUN_DB_QUERIES.labels(source=source).observe(profile.counts.get('db_queries', 0))
+            for provider in ('gmail', 'twilio'):
+                calls = profile.counts.get(f'{provider}_calls', 0)
+                RUN_API_CALLS.labels(source=source, provider=provider).observe(calls)
+        if parent is not None:
+            parent.merge(profile)
+
+
+def count_query(*args) -> None:
+    if not settings.METRICS_ENABLED:
+        return
+    DB_QUERIES.inc()
+    profile = current_profile.get()
+    if profile is not None:
+        profile.count('db_queries')
+
+
+event.listen(Engine, 'before_cursor_execute', count_query)
+
+
+def watch_pool(
+    name: str,
+    size: Callable[[], float],
+    in_use: Callable[[], float] | None = None,
+    queued: Callable[[], float] | None = None,
+) -> None:
+    POOL_SIZE.labels(pool=name).set_function(size)
+    if in_use is not None:
+        POOL_IN_USE.labels(pool=name).set_function(in_use)
+    if queued is not None:
+        POOL_QUEUED.labels(pool=name).set_function(queued)
+
+
+def watch_engine(name: str, bind: Engine) -> None:
+    pool = bind.pool
+    if isinstance(pool, QueuePool):
+        watch_pool(name, lambda: pool.size() + settings.DB_MAX_OVERFLOW, pool.checkedout)
+
+
+def watch_executor(name: str, executor: CountingThreadPoolExecutor, workers: int) -> None:
+    watch_pool(name, lambda: workers, executor.running, executor.queued)
+
+
+def metrics_token_matches(value: str) -> bool:
+    return bool(settings.METRICS_TOKEN) and hmac.compare_digest(value.encode(), settings.METRICS_TOKEN.encode())
+
+
+def sample_value(name: str, **labels: str) -> float:
+    return REGISTRY.get_sample_value(PREFIX + name, labels) or 0.0
+
+
+def render_metrics() -> bytes:
+    return generate_latest(REGISTRY)
+
+
+class ProfilingMiddleware:
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope['type'] != 'http' or not (
+            settings.PROFILE_REQUESTS or metrics_token_matches(Headers(scope=scope).get(settings.PROFILE_HEADER, ''))
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        profile = Profile()
+        token = current_profile.set(profile)
+        started = time.perf_counter()
+
+        async def send_with_timing(message: Message) -> None:
+            if message['type'] == 'http.response.start':
+                headers = MutableHeaders(scope=message)
+                headers.append('Server-Timing', profile.server_timing(time.perf_counter() - started))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            current_profile.reset(token)
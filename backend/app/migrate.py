@@ -0,0 +1,35 @@
+import argparse
+from pathlib import Path
+
+from .database import engine
+from .models import Base
+
+ALEMBIC_INI = Path(__file__).resolve().parents[2] / 'alembic.ini'
+
+
+def upgrade(revision: str = 'head') -> None:
+    from alembic import command
+    from alembic.config import Config
+
+    config = Config(str(ALEMBIC_INI))
+    config.set_main_option('script_location', str(ALEMBIC_INI.parent / 'backend' / 'migrations'))
+    command.upgrade(config, revision)
+
+
+def create_schema() -> None:
+    Base.metadata.create_all(bind=engine)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Bring the database schema up to date before starting the API.')
+    parser.add_argument('revision', nargs='?', default='head')
+    parser.add_argument(
+        '--create-all',
+        action='store_true',
+        help='create missing tables straight from the models instead of running migrations (throwaway SQLite only)',
+    )
+    args = parser.parse_args()
+    if args.create_all:
+        create_schema()
+    else:
+        upgrade(args.revision)
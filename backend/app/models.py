@@ -1,6 +1,6 @@
 from datetime import datetime
 
-from sqlalchemy import Boolean, Column, DateTime, ForeignKey, Integer, String, Text
+from sqlalchemy import Boolean, Column, Date, DateTime, Float, ForeignKey, Index, Integer, String, Text
 from sqlalchemy.orm import relationship
 
 from .database import Base
@@ -25,10 +25,13 @@ class GmailAccount(Base):
     gmail_email = Column(String(255), nullable=False)
     access_token = Column(Text, nullable=False)
     refresh_token = Column(Text, nullable=True)
+    token_expiry = Column(DateTime, nullable=True)
     token_uri = Column(String(255), nullable=True)
     client_id = Column(String(255), nullable=True)
     client_secret = Column(String(255), nullable=True)
     scopes = Column(Text, nullable=True)
+    history_id = Column(String(32), nullable=True)
+    watch_expiration = Column(DateTime, nullable=True)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     user = relationship('User', back_populates='gmail_account')
@@ -44,6 +47,144 @@ class ProcessedEmail(Base):
     sender = Column(String(512), nullable=True)
     snippet = Column(Text, nullable=True)
     is_relevant = Column(Boolean, nullable=False, default=False)
+    is_spam = Column(Boolean, nullable=False, default=False)
     forwarded_to = Column(String(255), nullable=True)
     whatsapp_notified = Column(Boolean, nullable=False, default=False)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        Index('ix_processed_emails_user_created', user_id, created_at.desc(), id.desc()),
+        Index(
+            'ix_processed_emails_user_relevant_created',
+            user_id,
+            created_at.desc(),
+            id.desc(),
+            postgresql_where=is_relevant.is_(True),
+            sqlite_where=is_relevant.is_(True),
+        ),
+    )
+
+
+class UserStats(Base):
+    __tablename__ = 'user_stats'
+
+    user_id = Column(Integer, ForeignKey('users.id'), primary_key=True)
+    processed = Column(Integer, nullable=False, default=0)
+    relevant = Column(Integer, nullable=False, default=0)
+    spam = Column(Integer, nullable=False, default=0)
+    version = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+class UserDailyStats(Base):
+    __tablename__ = 'user_daily_stats'
+
+    user_id = Column(Integer, ForeignKey('users.id'), primary_key=True)
+    day = Column(Date, primary_key=True)
+    processed = Column(Integer, nullable=False, default=0)
+    relevant = Column(Integer, nullable=False, default=0)
+    spam = Column(Integer, nullable=False, default=0)
+
+
+class UserSenderStats(Base):
+    __tablename__ = 'user_sender_stats'
+
+    user_id = Column(Integer, ForeignKey('users.id'), primary_key=True)
+    sender = Column(String(512), primary_key=True)
+    processed = Column(Integer, nullable=False, default=0)
+    relevant = Column(Integer, nullable=False, default=0)
+    last_seen_at = Column(DateTime, nullable=False)
+
+    __table_args__ = (Index('ix_user_sender_stats_top', user_id, processed.desc()),)
+
+
+class ProcessedEmailKey(Base):
+    __tablename__ = 'processed_email_keys'
+
+    gmail_message_id = Column(String(128), primary_key=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
+
+
+class OutboxJob(Base):
+    __tablename__ = 'outbox_jobs'
+    __table_args__ = (Index('ix_outbox_jobs_due', 'status', 'next_attempt_at'),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey('users.id'), nullable=False)
+    kind = Column(String(32), nullable=False)
+    idempotency_key = Column(String(255), unique=True, nullable=False)
+    gmail_message_id = Column(String(128), nullable=True)
+    trigger_job_id = Column(String(36), nullable=True)
+    payload = Column(Text, nullable=False)
+    status = Column(String(16), nullable=False, default='pending')
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    locked_at = Column(DateTime, nullable=True)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+class ClassificationCacheEntry(Base):
+    __tablename__ = 'classification_cache'
+
+    content_hash = Column(String(64), primary_key=True)
+    is_relevant = Column(Boolean, nullable=False)
+    reason = Column(Text, nullable=True)
+    model = Column(String(128), nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+class TriggerJob(Base):
+    __tablename__ = 'trigger_jobs'
+
+    id = Column(String(36), primary_key=True)
+    user_id = Column(Integer, ForeignKey('users.id'), nullable=False, index=True)
+    account_id = Column(Integer, ForeignKey('gmail_accounts.id'), nullable=False)
+    mode = Column(String(16), nullable=False, default='latest')
+    batch_size = Column(Integer, nullable=False)
+    incremental = Column(Boolean, nullable=False, default=False)
+    max_messages = Column(Integer, nullable=True)
+    notify = Column(Boolean, nullable=False, default=True)
+    status = Column(String(16), nullable=False, default='queued')
+    processed = Column(Integer, nullable=True)
+    relevant = Column(Integer, nullable=True)
+    ignored = Column(Integer, nullable=True)
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+
+class TriggerJobEvent(Base):
+    __tablename__ = 'trigger_job_events'
+    __table_args__ = (Index('ix_trigger_job_events_job', 'job_id', 'id'),)
+
+    id = Column(Integer, primary_key=True)
+    job_id = Column(String(36), ForeignKey('trigger_jobs.id'), nullable=False)
+    kind = Column(String(32), nullable=False)
+    payload = Column(Text, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+class MailboxBackfill(Base):
+    __tablename__ = 'mailbox_backfills'
+
+    account_id = Column(Integer, ForeignKey('gmail_accounts.id'), primary_key=True)
+    status = Column(String(16), nullable=False, default='running')
+    page_token = Column(String(255), nullable=True)
+    pages = Column(Integer, nullable=False, default=0)
+    processed = Column(Integer, nullable=False, default=0)
+    relevant = Column(Integer, nullable=False, default=0)
+    skipped = Column(Integer, nullable=False, default=0)
+    error = Column(Text, nullable=True)
+    started_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    finished_at = Column(DateTime, nullable=True)
+
+
+class RateLimitBucket(Base):
+    __tablename__ = 'rate_limit_buckets'
+
+    key = Column(String(128), primary_key=True)
+    tokens = Column(Float, nullable=False)
+    updated_at = Column(Float, nullable=False)
@@ -1,3 +1,3 @@
-from . import auth, automation
+from . import auth, automation, push
 
-__all__ = ['auth', 'automation']
+__all__ = ['auth', 'automation', 'push']
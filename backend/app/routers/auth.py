@@ -1,47 +1,52 @@
 import json
 
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from ..auth import (
+    Principal,
+    ahash_password,
+    averify_password,
     create_access_token,
     create_oauth_state_token,
-    get_current_user,
-    hash_password,
+    get_current_principal,
+    principal_cache,
     validate_oauth_state_token,
-    verify_password,
 )
-from ..database import get_db
+from ..database import get_async_db
+from ..executors import blocking_io_executor, run_in_executor
 from ..models import GmailAccount, User
 from ..schemas import LoginRequest, RegisterRequest, TokenResponse
-from ..services.gmail_client import GMAIL_SCOPES, build_gmail_flow
+from ..services.gmail_client import GMAIL_SCOPES, build_gmail_flow, fetch_gmail_address, service_cache
 
 router = APIRouter(prefix='/auth', tags=['auth'])
 
 
 @router.post('/register', response_model=TokenResponse)
-def register(payload: RegisterRequest, db: Session = Depends(get_db)):
-    if db.query(User).filter(User.email == payload.email).first():
+async def register(payload: RegisterRequest, db: AsyncSession = Depends(get_async_db)):
+    if await db.scalar(select(User).where(User.email == payload.email)):
         raise HTTPException(status_code=400, detail='Email already registered')
 
-    user = User(email=payload.email, hashed_password=hash_password(payload.password))
+    user = User(email=payload.email, hashed_password=await ahash_password(payload.password))
     db.add(user)
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    principal_cache.invalidate(user.email)
     return TokenResponse(access_token=create_access_token(user.email))
 
 
 @router.post('/login', response_model=TokenResponse)
-def login(payload: LoginRequest, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.email == payload.email).first()
-    if not user or not verify_password(payload.password, user.hashed_password):
+async def login(payload: LoginRequest, db: AsyncSession = Depends(get_async_db)):
+    user = await db.scalar(select(User).where(User.email == payload.email))
+    if not user or not await averify_password(payload.password, user.hashed_password):
         raise HTTPException(status_code=401, detail='Invalid email or password')
     return TokenResponse(access_token=create_access_token(user.email))
 
 
 @router.get('/gmail/connect')
-def connect_gmail(current_user: User = Depends(get_current_user)):
-    oauth_state = create_oauth_state_token(current_user.id, current_user.email)
+async def connect_gmail(principal: Principal = Depends(get_current_principal)):
+    principal_cache.invalidate(principal.email)
+    oauth_state = create_oauth_state_token(principal.user_id, principal.email)
     flow = build_gmail_flow(state=oauth_state)
     auth_url, _ = flow.authorization_url(
         access_type='offline',
@@ -52,40 +57,44 @@ def connect_gmail(current_user: User = Depends(get_current_user)):
 
 
 @router.get('/gmail/callback')
-def gmail_callback(code: str = Query(...), state: str = Query(...), db: Session = Depends(get_db)):
+async def gmail_callback(code: str = Query(...), state: str = Query(...), db: AsyncSession = Depends(get_async_db)):
     flow = build_gmail_flow(state=state)
-    flow.fetch_token(code=code)
+    await run_in_executor(blocking_io_executor, flow.fetch_token, code=code)
     creds = flow.credentials
 
     state_payload = validate_oauth_state_token(state)
-    user = db.query(User).filter(User.id == int(state_payload['uid'])).first()
+    user = await db.scalar(select(User).where(User.id == int(state_payload['uid'])))
     if not user:
         raise HTTPException(status_code=404, detail='User not found')
 
     if user.email != state_payload['sub']:
         raise HTTPException(status_code=401, detail='OAuth state/user mismatch')
 
-    account = db.query(GmailAccount).filter(GmailAccount.user_id == user.id).first()
+    account = await db.scalar(select(GmailAccount).where(GmailAccount.user_id == user.id))
     if not account:
         account = GmailAccount(user_id=user.id, gmail_email=user.email, access_token='')
         db.add(account)
 
     account.access_token = creds.token
+    account.token_expiry = creds.expiry
     account.refresh_token = creds.refresh_token
     account.token_uri = creds.token_uri
     account.client_id = creds.client_id
     account.client_secret = creds.client_secret
     account.scopes = ' '.join(creds.scopes or GMAIL_SCOPES)
+    account.gmail_email = await run_in_executor(blocking_io_executor, fetch_gmail_address, account, creds)
 
-    db.commit()
+    await db.commit()
+    principal_cache.invalidate_user(user.id)
+    service_cache.invalidate(account.id)
     return {'status': 'gmail connected'}
 
 
 @router.get('/me')
-def me(current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    account = db.query(GmailAccount).filter(GmailAccount.user_id == current_user.id).first()
+async def me(principal: Principal = Depends(get_current_principal), db: AsyncSession = Depends(get_async_db)):
+    account = await db.get(GmailAccount, principal.account_id) if principal.account_id is not None else None
     return {
-        'email': current_user.email,
+        'email': principal.email,
         'gmail_connected': bool(account),
         'gmail_scopes': json.loads(json.dumps((account.scopes if account else '').split(' '))),
     }
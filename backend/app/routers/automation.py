@@ -1,36 +1,322 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+import math
+import uuid
+from collections import Counter
+from datetime import datetime
+from typing import Literal
 
-from ..auth import get_current_user
-from ..database import get_db
-from ..models import GmailAccount, User
-from ..schemas import TriggerResponse
-from ..services.email_processor import generate_reply_and_send, process_latest_emails
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..auth import Principal, get_current_principal
+from ..config import settings
+from ..database import SessionLocal, get_async_db
+from ..executors import blocking_io_executor, run_in_executor
+from ..models import GmailAccount, MailboxBackfill, TriggerJob, UserStats
+from ..schemas import (
+    BackfillStatus,
+    BulkReplyRequest,
+    BulkReplyResponse,
+    HistoryPage,
+    ProcessedEmailItem,
+    StatsResponse,
+    TriggerJobResponse,
+    TriggerResponse,
+)
+from ..services.backfill import backfill_active
+from ..services.email_processor import (
+    generate_reply_and_send,
+    lock_mailbox,
+    process_latest_emails,
+    send_replies,
+)
+from ..services.history import HISTORY_FIELDS, decode_cursor, encode_cursor, history_query, stream_history
+from ..services.rate_limit import RateLimitedError
+from ..services.stats import etag_matches, load_user_stats, stats_etag
+from ..services.trigger_jobs import run_trigger_job, stream_job_events
 
 router = APIRouter(prefix='/automation', tags=['automation'])
 
 
+def run_trigger(account_id: int, batch_size: int, incremental: bool) -> dict[str, int]:
+    with SessionLocal() as db:
+        if not lock_mailbox(db, account_id):
+            raise HTTPException(status_code=409, detail='Mailbox is already being processed')
+        account = db.get(GmailAccount, account_id)
+        if account is None:
+            raise HTTPException(status_code=400, detail='Connect Gmail first')
+        try:
+            return process_latest_emails(db=db, account=account, batch_size=batch_size, incremental=incremental)
+        except RateLimitedError as exc:
+            raise HTTPException(
+                status_code=429,
+                detail=str(exc),
+                headers={'Retry-After': str(math.ceil(exc.retry_after))},
+            ) from exc
+
+
 @router.post('/trigger', response_model=TriggerResponse)
-def trigger_agent(batch_size: int = 10, current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    account = db.query(GmailAccount).filter(GmailAccount.user_id == current_user.id).first()
-    if not account:
+async def trigger_agent(
+    batch_size: int = 10,
+    incremental: bool = False,
+    principal: Principal = Depends(get_current_principal),
+):
+    if principal.account_id is None:
         raise HTTPException(status_code=400, detail='Connect Gmail first')
 
-    result = process_latest_emails(db=db, account=account, batch_size=min(max(batch_size, 1), 10))
+    result = await run_in_executor(
+        blocking_io_executor,
+        run_trigger,
+        principal.account_id,
+        min(max(batch_size, 1), settings.TRIGGER_JOB_MAX_BATCH_SIZE),
+        incremental,
+    )
     return TriggerResponse(**result)
 
 
+def trigger_job_response(job: TriggerJob) -> TriggerJobResponse:
+    return TriggerJobResponse(
+        job_id=job.id,
+        status=job.status,
+        mode=job.mode,
+        batch_size=job.batch_size,
+        incremental=job.incremental,
+        max_messages=job.max_messages,
+        notify=job.notify,
+        processed=job.processed,
+        relevant=job.relevant,
+        ignored=job.ignored,
+        error=job.error,
+        created_at=job.created_at,
+        started_at=job.started_at,
+        finished_at=job.finished_at,
+    )
+
+
+async def get_owned_job(job_id: str, principal: Principal, db: AsyncSession) -> TriggerJob:
+    job = await db.get(TriggerJob, job_id)
+    if job is None or job.user_id != principal.user_id:
+        raise HTTPException(status_code=404, detail='Trigger job not found')
+    return job
+
+
+@router.post('/trigger/jobs', response_model=TriggerJobResponse, status_code=202)
+async def start_trigger_job(
+    batch_size: int = 10,
+    incremental: bool = False,
+    principal: Principal = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_async_db),
+):
+    if principal.account_id is None:
+        raise HTTPException(status_code=400, detail='Connect Gmail first')
+
+    job = TriggerJob(
+        id=str(uuid.uuid4()),
+        user_id=principal.user_id,
+        account_id=principal.account_id,
+        mode='latest',
+        batch_size=min(max(batch_size, 1), settings.TRIGGER_JOB_MAX_BATCH_SIZE),
+        incremental=incremental,
+        status='queued',
+        created_at=datetime.utcnow(),
+    )
+    db.add(job)
+    await db.commit()
+    blocking_io_executor.submit(run_trigger_job, job.id)
+    return trigger_job_response(job)
+
+
+@router.post('/backfill', response_model=TriggerJobResponse, status_code=202)
+async def start_backfill(
+    chunk_size: int = Query(settings.BACKFILL_CHUNK_SIZE, ge=1, le=500),
+    max_messages: int = Query(0, ge=0),
+    restart: bool = False,
+    notify: bool = False,
+    principal: Principal = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_async_db),
+):
+    if principal.account_id is None:
+        raise HTTPException(status_code=400, detail='Connect Gmail first')
+
+    checkpoint = await db.get(MailboxBackfill, principal.account_id)
+    if backfill_active(checkpoint):
+        raise HTTPException(status_code=409, detail='Mailbox is already being backfilled')
+    if restart and checkpoint is not None:
+        await db.delete(checkpoint)
+
+    job = TriggerJob(
+        id=str(uuid.uuid4()),
+        user_id=principal.user_id,
+        account_id=principal.account_id,
+        mode='backfill',
+        batch_size=chunk_size,
+        incremental=False,
+        max_messages=max_messages or None,
+        notify=notify,
+        status='queued',
+        created_at=datetime.utcnow(),
+    )
+    db.add(job)
+    await db.commit()
+    blocking_io_executor.submit(run_trigger_job, job.id)
+    return trigger_job_response(job)
+
+
+@router.get('/backfill', response_model=BackfillStatus)
+async def backfill_status(
+    principal: Principal = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_async_db),
+):
+    checkpoint = await db.get(MailboxBackfill, principal.account_id) if principal.account_id is not None else None
+    if checkpoint is None:
+        raise HTTPException(status_code=404, detail='No backfill has been started')
+    return BackfillStatus(
+        status=checkpoint.status,
+        has_more=checkpoint.status != 'done',
+        pages=checkpoint.pages,
+        processed=checkpoint.processed,
+        relevant=checkpoint.relevant,
+        skipped=checkpoint.skipped,
+        error=checkpoint.error,
+        started_at=checkpoint.started_at,
+        updated_at=checkpoint.updated_at,
+        finished_at=checkpoint.finished_at,
+    )
+
+
+@router.get('/trigger/jobs/{job_id}', response_model=TriggerJobResponse)
+async def get_trigger_job(
+    job_id: str,
+    principal: Principal = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_async_db),
+):
+    return trigger_job_response(await get_owned_job(job_id, principal, db))
+
+
+@router.get('/trigger/jobs/{job_id}/events')
+async def trigger_job_events(
+    job_id: str,
+    last_event_id: int = Header(0, alias='Last-Event-ID'),
+    principal: Principal = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_async_db),
+):
+    await get_owned_job(job_id, principal, db)
+    return StreamingResponse(
+        stream_job_events(job_id, last_event_id),
+        media_type='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
+
+
 @router.post('/reply')
-def send_reply(
+async def send_reply(
     to_email: str,
     original_context: str,
     intent: str,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    principal: Principal = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    account = db.query(GmailAccount).filter(GmailAccount.user_id == current_user.id).first()
+    account = await db.get(GmailAccount, principal.account_id) if principal.account_id is not None else None
     if not account:
         raise HTTPException(status_code=400, detail='Connect Gmail first')
 
-    generate_reply_and_send(account, to_email=to_email, original_context=original_context, intent=intent)
+    await run_in_executor(
+        blocking_io_executor,
+        generate_reply_and_send,
+        account,
+        to_email=to_email,
+        original_context=original_context,
+        intent=intent,
+    )
+    await db.commit()
     return {'status': 'reply sent'}
+
+
+@router.post('/reply/bulk', response_model=BulkReplyResponse)
+async def send_bulk_reply(
+    request: BulkReplyRequest,
+    principal: Principal = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_async_db),
+):
+    if not request.replies or len(request.replies) > settings.BULK_REPLY_MAX_RECIPIENTS:
+        raise HTTPException(
+            status_code=400,
+            detail=f'Send between 1 and {settings.BULK_REPLY_MAX_RECIPIENTS} replies per request',
+        )
+    account = await db.get(GmailAccount, principal.account_id) if principal.account_id is not None else None
+    if not account:
+        raise HTTPException(status_code=400, detail='Connect Gmail first')
+
+    results = await run_in_executor(
+        blocking_io_executor,
+        send_replies,
+        account,
+        [reply.model_dump() for reply in request.replies],
+    )
+    await db.commit()
+    statuses = Counter(result['status'] for result in results)
+    return BulkReplyResponse(
+        sent=statuses['sent'],
+        failed=statuses['failed'],
+        rate_limited=statuses['rate_limited'],
+        results=results,
+    )
+
+
+@router.get('/history', response_model=HistoryPage)
+async def history(
+    relevant: bool | None = None,
+    sender: str | None = None,
+    since: datetime | None = None,
+    until: datetime | None = None,
+    cursor: str | None = None,
+    limit: int = Query(50, ge=1, le=500),
+    principal: Principal = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_async_db),
+):
+    try:
+        after = decode_cursor(cursor) if cursor else None
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+
+    stmt = history_query(principal.user_id, relevant, sender, since, until, after).limit(limit + 1)
+    rows = (await db.execute(stmt)).all()
+    items = [ProcessedEmailItem(**dict(zip(HISTORY_FIELDS, row))) for row in rows[:limit]]
+    next_cursor = encode_cursor(items[-1].created_at, items[-1].id) if len(rows) > limit else None
+    return HistoryPage(items=items, next_cursor=next_cursor)
+
+
+@router.get('/stats', response_model=StatsResponse)
+async def stats(
+    response: Response,
+    days: int = Query(30, ge=1, le=366),
+    top: int = Query(10, ge=1, le=100),
+    if_none_match: str | None = Header(None, alias='If-None-Match'),
+    principal: Principal = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_async_db),
+):
+    totals = await db.get(UserStats, principal.user_id)
+    today = datetime.utcnow().date()
+    headers = {'ETag': stats_etag(totals, today, days, top), 'Cache-Control': 'private, no-cache'}
+    if etag_matches(if_none_match, headers['ETag']):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return StatsResponse(**await load_user_stats(db, principal.user_id, totals, today, days, top))
+
+
+@router.get('/history/export')
+async def export_history(
+    format: Literal['ndjson', 'csv'] = 'ndjson',
+    relevant: bool | None = None,
+    sender: str | None = None,
+    since: datetime | None = None,
+    until: datetime | None = None,
+    principal: Principal = Depends(get_current_principal),
+):
+    stmt = history_query(principal.user_id, relevant, sender, since, until)
+    media_type = 'text/csv' if format == 'csv' else 'application/x-ndjson'
+    return StreamingResponse(
+        stream_history(stmt, format),
+        media_type=media_type,
+        headers={'Content-Disposition': f'attachment; filename="processed_emails.{format}"'},
+    )
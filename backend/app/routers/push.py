@@ -0,0 +1,57 @@
+import base64
+import binascii
+import hmac
+import json
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..config import settings
+from ..database import get_async_db
+from ..executors import blocking_io_executor, run_in_executor
+from ..models import GmailAccount
+from ..schemas import PubSubPushRequest
+from ..services.push_auth import PushAuthError, push_auth_configured, verify_push_jwt
+from ..services.scheduler import polling_scheduler
+
+router = APIRouter(prefix='/push', tags=['push'])
+
+
+@router.post('/gmail')
+async def gmail_push(
+    payload: PubSubPushRequest,
+    token: str = Query(''),
+    authorization: str = Header(''),
+    db: AsyncSession = Depends(get_async_db),
+):
+    if not settings.GMAIL_PUSH_ENABLED:
+        raise HTTPException(status_code=404, detail='Push ingestion is disabled')
+    if not push_auth_configured():
+        raise HTTPException(status_code=503, detail='Push authentication is not configured')
+    if settings.GMAIL_PUSH_TOKEN and not hmac.compare_digest(token.encode(), settings.GMAIL_PUSH_TOKEN.encode()):
+        raise HTTPException(status_code=403, detail='Invalid push token')
+    if settings.GMAIL_PUSH_AUDIENCE:
+        scheme, _, bearer = authorization.partition(' ')
+        try:
+            await run_in_executor(blocking_io_executor, verify_push_jwt, bearer if scheme.lower() == 'bearer' else '')
+        except PushAuthError as exc:
+            raise HTTPException(status_code=403, detail=str(exc)) from exc
+
+    try:
+        notification = json.loads(base64.b64decode(payload.message.data))
+        email_address = notification['emailAddress']
+        history_id = int(notification['historyId'])
+    except (binascii.Error, ValueError, KeyError, TypeError) as exc:
+        raise HTTPException(status_code=400, detail='Malformed Gmail notification') from exc
+
+    accounts = (await db.scalars(select(GmailAccount).where(GmailAccount.gmail_email == email_address))).all()
+    if not accounts:
+        return {'status': 'ignored'}
+    stale = [account for account in accounts if not account.history_id or history_id > int(account.history_id)]
+    if not stale:
+        return {'status': 'up to date'}
+
+    for account in stale:
+        polling_scheduler.request_poll(account.id, delay=settings.GMAIL_PUSH_COALESCE_SECONDS)
+    return {'status': 'queued'}
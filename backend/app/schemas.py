@@ -1,3 +1,5 @@
+from datetime import date, datetime
+
 from pydantic import BaseModel, EmailStr
 
 
@@ -20,3 +22,109 @@ class TriggerResponse(BaseModel):
     processed: int
     relevant: int
     ignored: int
+
+
+class TriggerJobResponse(BaseModel):
+    job_id: str
+    status: str
+    mode: str
+    batch_size: int
+    incremental: bool
+    max_messages: int | None = None
+    notify: bool = True
+    processed: int | None = None
+    relevant: int | None = None
+    ignored: int | None = None
+    error: str | None = None
+    created_at: datetime
+    started_at: datetime | None = None
+    finished_at: datetime | None = None
+
+
+class BackfillStatus(BaseModel):
+    status: str
+    has_more: bool
+    pages: int
+    processed: int
+    relevant: int
+    skipped: int
+    error: str | None = None
+    started_at: datetime
+    updated_at: datetime
+    finished_at: datetime | None = None
+
+
+class ProcessedEmailItem(BaseModel):
+    id: int
+    gmail_message_id: str
+    subject: str | None
+    sender: str | None
+    is_relevant: bool
+    forwarded_to: str | None
+    whatsapp_notified: bool
+    created_at: datetime
+
+
+class HistoryPage(BaseModel):
+    items: list[ProcessedEmailItem]
+    next_cursor: str | None = None
+
+
+class DailyStats(BaseModel):
+    day: date
+    processed: int
+    relevant: int
+    spam: int
+
+
+class SenderStats(BaseModel):
+    sender: str
+    processed: int
+    relevant: int
+    last_seen_at: datetime
+
+
+class StatsResponse(BaseModel):
+    processed: int
+    relevant: int
+    spam: int
+    lead_rate: float
+    spam_rate: float
+    daily: list[DailyStats]
+    top_senders: list[SenderStats]
+    updated_at: datetime | None = None
+
+
+class ReplyItem(BaseModel):
+    to_email: EmailStr
+    original_context: str
+    intent: str
+
+
+class BulkReplyRequest(BaseModel):
+    replies: list[ReplyItem]
+
+
+class ReplyResult(BaseModel):
+    to_email: str
+    status: str
+    message_id: str | None = None
+    error: str | None = None
+    retry_after: float | None = None
+
+
+class BulkReplyResponse(BaseModel):
+    sent: int
+    failed: int
+    rate_limited: int
+    results: list[ReplyResult]
+
+
+class PubSubMessage(BaseModel):
+    data: str
+    messageId: str | None = None
+
+
+class PubSubPushRequest(BaseModel):
+    message: PubSubMessage
+    subscription: str | None = None
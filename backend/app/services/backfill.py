@@ -0,0 +1,158 @@
+import argparse
+import logging
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..database import SessionLocal
+from ..metrics import track_run
+from ..models import GmailAccount, MailboxBackfill
+from .email_processor import Progress, find_processed_message_ids, lock_mailbox, process_messages
+from .gmail_client import fetch_messages, iter_message_id_pages
+
+logger = logging.getLogger(__name__)
+
+RESUMABLE = {'running', 'paused', 'failed'}
+LOCK_RETRY_SECONDS = 0.5
+
+
+class BackfillInProgressError(Exception):
+    pass
+
+
+def backfill_active(checkpoint: MailboxBackfill | None) -> bool:
+    if checkpoint is None or checkpoint.status != 'running':
+        return False
+    return checkpoint.updated_at > datetime.utcnow() - timedelta(seconds=settings.BACKFILL_LEASE_SECONDS)
+
+
+def start_checkpoint(db: Session, account_id: int, restart: bool = False) -> MailboxBackfill:
+    checkpoint = db.get(MailboxBackfill, account_id)
+    if backfill_active(checkpoint):
+        raise BackfillInProgressError(f'Mailbox {account_id} is already being backfilled')
+
+    now = datetime.utcnow()
+    if checkpoint is None:
+        checkpoint = MailboxBackfill(account_id=account_id)
+        db.add(checkpoint)
+    if restart or checkpoint.status not in RESUMABLE:
+        checkpoint.page_token = None
+        checkpoint.pages = checkpoint.processed = checkpoint.relevant = checkpoint.skipped = 0
+        checkpoint.started_at = now
+        checkpoint.finished_at = None
+    checkpoint.status = 'running'
+    checkpoint.error = None
+    checkpoint.updated_at = now
+    db.commit()
+    return checkpoint
+
+
+def lock_mailbox_for_chunk(db: Session, account_id: int) -> None:
+    deadline = time.monotonic() + settings.BACKFILL_LOCK_TIMEOUT_SECONDS
+    while not lock_mailbox(db, account_id):
+        db.rollback()
+        if time.monotonic() >= deadline:
+            raise TimeoutError('Mailbox is busy; the backfill can be resumed from its checkpoint')
+        time.sleep(LOCK_RETRY_SECONDS)
+
+
+def backfill_mailbox(
+    db: Session,
+    account: GmailAccount,
+    chunk_size: int | None = None,
+    max_messages: int | None = None,
+    restart: bool = False,
+    progress: Progress | None = None,
+    trigger_job_id: str | None = None,
+    notify: bool = False,
+) -> dict[str, int]:
+    checkpoint = start_checkpoint(db, account.id, restart)
+    pages = iter_message_id_pages(
+        account,
+        chunk_size or settings.BACKFILL_CHUNK_SIZE,
+        checkpoint.page_token,
+        settings.BACKFILL_GMAIL_QUERY,
+    )
+    totals = {'processed': 0, 'relevant': 0, 'ignored': 0}
+    listed = 0
+    try:
+        for message_ids, next_page_token in pages:
+            lock_mailbox_for_chunk(db, account.id)
+            with track_run('backfill'):
+                known = find_processed_message_ids(db, message_ids)
+                new_ids = [message_id for message_id in message_ids if message_id not in known]
+                raw_messages = fetch_messages(account, new_ids) if new_ids else []
+                result, _ = process_messages(
+                    db,
+                    account,
+                    raw_messages,
+                    trigger_job_id=trigger_job_id,
+                    notify=notify,
+                )
+            del raw_messages
+
+            listed += len(message_ids)
+            checkpoint.page_token = next_page_token
+            checkpoint.pages += 1
+            checkpoint.processed += result['processed']
+            checkpoint.relevant += result['relevant']
+            checkpoint.skipped += len(message_ids) - result['processed']
+            checkpoint.updated_at = datetime.utcnow()
+            if next_page_token is None:
+                checkpoint.status = 'done'
+                checkpoint.finished_at = checkpoint.updated_at
+            elif max_messages and listed >= max_messages:
+                checkpoint.status = 'paused'
+            chunk = dict(
+                result,
+                page=checkpoint.pages,
+                listed=len(message_ids),
+                total_processed=checkpoint.processed,
+                status=checkpoint.status,
+            )
+            db.commit()
+
+            for key in totals:
+                totals[key] += result[key]
+            if progress:
+                progress('chunk', [chunk])
+            if chunk['status'] != 'running':
+                break
+    except Exception as exc:
+        db.rollback()
+        if checkpoint.status == 'running':
+            checkpoint.status = 'failed'
+            checkpoint.error = str(exc)[:2000]
+            checkpoint.updated_at = datetime.utcnow()
+            db.commit()
+        raise
+    finally:
+        pages.close()
+    return totals
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Backfill a connected mailbox in resumable chunks.')
+    parser.add_argument('account_id', type=int)
+    parser.add_argument('--chunk-size', type=int, default=settings.BACKFILL_CHUNK_SIZE)
+    parser.add_argument('--max-messages', type=int, default=0, help='stop after about this many messages (0 = all)')
+    parser.add_argument('--restart', action='store_true', help='ignore the saved checkpoint and start from the top')
+    parser.add_argument('--notify', action='store_true', help='forward and notify leads found in the backfill')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    with SessionLocal() as db:
+        account = db.get(GmailAccount, args.account_id)
+        if account is None:
+            parser.error(f'No Gmail account with id {args.account_id}')
+        totals = backfill_mailbox(
+            db,
+            account,
+            chunk_size=args.chunk_size,
+            max_messages=args.max_messages,
+            restart=args.restart,
+            notify=args.notify,
+            progress=lambda kind, items: logger.info('Backfilled chunk %s', items[0]),
+        )
+    logger.info('Backfill finished: %s', totals)
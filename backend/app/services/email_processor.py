@@ -1,78 +1,240 @@
+from collections.abc import Callable
+from datetime import datetime
+from typing import Any
+
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 
-from ..agents.email_agent import email_agent
+from ..agents.email_agent import classify_emails
 from ..config import settings
-from ..models import GmailAccount, ProcessedEmail
-from .gmail_client import extract_email_fields, fetch_latest_messages, send_email
-from .whatsapp import send_whatsapp_summary
+from ..database import dialect_insert, try_advisory_xact_lock
+from ..metrics import stage, track_run
+from ..models import GmailAccount, ProcessedEmail, ProcessedEmailKey
+from .gmail_client import extract_email_fields, fetch_latest_messages, send_email, send_emails, sync_mailbox
+from .outbox import enqueue_jobs, forward_email_job, whatsapp_notify_job
+from .stats import update_rollups
+from .whatsapp import whatsapp_configured
 
+BULK_CHUNK_SIZE = 1000
+MAILBOX_LOCK_NAMESPACE = 0x6D61696C
+REPLY_SUBJECT = 'Re: Follow-up'
+REPLY_TEMPLATE = (
+    'Hi,\n\n'
+    'Thank you for reaching out.\n\n'
+    'Based on your message: "{context}"\n'
+    'Our intended response: {intent}.\n\n'
+    'Can we schedule a short call to discuss next steps?\n\nBest regards'
+)
 
-def process_latest_emails(db: Session, account: GmailAccount, batch_size: int = 10) -> dict[str, int]:
-    raw_messages = fetch_latest_messages(account, max_results=batch_size)
-    processed_count = 0
-    relevant_count = 0
+Progress = Callable[[str, list[dict[str, Any]]], None]
 
-    for raw in raw_messages:
-        fields = extract_email_fields(raw)
-        if not fields['id']:
-            continue
 
-        exists = db.query(ProcessedEmail).filter(ProcessedEmail.gmail_message_id == fields['id']).first()
-        if exists:
-            continue
+def lock_mailbox(db: Session, account_id: int) -> bool:
+    return try_advisory_xact_lock(db, MAILBOX_LOCK_NAMESPACE, account_id)
+
 
-        state = {
-            'subject': fields['subject'],
-            'sender': fields['from'],
-            'snippet': fields['snippet'],
-            'is_relevant': False,
-            'confidence_reason': '',
-        }
-        result = email_agent.invoke(state)
-
-        processed = ProcessedEmail(
-            user_id=account.user_id,
-            gmail_message_id=fields['id'],
-            subject=fields['subject'],
-            sender=fields['from'],
-            snippet=fields['snippet'],
-            is_relevant=result['is_relevant'],
+def process_latest_emails(
+    db: Session,
+    account: GmailAccount,
+    batch_size: int = 10,
+    incremental: bool = False,
+    progress: Progress | None = None,
+    trigger_job_id: str | None = None,
+) -> dict[str, int]:
+    with track_run('incremental' if incremental else 'latest'):
+        if incremental:
+            raw_messages, history_id = sync_mailbox(account, max_results=batch_size)
+            account.history_id = history_id
+        else:
+            raw_messages = fetch_latest_messages(account, max_results=batch_size)
+
+        result, jobs = process_messages(db, account, raw_messages, progress, trigger_job_id)
+        with stage('db.commit'):
+            db.commit()
+    if progress:
+        progress(
+            'queued',
+            [{'gmail_message_id': job['gmail_message_id'], 'kind': job['kind']} for job in jobs],
         )
+    return result
 
-        if result['is_relevant']:
-            relevant_count += 1
-            processed.forwarded_to = settings.FORWARD_TO_EMAIL
-            forward_subject = f"FWD Lead Candidate: {fields['subject']}"
-            forward_body = (
-                f"Sender: {fields['from']}\n"
-                f"Subject: {fields['subject']}\n"
-                f"Snippet: {fields['snippet']}\n"
-                f"Reason: {result['confidence_reason']}"
-            )
-            send_email(account, settings.FORWARD_TO_EMAIL, forward_subject, forward_body)
 
-            sent_wa = send_whatsapp_summary(
-                f"New lead-like email from {fields['from']} | Subject: {fields['subject']}"
-            )
-            processed.whatsapp_notified = sent_wa
+def process_messages(
+    db: Session,
+    account: GmailAccount,
+    raw_messages: list[dict[str, Any]],
+    progress: Progress | None = None,
+    trigger_job_id: str | None = None,
+    notify: bool = True,
+) -> tuple[dict[str, int], list[dict]]:
+    candidates: dict[str, dict[str, str]] = {}
+    with stage('extract'):
+        for raw in raw_messages:
+            fields = extract_email_fields(raw)
+            if fields['id']:
+                candidates.setdefault(fields['id'], fields)
+
+    with stage('db.dedupe'):
+        already_processed = find_processed_message_ids(db, list(candidates))
+    new_fields = [fields for message_id, fields in candidates.items() if message_id not in already_processed]
+    if progress:
+        progress(
+            'fetched',
+            [
+                {
+                    'gmail_message_id': message_id,
+                    'subject': fields['subject'],
+                    'sender': fields['from'],
+                    'already_processed': message_id in already_processed,
+                }
+                for message_id, fields in candidates.items()
+            ],
+        )
+    results = classify_emails(
+        [
+            {
+                'subject': fields['subject'],
+                'sender': fields['from'],
+                'snippet': fields['body'] or fields['snippet'],
+                'is_relevant': False,
+                'confidence_reason': '',
+                'matched_rule': '',
+            }
+            for fields in new_fields
+        ]
+    )
+
+    if progress:
+        progress(
+            'classified',
+            [
+                {
+                    'gmail_message_id': fields['id'],
+                    'is_relevant': result['is_relevant'],
+                    'reason': result['confidence_reason'],
+                    'matched_rule': result.get('matched_rule', ''),
+                }
+                for fields, result in zip(new_fields, results)
+            ],
+        )
+
+    rows: list[dict] = []
+    reasons: dict[str, str] = {}
+    now = datetime.utcnow()
+    for fields, result in zip(new_fields, results):
+        reasons[fields['id']] = result['confidence_reason']
+        rows.append(
+            {
+                'user_id': account.user_id,
+                'gmail_message_id': fields['id'],
+                'subject': fields['subject'],
+                'sender': fields['from'],
+                'snippet': fields['snippet'],
+                'is_relevant': result['is_relevant'],
+                'is_spam': result.get('matched_rule', '').startswith('spam:'),
+                'forwarded_to': settings.FORWARD_TO_EMAIL if result['is_relevant'] else None,
+                'created_at': now,
+            }
+        )
+
+    with stage('db.insert'):
+        claimed = insert_new_processed_emails(db, rows)
+    processed_rows = [row for row in rows if row['gmail_message_id'] in claimed]
+    with stage('db.rollups'):
+        update_rollups(db, processed_rows)
+    jobs: list[dict] = []
+    for row in processed_rows:
+        if not notify or not row['is_relevant']:
+            continue
 
-        db.add(processed)
-        processed_count += 1
+        message_id = row['gmail_message_id']
+        forward_subject = f"FWD Lead Candidate: {row['subject']}"
+        forward_body = (
+            f"Sender: {row['sender']}\n"
+            f"Subject: {row['subject']}\n"
+            f"Snippet: {row['snippet']}\n"
+            f"Reason: {reasons[message_id]}"
+        )
+        jobs.append(
+            forward_email_job(
+                account.user_id,
+                message_id,
+                settings.FORWARD_TO_EMAIL,
+                forward_subject,
+                forward_body,
+                trigger_job_id,
+            )
+        )
+        if whatsapp_configured():
+            jobs.append(
+                whatsapp_notify_job(account.user_id, message_id, row['sender'], row['subject'], trigger_job_id)
+            )
 
-    db.commit()
-    return {
+    with stage('db.enqueue'):
+        enqueue_jobs(db, jobs)
+    processed_count = len(processed_rows)
+    relevant_count = sum(1 for row in processed_rows if row['is_relevant'])
+    result = {
         'processed': processed_count,
         'relevant': relevant_count,
         'ignored': processed_count - relevant_count,
     }
+    return result, jobs
+
+
+def find_processed_message_ids(db: Session, message_ids: list[str]) -> set[str]:
+    key = ProcessedEmailKey if settings.PROCESSED_EMAILS_PARTITIONED else ProcessedEmail
+    found: set[str] = set()
+    for start in range(0, len(message_ids), BULK_CHUNK_SIZE):
+        chunk = message_ids[start:start + BULK_CHUNK_SIZE]
+        found.update(db.scalars(select(key.gmail_message_id).where(key.gmail_message_id.in_(chunk))))
+    return found
+
+
+def insert_new_processed_emails(db: Session, rows: list[dict]) -> set[str]:
+    if not rows:
+        return set()
+
+    insert = dialect_insert(db.get_bind())
+    claimed: set[str] = set()
+    for start in range(0, len(rows), BULK_CHUNK_SIZE):
+        chunk = rows[start:start + BULK_CHUNK_SIZE]
+        if settings.PROCESSED_EMAILS_PARTITIONED:
+            key_rows = [{'gmail_message_id': row['gmail_message_id'], 'created_at': row['created_at']} for row in chunk]
+            keys = set(
+                db.scalars(
+                    insert(ProcessedEmailKey)
+                    .values(key_rows)
+                    .on_conflict_do_nothing(index_elements=[ProcessedEmailKey.gmail_message_id])
+                    .returning(ProcessedEmailKey.gmail_message_id)
+                )
+            )
+            chunk = [row for row in chunk if row['gmail_message_id'] in keys]
+            if chunk:
+                db.execute(insert(ProcessedEmail).values(chunk))
+            claimed.update(keys)
+            continue
+        stmt = (
+            insert(ProcessedEmail)
+            .values(chunk)
+            .on_conflict_do_nothing(index_elements=[ProcessedEmail.gmail_message_id])
+            .returning(ProcessedEmail.gmail_message_id)
+        )
+        claimed.update(db.scalars(stmt))
+    return claimed
+
+
+def render_reply(original_context: str, intent: str) -> str:
+    return REPLY_TEMPLATE.format(context=original_context[:500], intent=intent)
 
 
 def generate_reply_and_send(account: GmailAccount, to_email: str, original_context: str, intent: str) -> None:
-    body = (
-        'Hi,\n\n'
-        'Thank you for reaching out.\n\n'
-        f'Based on your message: "{original_context[:500]}"\n'
-        f'Our intended response: {intent}.\n\n'
-        'Can we schedule a short call to discuss next steps?\n\nBest regards'
+    send_email(account, to_email, REPLY_SUBJECT, render_reply(original_context, intent))
+
+
+def send_replies(account: GmailAccount, replies: list[dict[str, str]]) -> list[dict[str, Any]]:
+    outgoing = (
+        (reply['to_email'], REPLY_SUBJECT, render_reply(reply['original_context'], reply['intent']))
+        for reply in replies
     )
-    send_email(account, to_email, 'Re: Follow-up', body)
+    return send_emails(account, outgoing)
@@ -1,21 +1,78 @@
 import base64
+import contextvars
+import html
+import importlib
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Iterable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass
 from email.mime.text import MIMEText
-from typing import Any
+from functools import lru_cache
+from typing import TYPE_CHECKING, Any
 
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import Flow
-from googleapiclient.discovery import build
+from googleapiclient.errors import HttpError
 
 from ..config import settings
+from ..metrics import count_api_call, stage
 from ..models import GmailAccount
+from .rate_limit import (
+    RateLimitedError,
+    SendOutcomeUnknownError,
+    backoff_delay,
+    call_with_backoff,
+    parse_retry_after,
+    rate_limiter,
+)
+
+if TYPE_CHECKING:
+    from google.oauth2.credentials import Credentials
+    from google_auth_httplib2 import AuthorizedHttp
+    from google_auth_oauthlib.flow import Flow
 
 GMAIL_SCOPES = [
     'https://www.googleapis.com/auth/gmail.readonly',
     'https://www.googleapis.com/auth/gmail.send',
 ]
+METADATA_HEADERS = ['Subject', 'From']
+GMAIL_BATCH_SIZE = 50
+GMAIL_FULL_BATCH_SIZE = 10
+GMAIL_MAX_LIST_RESULTS = 500
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+GMAIL_QUOTA_UNITS = {
+    'messages.list': 5,
+    'messages.get': 5,
+    'messages.send': 100,
+    'history.list': 2,
+    'getProfile': 1,
+    'watch': 100,
+}
+GOOGLE_CLIENT_MODULES = (
+    'httplib2',
+    'google.oauth2.credentials',
+    'google_auth_httplib2',
+    'google_auth_oauthlib.flow',
+    'googleapiclient.discovery',
+)
+TEXT_MIME_TYPES = ('text/plain', 'text/html')
+CHARSET = re.compile(r'charset="?([\w.:-]+)', re.IGNORECASE)
+HTML_HIDDEN = re.compile(r'<(script|style|head)\b.*?(</\1\s*>|$)', re.IGNORECASE | re.DOTALL)
+HTML_TAG = re.compile(r'<[^>]*(>|$)')
+HTML_MARKUP_FACTOR = 4
+WHITESPACE = re.compile(r'\s+')
+
+
+class HistoryExpiredError(Exception):
+    pass
 
 
-def build_gmail_flow(state: str | None = None) -> Flow:
+def build_gmail_flow(state: str | None = None) -> 'Flow':
+    from google_auth_oauthlib.flow import Flow
+
     client_config = {
         'web': {
             'client_id': settings.GOOGLE_CLIENT_ID,
@@ -32,7 +89,9 @@ def build_gmail_flow(state: str | None = None) -> Flow:
     )
 
 
-def account_to_credentials(account: GmailAccount) -> Credentials:
+def account_to_credentials(account: GmailAccount) -> 'Credentials':
+    from google.oauth2.credentials import Credentials
+
     return Credentials(
         token=account.access_token,
         refresh_token=account.refresh_token,
@@ -40,23 +99,377 @@ def account_to_credentials(account: GmailAccount) -> Credentials:
         client_id=account.client_id or settings.GOOGLE_CLIENT_ID,
         client_secret=account.client_secret or settings.GOOGLE_CLIENT_SECRET,
         scopes=(account.scopes or ' '.join(GMAIL_SCOPES)).split(' '),
+        expiry=account.token_expiry,
     )
 
 
-def get_gmail_service(account: GmailAccount):
-    creds = account_to_credentials(account)
-    return build('gmail', 'v1', credentials=creds)
+def warm_gmail_client() -> None:
+    for module in GOOGLE_CLIENT_MODULES:
+        importlib.import_module(module)
+
+
+@lru_cache(maxsize=1)
+def load_gmail_discovery() -> dict[str, Any]:
+    from googleapiclient.discovery_cache import get_static_doc
+
+    document = json.loads(get_static_doc('gmail', 'v1'))
+    if settings.GMAIL_API_ROOT_URL:
+        document['rootUrl'] = settings.GMAIL_API_ROOT_URL
+    return document
+
+
+def gmail_http(credentials: 'Credentials', **options: Any) -> 'AuthorizedHttp':
+    import httplib2
+    from google_auth_httplib2 import AuthorizedHttp
+
+    return AuthorizedHttp(credentials, http=httplib2.Http(timeout=settings.GMAIL_HTTP_TIMEOUT_SECONDS), **options)
+
+
+def get_gmail_service(account: GmailAccount, credentials: 'Credentials | None' = None):
+    from googleapiclient.discovery import build_from_document
+
+    creds = credentials or account_to_credentials(account)
+    return build_from_document(load_gmail_discovery(), http=gmail_http(creds))
+
+
+@dataclass
+class CachedGmailService:
+    service: Any
+    credentials: 'Credentials'
+    lock: threading.Lock
+    refresh_lock: threading.Lock
+    expires_at: float
+
+
+class GmailServiceCache:
+    def __init__(self, max_size: int, ttl_seconds: float):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries: OrderedDict[int, CachedGmailService] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def checkout(self, account: GmailAccount) -> CachedGmailService:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(account.id)
+            if entry is None or entry.expires_at <= now:
+                creds = account_to_credentials(account)
+                entry = CachedGmailService(
+                    service=get_gmail_service(account, creds),
+                    credentials=creds,
+                    lock=threading.Lock(),
+                    refresh_lock=threading.Lock(),
+                    expires_at=now + self.ttl_seconds,
+                )
+                self._entries[account.id] = entry
+            self._entries.move_to_end(account.id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+            return entry
+
+    def invalidate(self, account_id: int) -> None:
+        with self._lock:
+            self._entries.pop(account_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+service_cache = GmailServiceCache(
+    max_size=settings.GMAIL_SERVICE_CACHE_SIZE,
+    ttl_seconds=settings.GMAIL_SERVICE_CACHE_TTL_SECONDS,
+)
+
+
+@contextmanager
+def gmail_service(account: GmailAccount) -> Iterator[Any]:
+    entry = service_cache.checkout(account)
+    with entry.lock:
+        try:
+            yield entry.service
+        finally:
+            persist_refreshed_token(account, entry.credentials)
+
+
+def credentials_stale(credentials: 'Credentials', rejected_token: str | None = None) -> bool:
+    # Accounts connected before token_expiry was stored have no expiry, which google-auth reports as valid.
+    if credentials.expiry is None and credentials.refresh_token:
+        return True
+    return not credentials.valid or (rejected_token is not None and credentials.token == rejected_token)
+
+
+def refresh_credentials(entry: CachedGmailService, rejected_token: str | None = None) -> None:
+    import httplib2
+    from google_auth_httplib2 import Request
+
+    if not credentials_stale(entry.credentials, rejected_token):
+        return
+    with entry.refresh_lock:
+        if credentials_stale(entry.credentials, rejected_token):
+            entry.credentials.refresh(Request(httplib2.Http(timeout=settings.GMAIL_HTTP_TIMEOUT_SECONDS)))
+
+
+def persist_refreshed_token(account: GmailAccount, creds: 'Credentials') -> None:
+    if creds.token and creds.token != account.access_token:
+        account.access_token = creds.token
+        account.token_expiry = creds.expiry
+
+
+def gmail_retry_hint(exc: Exception) -> tuple[bool, float | None]:
+    if isinstance(exc, (TimeoutError, ConnectionError)):
+        return True, None
+    if not isinstance(exc, HttpError):
+        return False, None
+    status = exc.resp.status
+    rate_limited = status == 403 and b'ratelimitexceeded' in (exc.content or b'').lower()
+    return status in RETRYABLE_STATUSES or rate_limited, parse_retry_after(exc.resp.get('retry-after'))
+
+
+def send_may_have_landed(exc: Exception) -> bool:
+    # A send that timed out or hit a 5xx may already be in the mailbox, so it is never resent blindly.
+    if isinstance(exc, ConnectionRefusedError):
+        return False
+    if isinstance(exc, (TimeoutError, ConnectionError)):
+        return True
+    return isinstance(exc, HttpError) and exc.resp.status >= 500
+
+
+def acquire_gmail_quota(account_id: int | None, units: int) -> None:
+    if account_id is not None:
+        rate_limiter.acquire('Gmail', f'gmail:user:{account_id}', units, settings.GMAIL_USER_QUOTA_UNITS_PER_SECOND)
+    rate_limiter.acquire('Gmail', 'gmail:project', units, settings.GMAIL_PROJECT_QUOTA_UNITS_PER_SECOND)
+
+
+def call_outcome(exc: Exception) -> str:
+    return str(exc.resp.status) if isinstance(exc, HttpError) else type(exc).__name__
+
+
+def execute_gmail(request, account_id: int | None, method: str) -> dict[str, Any]:
+    def attempt() -> dict[str, Any]:
+        acquire_gmail_quota(account_id, GMAIL_QUOTA_UNITS[method])
+        try:
+            response = request.execute()
+        except Exception as exc:
+            count_api_call('gmail', method, call_outcome(exc))
+            if method == 'messages.send' and send_may_have_landed(exc):
+                raise SendOutcomeUnknownError(f'Gmail send outcome is unknown: {exc}') from exc
+            raise
+        count_api_call('gmail', method)
+        return response
+
+    with stage(f'gmail.{method}'):
+        return call_with_backoff('Gmail', attempt, gmail_retry_hint)
 
 
 def fetch_latest_messages(account: GmailAccount, max_results: int = 10) -> list[dict[str, Any]]:
-    service = get_gmail_service(account)
-    result = service.users().messages().list(userId='me', maxResults=max_results).execute()
-    messages = result.get('messages', [])
-    full_messages: list[dict[str, Any]] = []
-    for msg in messages:
-        msg_obj = service.users().messages().get(userId='me', id=msg['id']).execute()
-        full_messages.append(msg_obj)
-    return full_messages
+    with gmail_service(account) as service:
+        request = service.users().messages().list(userId='me', maxResults=max_results)
+        result = execute_gmail(request, account.id, 'messages.list')
+        message_ids = [msg['id'] for msg in result.get('messages', [])]
+        return fetch_messages_batched(service, message_ids, account_id=account.id)
+
+
+def iter_message_id_pages(
+    account: GmailAccount,
+    page_size: int,
+    page_token: str | None = None,
+    query: str | None = None,
+) -> Iterator[tuple[list[str], str | None]]:
+    while True:
+        with gmail_service(account) as service:
+            request = service.users().messages().list(
+                userId='me',
+                maxResults=min(page_size, GMAIL_MAX_LIST_RESULTS),
+                pageToken=page_token,
+                q=query or None,
+            )
+            result = execute_gmail(request, account.id, 'messages.list')
+        page_token = result.get('nextPageToken')
+        yield [msg['id'] for msg in result.get('messages', [])], page_token
+        if not page_token:
+            return
+
+
+def fetch_messages(account: GmailAccount, message_ids: list[str]) -> list[dict[str, Any]]:
+    with gmail_service(account) as service:
+        return fetch_messages_batched(service, message_ids, account_id=account.id)
+
+
+def sync_mailbox(account: GmailAccount, max_results: int = 10) -> tuple[list[dict[str, Any]], str]:
+    with gmail_service(account) as service:
+        if account.history_id:
+            try:
+                message_ids, history_id = list_new_message_ids(service, account.history_id, max_results, account.id)
+                return fetch_messages_batched(service, message_ids, account_id=account.id), history_id
+            except HistoryExpiredError:
+                pass
+
+        profile = execute_gmail(service.users().getProfile(userId='me'), account.id, 'getProfile')
+        account.gmail_email = profile.get('emailAddress') or account.gmail_email
+        request = service.users().messages().list(userId='me', labelIds=['INBOX'], maxResults=max_results)
+        result = execute_gmail(request, account.id, 'messages.list')
+        message_ids = [msg['id'] for msg in result.get('messages', [])]
+        return fetch_messages_batched(service, message_ids, account_id=account.id), str(profile['historyId'])
+
+
+def list_new_message_ids(
+    service,
+    start_history_id: str,
+    max_results: int,
+    account_id: int | None = None,
+) -> tuple[list[str], str]:
+    message_ids: list[str] = []
+    cursor = start_history_id
+    page_token = None
+    while True:
+        try:
+            request = service.users().history().list(
+                userId='me',
+                startHistoryId=start_history_id,
+                historyTypes='messageAdded',
+                labelId='INBOX',
+                pageToken=page_token,
+            )
+            response = execute_gmail(request, account_id, 'history.list')
+        except HttpError as exc:
+            if exc.resp.status == 404:
+                raise HistoryExpiredError(start_history_id) from exc
+            raise
+
+        for record in response.get('history', []):
+            added = [item['message']['id'] for item in record.get('messagesAdded', [])]
+            if message_ids and len(message_ids) + len(added) > max_results:
+                return message_ids, cursor
+            message_ids.extend(added)
+            cursor = str(record['id'])
+
+        page_token = response.get('nextPageToken')
+        if not page_token:
+            return message_ids, str(response.get('historyId', cursor))
+
+
+def fetch_messages_batched(
+    service,
+    message_ids: list[str],
+    max_attempts: int = 4,
+    account_id: int | None = None,
+) -> list[dict[str, Any]]:
+    fetched: dict[str, dict[str, Any]] = {}
+    pending = list(dict.fromkeys(message_ids))
+    messages = service.users().messages()
+    full = settings.EMAIL_BODY_EXTRACTION
+    batch_size = GMAIL_FULL_BATCH_SIZE if full else GMAIL_BATCH_SIZE
+    options = {'format': 'full'} if full else {'format': 'metadata', 'metadataHeaders': METADATA_HEADERS}
+
+    with stage('gmail.fetch'):
+        for attempt in range(max_attempts):
+            retry: list[str] = []
+            retry_after: list[float] = []
+            failures: list[HttpError] = []
+
+            def on_response(request_id: str, response: dict[str, Any], exception: HttpError | None) -> None:
+                if exception is None:
+                    count_api_call('gmail', 'messages.get')
+                    fetched[request_id] = compact_message(response) if full else response
+                    return
+                count_api_call('gmail', 'messages.get', call_outcome(exception))
+                retryable, hint = gmail_retry_hint(exception)
+                if retryable:
+                    retry.append(request_id)
+                    if hint is not None:
+                        retry_after.append(hint)
+                elif exception.resp.status != 404:
+                    failures.append(exception)
+
+            for start in range(0, len(pending), batch_size):
+                chunk = pending[start:start + batch_size]
+                batch = service.new_batch_http_request(callback=on_response)
+                for message_id in chunk:
+                    batch.add(messages.get(userId='me', id=message_id, **options), request_id=message_id)
+                acquire_gmail_quota(account_id, len(chunk) * GMAIL_QUOTA_UNITS['messages.get'])
+                batch.execute()
+
+            if failures:
+                raise failures[0]
+            if not retry:
+                break
+            delay = backoff_delay(attempt, max(retry_after) if retry_after else None)
+            if attempt == max_attempts - 1:
+                raise RateLimitedError('Gmail', delay)
+            pending = retry
+            time.sleep(delay)
+
+    return [fetched[message_id] for message_id in message_ids if message_id in fetched]
+
+
+def fetch_gmail_address(account: GmailAccount, credentials: 'Credentials') -> str:
+    service = get_gmail_service(account, credentials)
+    return execute_gmail(service.users().getProfile(userId='me'), account.id, 'getProfile')['emailAddress']
+
+
+def start_watch(account: GmailAccount) -> dict[str, Any]:
+    body = {'topicName': settings.GMAIL_PUSH_TOPIC, 'labelIds': ['INBOX'], 'labelFilterBehavior': 'include'}
+    with gmail_service(account) as service:
+        profile = execute_gmail(service.users().getProfile(userId='me'), account.id, 'getProfile')
+        account.gmail_email = profile['emailAddress']
+        return execute_gmail(service.users().watch(userId='me', body=body), account.id, 'watch')
+
+
+def iter_text_parts(payload: dict[str, Any]) -> Iterator[dict[str, Any]]:
+    stack = [payload]
+    while stack:
+        part = stack.pop()
+        children = part.get('parts')
+        if children:
+            stack.extend(reversed(children))
+        elif part.get('mimeType') in TEXT_MIME_TYPES and not part.get('filename') and part.get('body', {}).get('data'):
+            yield part
+
+
+def decode_part(part: dict[str, Any], max_bytes: int) -> str:
+    data = part['body']['data'][:-(-max_bytes // 3) * 4]
+    raw = base64.urlsafe_b64decode(data + '=' * (-len(data) % 4))[:max_bytes]
+    content_type = next((h['value'] for h in part.get('headers', []) if h['name'].lower() == 'content-type'), '')
+    match = CHARSET.search(content_type)
+    try:
+        return raw.decode(match[1] if match else 'utf-8', errors='replace')
+    except LookupError:
+        return raw.decode('utf-8', errors='replace')
+
+
+def strip_html(markup: str) -> str:
+    return html.unescape(HTML_TAG.sub(' ', HTML_HIDDEN.sub(' ', markup)))
+
+
+def extract_body(payload: dict[str, Any], max_bytes: int) -> str:
+    texts: list[str] = []
+    html_part = None
+    remaining = max_bytes
+    for part in iter_text_parts(payload):
+        if part['mimeType'] == 'text/html':
+            html_part = html_part or part
+            continue
+        texts.append(decode_part(part, remaining))
+        remaining -= len(texts[-1])
+        if remaining <= 0:
+            break
+    text = WHITESPACE.sub(' ', ' '.join(texts)).strip()
+    if not text and html_part is not None:
+        text = WHITESPACE.sub(' ', strip_html(decode_part(html_part, max_bytes * HTML_MARKUP_FACTOR))).strip()
+    return text[:max_bytes]
+
+
+def compact_message(message: dict[str, Any]) -> dict[str, Any]:
+    payload = message.get('payload', {})
+    wanted = {name.lower() for name in METADATA_HEADERS}
+    return {
+        'id': message.get('id'),
+        'threadId': message.get('threadId'),
+        'snippet': message.get('snippet', ''),
+        'payload': {'headers': [h for h in payload.get('headers', []) if h.get('name', '').lower() in wanted]},
+        'body': extract_body(payload, settings.EMAIL_BODY_MAX_BYTES),
+    }
 
 
 def extract_email_fields(message: dict[str, Any]) -> dict[str, str]:
@@ -68,13 +481,94 @@ def extract_email_fields(message: dict[str, Any]) -> dict[str, str]:
         'subject': header_map.get('subject', ''),
         'from': header_map.get('from', ''),
         'snippet': message.get('snippet', ''),
+        'body': message.get('body', ''),
     }
 
 
-def send_email(account: GmailAccount, to_email: str, subject: str, body: str) -> None:
-    service = get_gmail_service(account)
-    mime = MIMEText(body)
-    mime['to'] = to_email
+@lru_cache(maxsize=64)
+def mime_header_block(subject: str) -> bytes:
+    mime = MIMEText('', 'plain', 'utf-8')
     mime['subject'] = subject
-    raw_message = base64.urlsafe_b64encode(mime.as_bytes()).decode()
-    service.users().messages().send(userId='me', body={'raw': raw_message}).execute()
+    return mime.as_bytes().partition(b'\n\n')[0]
+
+
+def encode_message(to_email: str, subject: str, body: str) -> str:
+    if '\r' in to_email or '\n' in to_email:
+        raise ValueError(f'Invalid recipient address: {to_email!r}')
+    message = b''.join(
+        (mime_header_block(subject), b'\nto: ', to_email.encode(), b'\n\n', base64.encodebytes(body.encode()))
+    )
+    return base64.urlsafe_b64encode(message).decode()
+
+
+def send_email(account: GmailAccount, to_email: str, subject: str, body: str) -> None:
+    raw_message = encode_message(to_email, subject, body)
+    with gmail_service(account) as service:
+        request = service.users().messages().send(userId='me', body={'raw': raw_message})
+        execute_gmail(request, account.id, 'messages.send')
+
+
+send_slots_lock = threading.Lock()
+send_slots: dict[int, threading.BoundedSemaphore] = {}
+
+
+def account_send_slots(account_id: int) -> threading.BoundedSemaphore:
+    with send_slots_lock:
+        if account_id not in send_slots:
+            send_slots[account_id] = threading.BoundedSemaphore(settings.GMAIL_SEND_CONCURRENCY)
+        return send_slots[account_id]
+
+
+def send_emails(account: GmailAccount, outgoing: Iterable[tuple[str, str, str]]) -> list[dict[str, Any]]:
+    entry = service_cache.checkout(account)
+    slots = account_send_slots(account.id)
+    pending = enumerate(outgoing)
+    pull_lock = threading.Lock()
+    results: dict[int, dict[str, Any]] = {}
+    throttled: list[float] = []
+
+    def send_all() -> None:
+        http = gmail_http(entry.credentials, refresh_status_codes=())
+        messages = entry.service.users().messages()
+
+        def send_raw(raw_message: str) -> dict[str, Any]:
+            request = messages.send(userId='me', body={'raw': raw_message})
+            request.http = http
+            return execute_gmail(request, account.id, 'messages.send')
+
+        while True:
+            with pull_lock:
+                item = next(pending, None)
+            if item is None:
+                return
+            index, (to_email, subject, body) = item
+            if throttled:
+                results[index] = {'to_email': to_email, 'status': 'rate_limited', 'retry_after': throttled[0]}
+                continue
+            try:
+                raw_message = encode_message(to_email, subject, body)
+                refresh_credentials(entry)
+                token = entry.credentials.token
+                with slots:
+                    try:
+                        response = send_raw(raw_message)
+                    except HttpError as exc:
+                        if exc.resp.status != 401:
+                            raise
+                        refresh_credentials(entry, rejected_token=token)
+                        response = send_raw(raw_message)
+            except RateLimitedError as exc:
+                throttled.append(exc.retry_after)
+                results[index] = {'to_email': to_email, 'status': 'rate_limited', 'retry_after': exc.retry_after}
+            except Exception as exc:
+                results[index] = {'to_email': to_email, 'status': 'failed', 'error': str(exc)}
+            else:
+                results[index] = {'to_email': to_email, 'status': 'sent', 'message_id': response.get('id')}
+
+    workers = max(1, settings.GMAIL_SEND_CONCURRENCY)
+    with stage('gmail.send_bulk'), ThreadPoolExecutor(max_workers=workers, thread_name_prefix='gmail-send') as pool:
+        futures = [pool.submit(contextvars.copy_context().run, send_all) for _ in range(workers)]
+        for future in futures:
+            future.result()
+    persist_refreshed_token(account, entry.credentials)
+    return [results[index] for index in sorted(results)]
@@ -0,0 +1,61 @@
+import logging
+import threading
+from datetime import datetime, timedelta
+
+from sqlalchemy import or_, select
+from sqlalchemy.orm import Session, sessionmaker
+
+from ..config import settings
+from ..database import SessionLocal
+from ..models import GmailAccount
+from .gmail_client import start_watch
+
+logger = logging.getLogger(__name__)
+
+
+def renew_expiring_watches(db: Session) -> int:
+    renew_before = datetime.utcnow() + timedelta(hours=settings.GMAIL_WATCH_RENEW_BEFORE_HOURS)
+    accounts = db.scalars(
+        select(GmailAccount).where(
+            or_(GmailAccount.watch_expiration.is_(None), GmailAccount.watch_expiration < renew_before)
+        )
+    ).all()
+
+    renewed = 0
+    for account in accounts:
+        try:
+            response = start_watch(account)
+        except Exception:
+            logger.exception('Renewing Gmail watch for account %s failed', account.id)
+            continue
+        account.watch_expiration = datetime.utcfromtimestamp(int(response['expiration']) / 1000)
+        if not account.history_id:
+            account.history_id = str(response['historyId'])
+        db.commit()
+        renewed += 1
+    return renewed
+
+
+class WatchRenewer:
+    def __init__(self, session_factory: sessionmaker = SessionLocal):
+        self.session_factory = session_factory
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def run_forever(self) -> None:
+        while not self._stop.is_set():
+            try:
+                with self.session_factory() as db:
+                    renew_expiring_watches(db)
+            except Exception:
+                logger.exception('Gmail watch renewal failed')
+            self._stop.wait(settings.GMAIL_WATCH_CHECK_INTERVAL_SECONDS)
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self.run_forever, name='gmail-watch-renewer', daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
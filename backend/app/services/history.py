@@ -0,0 +1,93 @@
+import base64
+import csv
+import io
+import json
+from collections.abc import AsyncIterator
+from datetime import datetime
+
+from sqlalchemy import Select, and_, or_, select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from ..database import AsyncSessionLocal
+from ..models import ProcessedEmail
+
+EXPORT_BATCH_SIZE = 1000
+HISTORY_COLUMNS = (
+    ProcessedEmail.id,
+    ProcessedEmail.gmail_message_id,
+    ProcessedEmail.subject,
+    ProcessedEmail.sender,
+    ProcessedEmail.is_relevant,
+    ProcessedEmail.forwarded_to,
+    ProcessedEmail.whatsapp_notified,
+    ProcessedEmail.created_at,
+)
+HISTORY_FIELDS = [column.key for column in HISTORY_COLUMNS]
+
+
+def encode_cursor(created_at: datetime, row_id: int) -> str:
+    return base64.urlsafe_b64encode(json.dumps([created_at.isoformat(), row_id]).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(created_at), int(row_id)
+    except (ValueError, TypeError) as exc:
+        raise ValueError('Invalid history cursor') from exc
+
+
+def history_query(
+    user_id: int,
+    relevant: bool | None = None,
+    sender: str | None = None,
+    since: datetime | None = None,
+    until: datetime | None = None,
+    after: tuple[datetime, int] | None = None,
+) -> Select:
+    stmt = select(*HISTORY_COLUMNS).where(ProcessedEmail.user_id == user_id)
+    if relevant is not None:
+        stmt = stmt.where(ProcessedEmail.is_relevant.is_(relevant))
+    if sender:
+        stmt = stmt.where(ProcessedEmail.sender.icontains(sender, autoescape=True))
+    if since is not None:
+        stmt = stmt.where(ProcessedEmail.created_at >= since)
+    if until is not None:
+        stmt = stmt.where(ProcessedEmail.created_at < until)
+    if after is not None:
+        created_at, row_id = after
+        stmt = stmt.where(
+            or_(
+                ProcessedEmail.created_at < created_at,
+                and_(ProcessedEmail.created_at == created_at, ProcessedEmail.id < row_id),
+            )
+        )
+    return stmt.order_by(ProcessedEmail.created_at.desc(), ProcessedEmail.id.desc())
+
+
+def ndjson_lines(rows) -> str:
+    return ''.join(
+        json.dumps({field: value for field, value in zip(HISTORY_FIELDS, row)}, default=str) + '\n' for row in rows
+    )
+
+
+def csv_lines(rows, header: bool = False) -> str:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(HISTORY_FIELDS)
+    writer.writerows(rows)
+    return buffer.getvalue()
+
+
+async def stream_history(
+    stmt: Select,
+    fmt: str,
+    session_factory: async_sessionmaker = AsyncSessionLocal,
+) -> AsyncIterator[str]:
+    if fmt == 'csv':
+        yield csv_lines([], header=True)
+    async with session_factory() as db:
+        result = await db.stream(stmt.execution_options(yield_per=EXPORT_BATCH_SIZE))
+        async for rows in result.partitions():
+            yield csv_lines(rows) if fmt == 'csv' else ndjson_lines(rows)
@@ -0,0 +1,317 @@
+import json
+import logging
+import random
+import threading
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Any
+
+from sqlalchemy import and_, or_, select, update
+from sqlalchemy.orm import Session, sessionmaker
+
+from ..config import settings
+from ..database import SessionLocal, dialect_insert
+from ..metrics import OUTBOX_JOBS
+from ..models import GmailAccount, OutboxJob, ProcessedEmail, TriggerJobEvent
+from .gmail_client import send_email
+from .rate_limit import RateLimitedError, SendOutcomeUnknownError
+from .whatsapp import format_digest, send_whatsapp_summary
+
+logger = logging.getLogger(__name__)
+
+FORWARD_EMAIL = 'forward_email'
+WHATSAPP_NOTIFY = 'whatsapp_notify'
+ENQUEUE_CHUNK_SIZE = 1000
+
+
+JOB_EVENT_KINDS = {FORWARD_EMAIL: 'forwarded', WHATSAPP_NOTIFY: 'notified'}
+
+
+def forward_email_job(
+    user_id: int,
+    gmail_message_id: str,
+    to_email: str,
+    subject: str,
+    body: str,
+    trigger_job_id: str | None = None,
+) -> dict[str, Any]:
+    return {
+        'user_id': user_id,
+        'kind': FORWARD_EMAIL,
+        'idempotency_key': f'{FORWARD_EMAIL}:{gmail_message_id}',
+        'gmail_message_id': gmail_message_id,
+        'trigger_job_id': trigger_job_id,
+        'payload': json.dumps({'to': to_email, 'subject': subject, 'body': body}),
+    }
+
+
+def whatsapp_notify_job(
+    user_id: int,
+    gmail_message_id: str,
+    sender: str,
+    subject: str,
+    trigger_job_id: str | None = None,
+) -> dict[str, Any]:
+    payload = {
+        'to': settings.TWILIO_WHATSAPP_TO,
+        'sender': sender,
+        'subject': subject,
+        'message': f'New lead-like email from {sender} | Subject: {subject}',
+    }
+    return {
+        'user_id': user_id,
+        'kind': WHATSAPP_NOTIFY,
+        'idempotency_key': f'{WHATSAPP_NOTIFY}:{gmail_message_id}',
+        'gmail_message_id': gmail_message_id,
+        'trigger_job_id': trigger_job_id,
+        'payload': json.dumps(payload),
+    }
+
+
+def digest_enabled() -> bool:
+    return settings.WHATSAPP_DIGEST_WINDOW_SECONDS > 0
+
+
+def enqueue_jobs(db: Session, jobs: list[dict[str, Any]]) -> None:
+    if not jobs:
+        return
+    insert = dialect_insert(db.get_bind())
+    for start in range(0, len(jobs), ENQUEUE_CHUNK_SIZE):
+        db.execute(
+            insert(OutboxJob)
+            .values(jobs[start:start + ENQUEUE_CHUNK_SIZE])
+            .on_conflict_do_nothing(index_elements=[OutboxJob.idempotency_key])
+        )
+
+
+def due_condition(now: datetime):
+    lease_expired = now - timedelta(seconds=settings.OUTBOX_LEASE_SECONDS)
+    return or_(
+        and_(OutboxJob.status == 'pending', OutboxJob.next_attempt_at <= now),
+        and_(OutboxJob.status == 'in_progress', OutboxJob.locked_at < lease_expired),
+    )
+
+
+def mark_claimed(db: Session, job_ids: list[int], now: datetime) -> None:
+    if job_ids:
+        db.execute(
+            update(OutboxJob)
+            .where(OutboxJob.id.in_(job_ids))
+            .values(status='in_progress', locked_at=now, attempts=OutboxJob.attempts + 1)
+        )
+
+
+def claim_due_jobs(db: Session, limit: int, exclude_kinds: tuple[str, ...] = ()) -> list[int]:
+    now = datetime.utcnow()
+    query = select(OutboxJob.id).where(due_condition(now))
+    if exclude_kinds:
+        query = query.where(OutboxJob.kind.not_in(exclude_kinds))
+    job_ids = list(
+        db.scalars(query.order_by(OutboxJob.next_attempt_at).limit(limit).with_for_update(skip_locked=True))
+    )
+    mark_claimed(db, job_ids, now)
+    db.commit()
+    return job_ids
+
+
+def claim_due_digests(db: Session, limit: int) -> list[list[int]]:
+    now = datetime.utcnow()
+    max_items = settings.WHATSAPP_DIGEST_MAX_ITEMS
+    window_start = now - timedelta(seconds=settings.WHATSAPP_DIGEST_WINDOW_SECONDS)
+    rows = db.execute(
+        select(OutboxJob.id, OutboxJob.payload, OutboxJob.created_at)
+        .where(OutboxJob.kind == WHATSAPP_NOTIFY, due_condition(now))
+        .order_by(OutboxJob.created_at, OutboxJob.id)
+        .limit(limit * max_items)
+        .with_for_update(skip_locked=True)
+    ).all()
+    by_recipient: dict[str, list[Any]] = {}
+    for row in rows:
+        by_recipient.setdefault(json.loads(row.payload).get('to') or settings.TWILIO_WHATSAPP_TO, []).append(row)
+
+    digests: list[list[int]] = []
+    for pending in by_recipient.values():
+        while pending and len(digests) < limit:
+            if len(pending) < max_items and pending[0].created_at > window_start:
+                break
+            digests.append([row.id for row in pending[:max_items]])
+            pending = pending[max_items:]
+    mark_claimed(db, [job_id for digest in digests for job_id in digest], now)
+    db.commit()
+    return digests
+
+
+def execute_job(db: Session, job: OutboxJob) -> None:
+    payload = json.loads(job.payload)
+    if job.kind == FORWARD_EMAIL:
+        account = db.query(GmailAccount).filter(GmailAccount.user_id == job.user_id).first()
+        if account is None:
+            raise RuntimeError(f'No Gmail account for user {job.user_id}')
+        send_email(account, payload['to'], payload['subject'], payload['body'])
+    elif job.kind == WHATSAPP_NOTIFY:
+        if not send_whatsapp_summary(payload['message'], payload.get('to')):
+            raise RuntimeError('Twilio did not accept the WhatsApp message')
+        db.execute(
+            update(ProcessedEmail)
+            .where(ProcessedEmail.gmail_message_id == job.gmail_message_id)
+            .values(whatsapp_notified=True)
+        )
+    else:
+        raise ValueError(f'Unknown outbox job kind: {job.kind}')
+
+
+def execute_digest(db: Session, jobs: list[OutboxJob]) -> None:
+    payloads = [json.loads(job.payload) for job in jobs]
+    if not send_whatsapp_summary(format_digest(payloads), payloads[0].get('to')):
+        raise RuntimeError('Twilio did not accept the WhatsApp digest')
+    db.execute(
+        update(ProcessedEmail)
+        .where(ProcessedEmail.gmail_message_id.in_([job.gmail_message_id for job in jobs]))
+        .values(whatsapp_notified=True)
+    )
+
+
+def retry_delay(attempts: int) -> timedelta:
+    delay = min(settings.OUTBOX_RETRY_BASE_SECONDS * 2 ** (attempts - 1), 900)
+    return timedelta(seconds=delay * (0.5 + random.random() / 2))
+
+
+def settle_job(db: Session, job: OutboxJob, exc: Exception | None = None) -> None:
+    if exc is None:
+        job.status = 'done'
+        job.last_error = None
+    else:
+        logger.warning('Outbox job %s (%s) failed on attempt %s: %s', job.id, job.kind, job.attempts, exc)
+        job.last_error = str(exc)[:2000]
+        if isinstance(exc, RateLimitedError):
+            job.status = 'pending'
+            job.attempts -= 1
+            job.next_attempt_at = datetime.utcnow() + timedelta(seconds=exc.retry_after)
+        elif isinstance(exc, SendOutcomeUnknownError) or job.attempts >= settings.OUTBOX_MAX_ATTEMPTS:
+            job.status = 'failed'
+        else:
+            job.status = 'pending'
+            job.next_attempt_at = datetime.utcnow() + retry_delay(job.attempts)
+    job.locked_at = None
+    OUTBOX_JOBS.labels(kind=job.kind, status=job.status).inc()
+    if job.trigger_job_id and job.status != 'pending':
+        db.add(
+            TriggerJobEvent(
+                job_id=job.trigger_job_id,
+                kind=JOB_EVENT_KINDS.get(job.kind, job.kind),
+                payload=json.dumps(
+                    {'gmail_message_id': job.gmail_message_id, 'status': job.status, 'error': job.last_error}
+                ),
+            )
+        )
+
+
+class OutboxWorker:
+    def __init__(self, session_factory: sessionmaker = SessionLocal, concurrency: int | None = None):
+        self.session_factory = session_factory
+        self.concurrency = concurrency or settings.OUTBOX_CONCURRENCY
+        self._executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='outbox')
+        self._slots = threading.Semaphore(self.concurrency)
+        self._in_flight = 0
+        self._in_flight_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def run_job(self, job_id: int) -> None:
+        with self.session_factory() as db:
+            job = db.get(OutboxJob, job_id)
+            try:
+                execute_job(db, job)
+            except Exception as exc:
+                db.rollback()
+                settle_job(db, db.get(OutboxJob, job_id), exc)
+            else:
+                settle_job(db, job)
+            db.commit()
+
+    def run_digest(self, job_ids: list[int]) -> None:
+        with self.session_factory() as db:
+            jobs = list(db.scalars(select(OutboxJob).where(OutboxJob.id.in_(job_ids)).order_by(OutboxJob.id)))
+            try:
+                execute_digest(db, jobs)
+            except Exception as exc:
+                db.rollback()
+                for job in jobs:
+                    settle_job(db, job, exc)
+            else:
+                for job in jobs:
+                    settle_job(db, job)
+            db.commit()
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    def _run_and_release(self, run: Callable[[Any], None], work: Any) -> None:
+        with self._in_flight_lock:
+            self._in_flight += 1
+        try:
+            run(work)
+        finally:
+            with self._in_flight_lock:
+                self._in_flight -= 1
+            self._slots.release()
+
+    def dispatch(self) -> int:
+        free = 0
+        while self._slots.acquire(blocking=False):
+            free += 1
+        digests: list[list[int]] = []
+        job_ids: list[int] = []
+        try:
+            if free and digest_enabled():
+                with self.session_factory() as db:
+                    digests = claim_due_digests(db, free)
+            if free > len(digests):
+                with self.session_factory() as db:
+                    exclude_kinds = (WHATSAPP_NOTIFY,) if digest_enabled() else ()
+                    job_ids = claim_due_jobs(db, free - len(digests), exclude_kinds)
+        finally:
+            for _ in range(free - len(digests) - len(job_ids)):
+                self._slots.release()
+        for digest in digests:
+            self._executor.submit(self._run_and_release, self.run_digest, digest)
+        for job_id in job_ids:
+            self._executor.submit(self._run_and_release, self.run_job, job_id)
+        return len(digests) + len(job_ids)
+
+    def drain(self) -> None:
+        while True:
+            dispatched = self.dispatch()
+            for _ in range(self.concurrency):
+                self._slots.acquire()
+            for _ in range(self.concurrency):
+                self._slots.release()
+            if not dispatched:
+                return
+
+    def run_forever(self) -> None:
+        while not self._stop.is_set():
+            try:
+                dispatched = self.dispatch()
+            except Exception:
+                logger.exception('Outbox dispatch failed')
+                dispatched = 0
+            if not dispatched:
+                self._stop.wait(settings.OUTBOX_POLL_INTERVAL_SECONDS)
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self.run_forever, name='outbox-dispatcher', daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self._executor.shutdown(wait=True)
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    OutboxWorker().run_forever()
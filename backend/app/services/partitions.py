@@ -0,0 +1,163 @@
+import logging
+import re
+import threading
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, select, text
+from sqlalchemy.engine import Engine
+
+from ..config import settings
+from ..database import engine
+from ..models import ProcessedEmailKey
+
+logger = logging.getLogger(__name__)
+
+PARENT_TABLE = 'processed_emails'
+PARTITION_NAME = re.compile(r'^processed_emails_p(\d{4})(\d{2})$')
+LOCK_TIMEOUT = '5s'
+KEY_DELETE_BATCH_SIZE = 10000
+
+
+def month_start(moment: datetime) -> datetime:
+    return datetime(moment.year, moment.month, 1)
+
+
+def add_months(month: datetime, months: int) -> datetime:
+    index = month.year * 12 + month.month - 1 + months
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: datetime) -> str:
+    return f'{PARENT_TABLE}_p{month:%Y%m}'
+
+
+def is_partitioned(bind: Engine) -> bool:
+    if bind.dialect.name != 'postgresql':
+        return False
+    with bind.connect() as conn:
+        return bool(
+            conn.scalar(
+                text('SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(:table)'),
+                {'table': PARENT_TABLE},
+            )
+        )
+
+
+def list_partitions(bind: Engine) -> dict[str, datetime]:
+    with bind.connect() as conn:
+        names = conn.scalars(
+            text(
+                'SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid '
+                'WHERE i.inhparent = to_regclass(:table)'
+            ),
+            {'table': PARENT_TABLE},
+        )
+        partitions: dict[str, datetime] = {}
+        for name in names:
+            match = PARTITION_NAME.match(name)
+            if match:
+                partitions[name] = datetime(int(match[1]), int(match[2]), 1)
+        return partitions
+
+
+def ensure_partitions(bind: Engine, ahead_months: int | None = None) -> list[str]:
+    ahead = settings.PARTITIONS_AHEAD_MONTHS if ahead_months is None else ahead_months
+    existing = list_partitions(bind)
+    current = month_start(datetime.utcnow())
+    created: list[str] = []
+    for offset in range(ahead + 1):
+        month = add_months(current, offset)
+        name = partition_name(month)
+        if name in existing:
+            continue
+        try:
+            with bind.begin() as conn:
+                conn.execute(text(f"SET LOCAL lock_timeout = '{LOCK_TIMEOUT}'"))
+                conn.execute(
+                    text(
+                        f'CREATE TABLE {name} PARTITION OF {PARENT_TABLE} '
+                        f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{add_months(month, 1):%Y-%m-%d}')"
+                    )
+                )
+        except Exception:
+            logger.exception('Creating partition %s failed', name)
+            continue
+        created.append(name)
+    return created
+
+
+def drop_expired_partitions(bind: Engine, retention_days: int | None = None) -> list[str]:
+    days = settings.PROCESSED_EMAILS_RETENTION_DAYS if retention_days is None else retention_days
+    if days <= 0:
+        return []
+    cutoff = datetime.utcnow() - timedelta(days=days)
+
+    dropped: list[str] = []
+    for name, month in sorted(list_partitions(bind).items(), key=lambda item: item[1]):
+        upper = add_months(month, 1)
+        if upper > cutoff:
+            continue
+        try:
+            with bind.begin() as conn:
+                conn.execute(text(f"SET LOCAL lock_timeout = '{LOCK_TIMEOUT}'"))
+                conn.execute(text(f'ALTER TABLE {PARENT_TABLE} DETACH PARTITION {name}'))
+                conn.execute(text(f'DROP TABLE {name}'))
+        except Exception:
+            logger.exception('Dropping partition %s failed', name)
+            continue
+        dropped.append(name)
+        purge_expired_keys(bind, month, upper)
+    return dropped
+
+
+def purge_expired_keys(bind: Engine, start: datetime, end: datetime) -> int:
+    purged = 0
+    while True:
+        with bind.begin() as conn:
+            batch = (
+                select(ProcessedEmailKey.gmail_message_id)
+                .where(ProcessedEmailKey.created_at >= start, ProcessedEmailKey.created_at < end)
+                .limit(KEY_DELETE_BATCH_SIZE)
+                .scalar_subquery()
+            )
+            deleted = conn.execute(delete(ProcessedEmailKey).where(ProcessedEmailKey.gmail_message_id.in_(batch)))
+        purged += deleted.rowcount
+        if deleted.rowcount < KEY_DELETE_BATCH_SIZE:
+            return purged
+
+
+class PartitionMaintainer:
+    def __init__(self, bind: Engine = engine):
+        self.bind = bind
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def run_once(self) -> tuple[list[str], list[str]]:
+        if not is_partitioned(self.bind):
+            return [], []
+        return ensure_partitions(self.bind), drop_expired_partitions(self.bind)
+
+    def run_forever(self) -> None:
+        while not self._stop.is_set():
+            try:
+                created, dropped = self.run_once()
+                if created or dropped:
+                    logger.info('Created partitions %s, dropped partitions %s', created, dropped)
+            except Exception:
+                logger.exception('Partition maintenance failed')
+            self._stop.wait(settings.PARTITION_MAINTENANCE_INTERVAL_SECONDS)
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self.run_forever, name='partition-maintainer', daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    created, dropped = PartitionMaintainer().run_once()
+    logger.info('Created partitions %s, dropped partitions %s', created, dropped)
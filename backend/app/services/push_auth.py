@@ -0,0 +1,71 @@
+import threading
+import time
+from typing import Any
+
+from ..config import settings
+
+GOOGLE_CERTS_URL = 'https://www.googleapis.com/oauth2/v1/certs'
+GOOGLE_ISSUERS = ('accounts.google.com', 'https://accounts.google.com')
+CERTS_TTL_SECONDS = 3600.0
+CERTS_MIN_REFRESH_SECONDS = 60.0
+
+
+class PushAuthError(Exception):
+    pass
+
+
+def push_auth_configured() -> bool:
+    return bool(settings.GMAIL_PUSH_TOKEN or settings.GMAIL_PUSH_AUDIENCE)
+
+
+def fetch_google_certs() -> dict[str, str]:
+    import requests
+
+    response = requests.get(GOOGLE_CERTS_URL, timeout=10)
+    response.raise_for_status()
+    return response.json()
+
+
+class GoogleCerts:
+    def __init__(self, ttl_seconds: float, min_refresh_seconds: float):
+        self.ttl_seconds = ttl_seconds
+        self.min_refresh_seconds = min_refresh_seconds
+        self._certs: dict[str, str] = {}
+        self._fetched_at = 0.0
+        self._lock = threading.Lock()
+
+    def get(self, refresh: bool = False) -> dict[str, str]:
+        with self._lock:
+            age = time.monotonic() - self._fetched_at
+            if not self._certs or age > self.ttl_seconds or (refresh and age > self.min_refresh_seconds):
+                self._certs = fetch_google_certs()
+                self._fetched_at = time.monotonic()
+            return self._certs
+
+    def clear(self) -> None:
+        with self._lock:
+            self._certs = {}
+            self._fetched_at = 0.0
+
+
+google_certs = GoogleCerts(CERTS_TTL_SECONDS, CERTS_MIN_REFRESH_SECONDS)
+
+
+def verify_push_jwt(token: str) -> dict[str, Any]:
+    from google.auth import jwt
+
+    if not token:
+        raise PushAuthError('Missing bearer token')
+    try:
+        try:
+            claims = jwt.decode(token, certs=google_certs.get(), audience=settings.GMAIL_PUSH_AUDIENCE)
+        except ValueError:
+            claims = jwt.decode(token, certs=google_certs.get(refresh=True), audience=settings.GMAIL_PUSH_AUDIENCE)
+    except ValueError as exc:
+        raise PushAuthError(f'Invalid push JWT: {exc}') from exc
+    if claims.get('iss') not in GOOGLE_ISSUERS:
+        raise PushAuthError('Push JWT was not issued by Google')
+    expected_sender = settings.GMAIL_PUSH_SERVICE_ACCOUNT
+    if expected_sender and (claims.get('email') != expected_sender or not claims.get('email_verified')):
+        raise PushAuthError('Push JWT was not issued for the expected service account')
+    return claims
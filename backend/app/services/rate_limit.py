@@ -0,0 +1,206 @@
+import logging
+import random
+import threading
+import time
+from collections.abc import Callable
+from email.utils import parsedate_to_datetime
+from typing import Protocol, TypeVar
+
+from sqlalchemy import update
+from sqlalchemy.engine import Engine
+
+from ..config import settings
+from ..database import dialect_insert, engine
+from ..metrics import RATE_LIMITED, stage
+from ..models import RateLimitBucket
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+
+class RateLimitedError(Exception):
+    reason = 'is rate limiting requests'
+
+    def __init__(self, provider: str, retry_after: float):
+        super().__init__(f'{provider} {self.reason}; retry in {retry_after:.1f}s')
+        self.provider = provider
+        self.retry_after = retry_after
+
+
+class CircuitOpenError(RateLimitedError):
+    reason = 'circuit is open after repeated failures'
+
+
+class SendOutcomeUnknownError(Exception):
+    pass
+
+
+def refill(tokens: float, updated_at: float, now: float, rate: float, capacity: float) -> float:
+    return min(capacity, tokens + max(now - updated_at, 0.0) * rate)
+
+
+class BucketStore(Protocol):
+    def take(self, key: str, cost: float, rate: float, capacity: float) -> float: ...
+
+
+class MemoryBucketStore:
+    def __init__(self):
+        self._buckets: dict[str, tuple[float, float]] = {}
+        self._lock = threading.Lock()
+
+    def take(self, key: str, cost: float, rate: float, capacity: float) -> float:
+        now = time.time()
+        with self._lock:
+            tokens, updated_at = self._buckets.get(key, (capacity, now))
+            tokens = refill(tokens, updated_at, now, rate, capacity)
+            granted = tokens >= cost
+            self._buckets[key] = (tokens - cost if granted else tokens, now)
+        return 0.0 if granted else (cost - tokens) / rate
+
+
+class DatabaseBucketStore:
+    def __init__(self, bind: Engine = engine):
+        self.bind = bind
+
+    def take(self, key: str, cost: float, rate: float, capacity: float) -> float:
+        now = time.time()
+        lock_row = (
+            update(RateLimitBucket)
+            .where(RateLimitBucket.key == key)
+            .values(tokens=RateLimitBucket.tokens)
+            .returning(RateLimitBucket.tokens, RateLimitBucket.updated_at)
+        )
+        with self.bind.begin() as conn:
+            row = conn.execute(lock_row).first()
+            if row is None:
+                conn.execute(
+                    dialect_insert(self.bind)(RateLimitBucket)
+                    .values(key=key, tokens=capacity, updated_at=now)
+                    .on_conflict_do_nothing(index_elements=[RateLimitBucket.key])
+                )
+                row = conn.execute(lock_row).one()
+            tokens = refill(row.tokens, row.updated_at, now, rate, capacity)
+            granted = tokens >= cost
+            conn.execute(
+                update(RateLimitBucket)
+                .where(RateLimitBucket.key == key)
+                .values(tokens=tokens - cost if granted else tokens, updated_at=now)
+            )
+        return 0.0 if granted else (cost - tokens) / rate
+
+
+class RateLimiter:
+    def __init__(self, store: BucketStore, max_wait: float):
+        self.store = store
+        self.max_wait = max_wait
+
+    def acquire(self, provider: str, key: str, cost: float, rate: float, capacity: float | None = None) -> None:
+        capacity = capacity or rate
+        cost = min(cost, capacity)
+        waited = 0.0
+        while True:
+            wait = self.store.take(key, cost, rate, capacity)
+            if not wait:
+                return
+            if waited + wait > self.max_wait:
+                RATE_LIMITED.labels(provider=provider).inc()
+                raise RateLimitedError(provider, wait)
+            with stage(f'rate_limit.{provider.lower()}'):
+                time.sleep(wait)
+            waited += wait
+
+
+class CircuitBreaker:
+    def __init__(self, name: str, failure_threshold: int, reset_seconds: float):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._failures = 0
+        self._opened_at: float | None = None
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self) -> bool:
+        return self._opened_at is not None
+
+    def before_call(self) -> None:
+        with self._lock:
+            if self._opened_at is None:
+                return
+            remaining = self._opened_at + self.reset_seconds - time.monotonic()
+            if remaining > 0:
+                RATE_LIMITED.labels(provider=self.name).inc()
+                raise CircuitOpenError(self.name, remaining)
+            self._opened_at = time.monotonic()
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._failures >= self.failure_threshold:
+                if self._opened_at is None:
+                    logger.warning('%s circuit opened after %s consecutive failures', self.name, self._failures)
+                self._opened_at = time.monotonic()
+
+
+def parse_retry_after(value: str | None) -> float | None:
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt: int, retry_after: float | None = None) -> float:
+    if retry_after is not None:
+        return min(retry_after, settings.RATE_LIMIT_BACKOFF_MAX_SECONDS)
+    ceiling = min(settings.RATE_LIMIT_BACKOFF_BASE_SECONDS * 2 ** attempt, settings.RATE_LIMIT_BACKOFF_MAX_SECONDS)
+    return random.uniform(ceiling / 2, ceiling)
+
+
+def call_with_backoff(
+    provider: str,
+    call: Callable[[], T],
+    retry_hint: Callable[[Exception], tuple[bool, float | None]],
+    max_retries: int | None = None,
+) -> T:
+    retries = settings.RATE_LIMIT_MAX_RETRIES if max_retries is None else max_retries
+    attempt = 0
+    while True:
+        try:
+            return call()
+        except RateLimitedError:
+            raise
+        except Exception as exc:
+            retryable, retry_after = retry_hint(exc)
+            if not retryable:
+                raise
+            delay = backoff_delay(attempt, retry_after)
+            if attempt >= retries:
+                raise RateLimitedError(provider, delay) from exc
+            logger.info('%s call failed (%s), retrying in %.2fs', provider, exc, delay)
+            time.sleep(delay)
+            attempt += 1
+
+
+def build_rate_limiter() -> RateLimiter:
+    store = DatabaseBucketStore() if settings.RATE_LIMIT_STORE == 'database' else MemoryBucketStore()
+    return RateLimiter(store, settings.RATE_LIMIT_MAX_WAIT_SECONDS)
+
+
+rate_limiter = build_rate_limiter()
+twilio_breaker = CircuitBreaker(
+    'Twilio',
+    failure_threshold=settings.TWILIO_CIRCUIT_FAILURE_THRESHOLD,
+    reset_seconds=settings.TWILIO_CIRCUIT_RESET_SECONDS,
+)
@@ -0,0 +1,227 @@
+import logging
+import random
+import threading
+import time
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any
+
+from sqlalchemy import select
+from sqlalchemy.orm import sessionmaker
+
+from ..config import settings
+from ..database import SessionLocal
+from ..models import GmailAccount
+from .email_processor import lock_mailbox, process_latest_emails
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class AccountSchedule:
+    account_id: int
+    interval: float
+    next_poll_at: float
+    last_success_at: float | None = None
+    last_processed: int = 0
+    polls: int = 0
+    pushes: int = 0
+    failures: int = 0
+    running: bool = False
+    repoll: bool = False
+
+
+class PollingScheduler:
+    def __init__(
+        self,
+        session_factory: sessionmaker = SessionLocal,
+        process: Callable[..., dict[str, int]] = process_latest_emails,
+        max_concurrency: int | None = None,
+        batch_size: int | None = None,
+        min_interval: float | None = None,
+        max_interval: float | None = None,
+        periodic: bool = True,
+    ):
+        self.session_factory = session_factory
+        self.process = process
+        self.max_concurrency = max_concurrency or settings.SCHEDULER_MAX_CONCURRENCY
+        self.batch_size = batch_size or settings.SCHEDULER_BATCH_SIZE
+        self.min_interval = min_interval if min_interval is not None else settings.SCHEDULER_MIN_INTERVAL_SECONDS
+        self.max_interval = max_interval if max_interval is not None else settings.SCHEDULER_MAX_INTERVAL_SECONDS
+        self.periodic = periodic
+        self.schedules: dict[int, AccountSchedule] = {}
+        self._lock = threading.Lock()
+        self._slots = threading.Semaphore(self.max_concurrency)
+        self._executor = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix='scheduler')
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._refreshed_at = float('-inf')
+
+    def refresh_accounts(self) -> None:
+        with self.session_factory() as db:
+            account_ids = set(db.scalars(select(GmailAccount.id)))
+        now = time.monotonic()
+        with self._lock:
+            for account_id in account_ids - self.schedules.keys():
+                self.schedules[account_id] = self.new_schedule(account_id, now)
+            for account_id in self.schedules.keys() - account_ids:
+                if not self.schedules[account_id].running:
+                    del self.schedules[account_id]
+        self._refreshed_at = now
+
+    def new_schedule(self, account_id: int, now: float) -> AccountSchedule:
+        return AccountSchedule(
+            account_id=account_id,
+            interval=self.min_interval,
+            next_poll_at=now + random.random() * self.min_interval if self.periodic else float('inf'),
+        )
+
+    def request_poll(self, account_id: int, delay: float = 0.0) -> None:
+        now = time.monotonic()
+        with self._lock:
+            schedule = self.schedules.get(account_id)
+            if schedule is None:
+                schedule = self.schedules[account_id] = self.new_schedule(account_id, now)
+            schedule.pushes += 1
+            if schedule.running:
+                schedule.repoll = True
+            else:
+                schedule.next_poll_at = min(schedule.next_poll_at, now + delay)
+        self._wake.set()
+
+    def reschedule(
+        self,
+        schedule: AccountSchedule,
+        processed: int | None,
+        backlog: bool,
+        contended: bool = False,
+    ) -> None:
+        now = time.monotonic()
+        if processed is None:
+            schedule.failures += 1
+            schedule.interval = min(self.max_interval, self.min_interval * 2 ** schedule.failures)
+            schedule.next_poll_at = now + schedule.interval
+            return
+        if contended:
+            # Another sync holds the mailbox; try again soon so a push that triggered this poll is not dropped.
+            schedule.next_poll_at = now + self.min_interval
+            return
+        if backlog or schedule.repoll:
+            schedule.repoll = False
+            schedule.interval = self.min_interval
+            schedule.next_poll_at = now
+            return
+
+        if processed:
+            schedule.interval = max(self.min_interval, schedule.interval / 2)
+        else:
+            schedule.interval = min(self.max_interval, schedule.interval * 1.5)
+        schedule.next_poll_at = now + schedule.interval if self.periodic else float('inf')
+
+    def poll_account(self, schedule: AccountSchedule) -> None:
+        processed: int | None = None
+        backlog = False
+        contended = False
+        try:
+            with self.session_factory() as db:
+                if not lock_mailbox(db, schedule.account_id):
+                    processed = 0
+                    contended = True
+                else:
+                    account = db.get(GmailAccount, schedule.account_id)
+                    if account is not None:
+                        result = self.process(db=db, account=account, batch_size=self.batch_size, incremental=True)
+                        processed = result['processed']
+                        backlog = processed >= self.batch_size
+                        with self._lock:
+                            schedule.last_success_at = time.monotonic()
+                            schedule.last_processed = processed
+                            schedule.failures = 0
+                    else:
+                        processed = 0
+        except Exception:
+            logger.exception('Polling Gmail account %s failed', schedule.account_id)
+        finally:
+            with self._lock:
+                schedule.polls += 1
+                schedule.running = False
+                self.reschedule(schedule, processed, backlog, contended)
+            self._slots.release()
+            self._wake.set()
+
+    def dispatch(self) -> int:
+        now = time.monotonic()
+        if now - self._refreshed_at >= settings.SCHEDULER_REFRESH_SECONDS:
+            self.refresh_accounts()
+
+        dispatched = 0
+        with self._lock:
+            due = sorted(
+                (s for s in self.schedules.values() if not s.running and s.next_poll_at <= now),
+                key=lambda s: s.next_poll_at,
+            )
+            for schedule in due:
+                if not self._slots.acquire(blocking=False):
+                    break
+                schedule.running = True
+                self._executor.submit(self.poll_account, schedule)
+                dispatched += 1
+        return dispatched
+
+    def run_forever(self, tick_seconds: float = 0.5) -> None:
+        while not self._stop.is_set():
+            try:
+                self.dispatch()
+            except Exception:
+                logger.exception('Scheduler dispatch failed')
+            self._wake.wait(tick_seconds)
+            self._wake.clear()
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self.run_forever, name='polling-scheduler', daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+        self._executor.shutdown(wait=True)
+
+    @property
+    def in_flight(self) -> int:
+        with self._lock:
+            return sum(1 for schedule in self.schedules.values() if schedule.running)
+
+    def metrics(self) -> dict[str, Any]:
+        now = time.monotonic()
+        with self._lock:
+            accounts = [
+                {
+                    'account_id': s.account_id,
+                    'interval_seconds': round(s.interval, 3),
+                    'lag_seconds': round(now - s.last_success_at, 3) if s.last_success_at is not None else None,
+                    'overdue_seconds': round(max(0.0, now - s.next_poll_at), 3) if not s.running else 0.0,
+                    'last_processed': s.last_processed,
+                    'polls': s.polls,
+                    'push_notifications': s.pushes,
+                    'consecutive_failures': s.failures,
+                    'running': s.running,
+                }
+                for s in sorted(self.schedules.values(), key=lambda s: s.account_id)
+            ]
+        return {
+            'max_concurrency': self.max_concurrency,
+            'in_flight': sum(1 for account in accounts if account['running']),
+            'accounts': accounts,
+        }
+
+
+polling_scheduler = PollingScheduler(periodic=settings.SCHEDULER_ENABLED)
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    PollingScheduler().run_forever()
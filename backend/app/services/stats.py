@@ -0,0 +1,217 @@
+import argparse
+import logging
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import case, delete, func, literal, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from ..agents.email_agent import spam_hint
+from ..database import SessionLocal, dialect_insert
+from ..models import ProcessedEmail, UserDailyStats, UserSenderStats, UserStats
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_CHUNK_SIZE = 1000
+COUNTERS = ('processed', 'relevant', 'spam')
+
+
+def add_counts(target: dict[tuple, list[int]], key: tuple, counts: tuple[int, ...]) -> None:
+    current = target.setdefault(key, [0] * len(counts))
+    for index, count in enumerate(counts):
+        current[index] += count
+
+
+def upsert_counters(db: Session, model, keys: list[str], values: list[dict], replace: tuple[str, ...] = ()) -> None:
+    insert = dialect_insert(db.get_bind())
+    table = model.__table__
+    for start in range(0, len(values), ROLLUP_CHUNK_SIZE):
+        stmt = insert(model).values(values[start:start + ROLLUP_CHUNK_SIZE])
+        updates = {name: table.c[name] + stmt.excluded[name] for name in COUNTERS if name in table.c}
+        updates.update({name: stmt.excluded[name] for name in replace})
+        if 'version' in table.c:
+            updates['version'] = table.c.version + 1
+        db.execute(stmt.on_conflict_do_update(index_elements=keys, set_=updates))
+
+
+def update_rollups(db: Session, rows: list[dict]) -> None:
+    if not rows:
+        return
+    totals: dict[tuple, list[int]] = {}
+    daily: dict[tuple, list[int]] = {}
+    senders: dict[tuple, list[int]] = {}
+    last_seen: dict[tuple, datetime] = {}
+    for row in rows:
+        counts = (1, int(row['is_relevant']), int(row['is_spam']))
+        sender_key = (row['user_id'], row['sender'] or '')
+        add_counts(totals, (row['user_id'],), counts)
+        add_counts(daily, (row['user_id'], row['created_at'].date()), counts)
+        add_counts(senders, sender_key, counts[:2])
+        last_seen[sender_key] = max(last_seen.get(sender_key, row['created_at']), row['created_at'])
+
+    now = datetime.utcnow()
+    upsert_counters(
+        db,
+        UserStats,
+        ['user_id'],
+        [
+            dict(zip(('user_id', *COUNTERS), (*key, *counts)), version=1, updated_at=now)
+            for key, counts in sorted(totals.items())
+        ],
+        replace=('updated_at',),
+    )
+    upsert_counters(
+        db,
+        UserDailyStats,
+        ['user_id', 'day'],
+        [dict(zip(('user_id', 'day', *COUNTERS), (*key, *counts))) for key, counts in sorted(daily.items())],
+    )
+    upsert_counters(
+        db,
+        UserSenderStats,
+        ['user_id', 'sender'],
+        [
+            dict(zip(('user_id', 'sender', 'processed', 'relevant'), (*key, *counts)), last_seen_at=last_seen[key])
+            for key, counts in sorted(senders.items())
+        ],
+        replace=('last_seen_at',),
+    )
+
+
+def stats_etag(stats: UserStats | None, today: date, days: int, top: int) -> str:
+    version = stats.version if stats is not None else 0
+    return f'W/"{version}-{today.isoformat()}-{days}-{top}"'
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = {tag.strip() for tag in if_none_match.split(',')}
+    return '*' in candidates or etag in candidates or etag.removeprefix('W/') in candidates
+
+
+async def load_user_stats(db: AsyncSession, user_id: int, stats: UserStats | None, today: date, days: int, top: int):
+    since = today - timedelta(days=days - 1)
+    daily_rows = await db.execute(
+        select(UserDailyStats.day, UserDailyStats.processed, UserDailyStats.relevant, UserDailyStats.spam).where(
+            UserDailyStats.user_id == user_id,
+            UserDailyStats.day >= since,
+        )
+    )
+    by_day = {row.day: row for row in daily_rows}
+    sender_rows = await db.execute(
+        select(
+            UserSenderStats.sender,
+            UserSenderStats.processed,
+            UserSenderStats.relevant,
+            UserSenderStats.last_seen_at,
+        )
+        .where(UserSenderStats.user_id == user_id)
+        .order_by(UserSenderStats.processed.desc(), UserSenderStats.sender)
+        .limit(top)
+    )
+    processed = stats.processed if stats is not None else 0
+    return {
+        'processed': processed,
+        'relevant': stats.relevant if stats is not None else 0,
+        'spam': stats.spam if stats is not None else 0,
+        'lead_rate': stats.relevant / processed if processed else 0.0,
+        'spam_rate': stats.spam / processed if processed else 0.0,
+        'daily': [
+            {
+                'day': day,
+                'processed': by_day[day].processed if day in by_day else 0,
+                'relevant': by_day[day].relevant if day in by_day else 0,
+                'spam': by_day[day].spam if day in by_day else 0,
+            }
+            for day in (since + timedelta(days=offset) for offset in range(days))
+        ],
+        'top_senders': [dict(row._mapping) for row in sender_rows],
+        'updated_at': stats.updated_at if stats is not None else None,
+    }
+
+
+def backfill_spam_flags(db: Session, start_id: int = 0) -> int:
+    # Only subject and snippet are stored, while classification may also have read the body, so a row that looks
+    # clean here can still be spam: the backfill only ever sets is_spam and never clears it.
+    table = ProcessedEmail.__table__
+    last_id = start_id
+    flagged = 0
+    while True:
+        rows = db.execute(
+            select(table.c.id, table.c.subject, table.c.snippet)
+            .where(table.c.id > last_id, table.c.is_relevant.is_(False), table.c.is_spam.is_(False))
+            .order_by(table.c.id)
+            .limit(ROLLUP_CHUNK_SIZE)
+        ).all()
+        if not rows:
+            return flagged
+        last_id = rows[-1].id
+        spam_ids = [row.id for row in rows if spam_hint(row.subject, row.snippet)]
+        if spam_ids:
+            db.execute(update(table).where(table.c.id.in_(spam_ids)).values(is_spam=True))
+        db.commit()
+        flagged += len(spam_ids)
+        logger.info('Spam backfill reached processed_emails.id %s (%s flagged)', last_id, flagged)
+
+
+def rebuild_rollups(db: Session) -> None:
+    relevant = func.sum(case((ProcessedEmail.is_relevant.is_(True), 1), else_=0))
+    spam = func.sum(case((ProcessedEmail.is_spam.is_(True), 1), else_=0))
+    sender = func.coalesce(ProcessedEmail.sender, '')
+    day = func.date(ProcessedEmail.created_at)
+    version = literal(int(datetime.utcnow().timestamp()))
+    for model in (UserStats, UserDailyStats, UserSenderStats):
+        db.execute(delete(model))
+    db.execute(
+        UserStats.__table__.insert().from_select(
+            ['user_id', 'processed', 'relevant', 'spam', 'version', 'updated_at'],
+            select(
+                ProcessedEmail.user_id,
+                func.count(),
+                relevant,
+                spam,
+                version,
+                func.max(ProcessedEmail.created_at),
+            ).group_by(ProcessedEmail.user_id),
+        )
+    )
+    db.execute(
+        UserDailyStats.__table__.insert().from_select(
+            ['user_id', 'day', 'processed', 'relevant', 'spam'],
+            select(ProcessedEmail.user_id, day, func.count(), relevant, spam).group_by(
+                ProcessedEmail.user_id,
+                day,
+            ),
+        )
+    )
+    db.execute(
+        UserSenderStats.__table__.insert().from_select(
+            ['user_id', 'sender', 'processed', 'relevant', 'last_seen_at'],
+            select(
+                ProcessedEmail.user_id,
+                sender,
+                func.count(),
+                relevant,
+                func.max(ProcessedEmail.created_at),
+            ).group_by(ProcessedEmail.user_id, sender),
+        )
+    )
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Recompute the per-user stats rollups from processed_emails.')
+    parser.add_argument(
+        '--backfill-spam',
+        action='store_true',
+        help='flag processed_emails.is_spam from the stored subject and snippet first, committing per chunk',
+    )
+    parser.add_argument('--start-id', type=int, default=0, help='resume the spam backfill after this row id')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    with SessionLocal() as db:
+        if args.backfill_spam:
+            logger.info('Flagged %s emails as spam', backfill_spam_flags(db, args.start_id))
+        rebuild_rollups(db)
+        db.commit()
+    logger.info('Rebuilt stats rollups')
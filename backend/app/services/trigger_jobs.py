@@ -0,0 +1,140 @@
+import asyncio
+import json
+import logging
+import time
+from collections.abc import AsyncIterator
+from datetime import datetime
+from functools import partial
+from typing import Any
+
+from sqlalchemy import func, insert, select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy.orm import sessionmaker
+
+from ..config import settings
+from ..database import AsyncSessionLocal, SessionLocal
+from ..models import GmailAccount, OutboxJob, TriggerJob, TriggerJobEvent
+from .backfill import backfill_mailbox
+from .email_processor import lock_mailbox, process_latest_emails
+
+logger = logging.getLogger(__name__)
+
+FINISHED = {'succeeded', 'failed'}
+
+
+def record_events(session_factory: sessionmaker, job_id: str, kind: str, items: list[dict[str, Any]]) -> None:
+    if not items:
+        return
+    with session_factory() as db:
+        db.execute(
+            insert(TriggerJobEvent),
+            [{'job_id': job_id, 'kind': kind, 'payload': json.dumps(item, default=str)} for item in items],
+        )
+        db.commit()
+
+
+def finish_job(
+    session_factory: sessionmaker,
+    job_id: str,
+    status: str,
+    result: dict[str, int] | None = None,
+    error: str | None = None,
+) -> None:
+    with session_factory() as db:
+        job = db.get(TriggerJob, job_id)
+        job.status = status
+        job.error = error
+        job.finished_at = datetime.utcnow()
+        if result is not None:
+            job.processed, job.relevant, job.ignored = result['processed'], result['relevant'], result['ignored']
+        db.add(
+            TriggerJobEvent(
+                job_id=job_id,
+                kind='summary' if status == 'succeeded' else 'error',
+                payload=json.dumps(result if result is not None else {'error': error}),
+            )
+        )
+        db.commit()
+
+
+def run_trigger_job(job_id: str, session_factory: sessionmaker = SessionLocal) -> None:
+    try:
+        with session_factory() as db:
+            job = db.get(TriggerJob, job_id)
+            job.status = 'running'
+            job.started_at = datetime.utcnow()
+            account_id, mode, batch_size, incremental = job.account_id, job.mode, job.batch_size, job.incremental
+            max_messages, notify = job.max_messages, job.notify
+            db.commit()
+            progress = partial(record_events, session_factory, job_id)
+
+            if mode == 'backfill':
+                account = db.get(GmailAccount, account_id)
+                result = backfill_mailbox(
+                    db=db,
+                    account=account,
+                    chunk_size=batch_size,
+                    max_messages=max_messages,
+                    progress=progress,
+                    notify=notify,
+                    trigger_job_id=job_id,
+                )
+            else:
+                if not lock_mailbox(db, account_id):
+                    finish_job(session_factory, job_id, 'failed', error='Mailbox is already being processed')
+                    return
+                account = db.get(GmailAccount, account_id)
+                result = process_latest_emails(
+                    db=db,
+                    account=account,
+                    batch_size=batch_size,
+                    incremental=incremental,
+                    progress=progress,
+                    trigger_job_id=job_id,
+                )
+    except Exception as exc:
+        logger.exception('Trigger job %s failed', job_id)
+        finish_job(session_factory, job_id, 'failed', error=str(exc)[:2000])
+        return
+    finish_job(session_factory, job_id, 'succeeded', result=result)
+
+
+def sse_message(event_id: int | None, kind: str, data: str) -> str:
+    prefix = f'id: {event_id}\n' if event_id is not None else ''
+    return f'{prefix}event: {kind}\ndata: {data}\n\n'
+
+
+async def stream_job_events(
+    job_id: str,
+    last_event_id: int = 0,
+    session_factory: async_sessionmaker = AsyncSessionLocal,
+) -> AsyncIterator[str]:
+    deadline = time.monotonic() + settings.TRIGGER_STREAM_TIMEOUT_SECONDS
+    while True:
+        async with session_factory() as db:
+            status = await db.scalar(select(TriggerJob.status).where(TriggerJob.id == job_id))
+            outstanding = await db.scalar(
+                select(func.count())
+                .select_from(OutboxJob)
+                .where(OutboxJob.trigger_job_id == job_id, OutboxJob.status.in_(('pending', 'in_progress')))
+            )
+            events = (
+                await db.execute(
+                    select(TriggerJobEvent.id, TriggerJobEvent.kind, TriggerJobEvent.payload)
+                    .where(TriggerJobEvent.job_id == job_id, TriggerJobEvent.id > last_event_id)
+                    .order_by(TriggerJobEvent.id)
+                )
+            ).all()
+        for event_id, kind, payload in events:
+            last_event_id = event_id
+            yield sse_message(event_id, kind, payload)
+
+        if status in FINISHED and not outstanding:
+            yield sse_message(None, 'end', json.dumps({'status': status}))
+            return
+        if time.monotonic() >= deadline:
+            yield sse_message(None, 'timeout', json.dumps({'status': status, 'outstanding': outstanding}))
+            return
+        if not events:
+            yield ': keep-alive\n\n'
+        await asyncio.sleep(settings.TRIGGER_EVENTS_POLL_SECONDS)
@@ -1,17 +1,112 @@
-import requests
+from functools import lru_cache
+from typing import TYPE_CHECKING, Any
 
 from ..config import settings
+from ..metrics import count_api_call, stage
+from .rate_limit import SendOutcomeUnknownError, call_with_backoff, parse_retry_after, rate_limiter, twilio_breaker
 
+if TYPE_CHECKING:
+    import requests
 
-def send_whatsapp_summary(message: str) -> bool:
-    if not all([settings.TWILIO_ACCOUNT_SID, settings.TWILIO_AUTH_TOKEN, settings.TWILIO_WHATSAPP_FROM, settings.TWILIO_WHATSAPP_TO]):
+WHATSAPP_MAX_BODY_CHARS = 1600
+
+
+class TwilioUnavailableError(Exception):
+    def __init__(self, status: int, retry_after: float | None = None):
+        super().__init__(f'Twilio answered {status}')
+        self.status = status
+        self.retry_after = retry_after
+
+
+def whatsapp_configured() -> bool:
+    return all([settings.TWILIO_ACCOUNT_SID, settings.TWILIO_AUTH_TOKEN, settings.TWILIO_WHATSAPP_FROM, settings.TWILIO_WHATSAPP_TO])
+
+
+def build_twilio_session() -> 'requests.Session':
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=settings.OUTBOX_CONCURRENCY)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+@lru_cache(maxsize=1)
+def twilio_session() -> 'requests.Session':
+    return build_twilio_session()
+
+
+def twilio_retry_hint(exc: Exception) -> tuple[bool, float | None]:
+    import requests
+
+    if isinstance(exc, TwilioUnavailableError):
+        return True, exc.retry_after
+    # Connection failures happen before Twilio sees the request; read timeouts and 5xx do not, see post_message.
+    return isinstance(exc, requests.ConnectionError), None
+
+
+def post_message(url: str, payload: dict[str, str]) -> bool:
+    import requests
+
+    twilio_breaker.before_call()
+    try:
+        with stage('twilio.send'):
+            response = twilio_session().post(
+                url,
+                data=payload,
+                auth=(settings.TWILIO_ACCOUNT_SID, settings.TWILIO_AUTH_TOKEN),
+                timeout=20,
+            )
+    except requests.RequestException as exc:
+        count_api_call('twilio', 'messages.create', type(exc).__name__)
+        twilio_breaker.record_failure()
+        if isinstance(exc, requests.Timeout) and not isinstance(exc, requests.ConnectTimeout):
+            raise SendOutcomeUnknownError(f'Twilio send outcome is unknown: {exc}') from exc
+        raise
+    count_api_call('twilio', 'messages.create', 'ok' if response.ok else str(response.status_code))
+    if response.status_code >= 500:
+        twilio_breaker.record_failure()
+    else:
+        twilio_breaker.record_success()
+    if response.status_code >= 500:
+        raise SendOutcomeUnknownError(f'Twilio send outcome is unknown: answered {response.status_code}')
+    if response.status_code == 429:
+        raise TwilioUnavailableError(response.status_code, parse_retry_after(response.headers.get('Retry-After')))
+    return response.ok
+
+
+def format_digest(payloads: list[dict[str, Any]]) -> str:
+    if len(payloads) == 1:
+        return payloads[0]['message']
+    lines = [f'{len(payloads)} new lead-like emails:']
+    length = len(lines[0])
+    for index, payload in enumerate(payloads):
+        line = f"- {payload['sender']} | {payload['subject']}" if 'sender' in payload else f"- {payload['message']}"
+        more = f'...and {len(payloads) - index} more'
+        if length + len(line) + len(more) + 2 > WHATSAPP_MAX_BODY_CHARS:
+            lines.append(more)
+            break
+        lines.append(line)
+        length += len(line) + 1
+    return '\n'.join(lines)
+
+
+def send_whatsapp_summary(message: str, to: str | None = None) -> bool:
+    if not whatsapp_configured():
         return False
 
-    url = f"https://api.twilio.com/2010-04-01/Accounts/{settings.TWILIO_ACCOUNT_SID}/Messages.json"
+    url = f"{settings.TWILIO_API_BASE_URL}/2010-04-01/Accounts/{settings.TWILIO_ACCOUNT_SID}/Messages.json"
     payload = {
         'From': settings.TWILIO_WHATSAPP_FROM,
-        'To': settings.TWILIO_WHATSAPP_TO,
+        'To': to or settings.TWILIO_WHATSAPP_TO,
         'Body': message,
     }
-    response = requests.post(url, data=payload, auth=(settings.TWILIO_ACCOUNT_SID, settings.TWILIO_AUTH_TOKEN), timeout=20)
-    return response.ok
+
+    def attempt() -> bool:
+        key = f'twilio:{settings.TWILIO_WHATSAPP_FROM}'
+        rate_limiter.acquire('Twilio', key, 1, settings.TWILIO_MESSAGES_PER_SECOND)
+        return post_message(url, payload)
+
+    return call_with_backoff('Twilio', attempt, twilio_retry_hint)
@@ -0,0 +1,61 @@
+"""baseline schema
+
+Revision ID: 0001
+Revises:
+Create Date: 2024-10-01 00:00:00
+"""
+import sqlalchemy as sa
+from alembic import op
+
+revision = '0001'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'users',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('email', sa.String(255), nullable=False),
+        sa.Column('hashed_password', sa.String(255), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+    )
+    op.create_index('ix_users_id', 'users', ['id'])
+    op.create_index('ix_users_email', 'users', ['email'], unique=True)
+
+    op.create_table(
+        'gmail_accounts',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id'), nullable=False, unique=True),
+        sa.Column('gmail_email', sa.String(255), nullable=False),
+        sa.Column('access_token', sa.Text(), nullable=False),
+        sa.Column('refresh_token', sa.Text(), nullable=True),
+        sa.Column('token_uri', sa.String(255), nullable=True),
+        sa.Column('client_id', sa.String(255), nullable=True),
+        sa.Column('client_secret', sa.String(255), nullable=True),
+        sa.Column('scopes', sa.Text(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+    )
+    op.create_index('ix_gmail_accounts_id', 'gmail_accounts', ['id'])
+
+    op.create_table(
+        'processed_emails',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id'), nullable=False),
+        sa.Column('gmail_message_id', sa.String(128), nullable=False, unique=True),
+        sa.Column('subject', sa.String(512), nullable=True),
+        sa.Column('sender', sa.String(512), nullable=True),
+        sa.Column('snippet', sa.Text(), nullable=True),
+        sa.Column('is_relevant', sa.Boolean(), nullable=False),
+        sa.Column('forwarded_to', sa.String(255), nullable=True),
+        sa.Column('whatsapp_notified', sa.Boolean(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+    )
+    op.create_index('ix_processed_emails_id', 'processed_emails', ['id'])
+
+
+def downgrade() -> None:
+    op.drop_table('processed_emails')
+    op.drop_table('gmail_accounts')
+    op.drop_table('users')
@@ -0,0 +1,77 @@
+"""gmail sync state, outbox jobs and classification cache
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2024-10-15 00:00:00
+"""
+import sqlalchemy as sa
+from alembic import op
+
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+
+def sync_state_columns() -> list[sa.Column]:
+    return [
+        sa.Column('token_expiry', sa.DateTime(), nullable=True),
+        sa.Column('history_id', sa.String(32), nullable=True),
+        sa.Column('watch_expiration', sa.DateTime(), nullable=True),
+    ]
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    existing = {column['name'] for column in inspector.get_columns('gmail_accounts')}
+    missing = [column for column in sync_state_columns() if column.name not in existing]
+    if missing:
+        with op.batch_alter_table('gmail_accounts') as batch:
+            for column in missing:
+                batch.add_column(column)
+
+    tables = set(inspector.get_table_names())
+    if 'outbox_jobs' not in tables:
+        create_outbox_jobs()
+    if 'classification_cache' not in tables:
+        create_classification_cache()
+
+
+def create_outbox_jobs() -> None:
+    op.create_table(
+        'outbox_jobs',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id'), nullable=False),
+        sa.Column('kind', sa.String(32), nullable=False),
+        sa.Column('idempotency_key', sa.String(255), nullable=False, unique=True),
+        sa.Column('gmail_message_id', sa.String(128), nullable=True),
+        sa.Column('payload', sa.Text(), nullable=False),
+        sa.Column('status', sa.String(16), nullable=False),
+        sa.Column('attempts', sa.Integer(), nullable=False),
+        sa.Column('next_attempt_at', sa.DateTime(), nullable=False),
+        sa.Column('locked_at', sa.DateTime(), nullable=True),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+    )
+    op.create_index('ix_outbox_jobs_id', 'outbox_jobs', ['id'])
+    op.create_index('ix_outbox_jobs_due', 'outbox_jobs', ['status', 'next_attempt_at'])
+
+
+def create_classification_cache() -> None:
+    op.create_table(
+        'classification_cache',
+        sa.Column('content_hash', sa.String(64), primary_key=True),
+        sa.Column('is_relevant', sa.Boolean(), nullable=False),
+        sa.Column('reason', sa.Text(), nullable=True),
+        sa.Column('model', sa.String(128), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('classification_cache')
+    op.drop_table('outbox_jobs')
+    with op.batch_alter_table('gmail_accounts') as batch:
+        batch.drop_column('watch_expiration')
+        batch.drop_column('history_id')
+        batch.drop_column('token_expiry')
@@ -0,0 +1,39 @@
+"""per-user history indexes on processed_emails
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2024-11-01 00:00:00
+"""
+import sqlalchemy as sa
+from alembic import op
+
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_processed_emails_user_created',
+            'processed_emails',
+            ['user_id', sa.text('created_at DESC'), sa.text('id DESC')],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.create_index(
+            'ix_processed_emails_user_relevant_created',
+            'processed_emails',
+            ['user_id', sa.text('created_at DESC'), sa.text('id DESC')],
+            postgresql_where=sa.text('is_relevant IS true'),
+            sqlite_where=sa.text('is_relevant IS 1'),
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_processed_emails_user_relevant_created', 'processed_emails', postgresql_concurrently=True)
+        op.drop_index('ix_processed_emails_user_created', 'processed_emails', postgresql_concurrently=True)
@@ -0,0 +1,124 @@
+"""processed_email_keys dedupe table and optional monthly partitioning of processed_emails
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2024-11-01 00:10:00
+"""
+from datetime import datetime
+
+import sqlalchemy as sa
+from alembic import op
+
+from backend.app.config import settings
+
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+COLUMNS = (
+    'id, user_id, gmail_message_id, subject, sender, snippet, is_relevant, forwarded_to, whatsapp_notified, created_at'
+)
+TABLE_BODY = '''
+    user_id INTEGER NOT NULL REFERENCES users (id),
+    gmail_message_id VARCHAR(128) NOT NULL,
+    subject VARCHAR(512),
+    sender VARCHAR(512),
+    snippet TEXT,
+    is_relevant BOOLEAN NOT NULL,
+    forwarded_to VARCHAR(255),
+    whatsapp_notified BOOLEAN NOT NULL,
+    created_at TIMESTAMP WITHOUT TIME ZONE NOT NULL
+'''
+
+
+def add_months(month: datetime, months: int) -> datetime:
+    index = month.year * 12 + month.month - 1 + months
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def is_partitioned(bind) -> bool:
+    if bind.dialect.name != 'postgresql':
+        return False
+    return bool(
+        bind.scalar(
+            sa.text("SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass('processed_emails')")
+        )
+    )
+
+
+def create_history_indexes() -> None:
+    op.execute('CREATE INDEX ix_processed_emails_user_created ON processed_emails (user_id, created_at DESC, id DESC)')
+    op.execute(
+        'CREATE INDEX ix_processed_emails_user_relevant_created ON processed_emails '
+        '(user_id, created_at DESC, id DESC) WHERE is_relevant IS true'
+    )
+
+
+def partition_processed_emails(bind) -> None:
+    oldest = bind.scalar(sa.text('SELECT min(created_at) FROM processed_emails')) or datetime.utcnow()
+    first = datetime(oldest.year, oldest.month, 1)
+    last = add_months(datetime(datetime.utcnow().year, datetime.utcnow().month, 1), settings.PARTITIONS_AHEAD_MONTHS)
+
+    op.execute(
+        'INSERT INTO processed_email_keys (gmail_message_id, created_at) '
+        'SELECT gmail_message_id, created_at FROM processed_emails ON CONFLICT DO NOTHING'
+    )
+    op.execute(
+        "CREATE TABLE processed_emails_partitioned (id INTEGER NOT NULL DEFAULT nextval('processed_emails_id_seq'),"
+        f'{TABLE_BODY}, PRIMARY KEY (id, created_at)) PARTITION BY RANGE (created_at)'
+    )
+    month = first
+    while month <= last:
+        upper = add_months(month, 1)
+        op.execute(
+            f'CREATE TABLE processed_emails_p{month:%Y%m} PARTITION OF processed_emails_partitioned '
+            f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{upper:%Y-%m-%d}')"
+        )
+        month = upper
+    op.execute('CREATE TABLE processed_emails_default PARTITION OF processed_emails_partitioned DEFAULT')
+
+    op.execute(f'INSERT INTO processed_emails_partitioned ({COLUMNS}) SELECT {COLUMNS} FROM processed_emails')
+    op.execute('ALTER SEQUENCE processed_emails_id_seq OWNED BY NONE')
+    op.execute('DROP TABLE processed_emails')
+    op.execute('ALTER TABLE processed_emails_partitioned RENAME TO processed_emails')
+    op.execute('ALTER SEQUENCE processed_emails_id_seq OWNED BY processed_emails.id')
+    op.execute('CREATE INDEX ix_processed_emails_gmail_message_id ON processed_emails (gmail_message_id)')
+    create_history_indexes()
+
+
+def unpartition_processed_emails() -> None:
+    op.execute(
+        "CREATE TABLE processed_emails_unpartitioned (id INTEGER NOT NULL DEFAULT nextval('processed_emails_id_seq'),"
+        f'{TABLE_BODY}, CONSTRAINT processed_emails_pkey PRIMARY KEY (id), '
+        'CONSTRAINT processed_emails_gmail_message_id_key UNIQUE (gmail_message_id))'
+    )
+    op.execute(
+        f'INSERT INTO processed_emails_unpartitioned ({COLUMNS}) SELECT {COLUMNS} FROM processed_emails '
+        'ON CONFLICT (gmail_message_id) DO NOTHING'
+    )
+    op.execute('ALTER SEQUENCE processed_emails_id_seq OWNED BY NONE')
+    op.execute('DROP TABLE processed_emails')
+    op.execute('ALTER TABLE processed_emails_unpartitioned RENAME TO processed_emails')
+    op.execute('ALTER SEQUENCE processed_emails_id_seq OWNED BY processed_emails.id')
+    op.execute('CREATE INDEX ix_processed_emails_id ON processed_emails (id)')
+    create_history_indexes()
+
+
+def upgrade() -> None:
+    op.create_table(
+        'processed_email_keys',
+        sa.Column('gmail_message_id', sa.String(128), primary_key=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+    )
+    op.create_index('ix_processed_email_keys_created_at', 'processed_email_keys', ['created_at'])
+
+    bind = op.get_bind()
+    if settings.PROCESSED_EMAILS_PARTITIONED and bind.dialect.name == 'postgresql' and not is_partitioned(bind):
+        partition_processed_emails(bind)
+
+
+def downgrade() -> None:
+    if is_partitioned(op.get_bind()):
+        unpartition_processed_emails()
+    op.drop_table('processed_email_keys')
@@ -0,0 +1,53 @@
+"""trigger jobs and their progress events
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2024-11-15 00:00:00
+"""
+import sqlalchemy as sa
+from alembic import op
+
+revision = '0005'
+down_revision = '0004'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'trigger_jobs',
+        sa.Column('id', sa.String(36), primary_key=True),
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id'), nullable=False),
+        sa.Column('account_id', sa.Integer(), sa.ForeignKey('gmail_accounts.id'), nullable=False),
+        sa.Column('batch_size', sa.Integer(), nullable=False),
+        sa.Column('incremental', sa.Boolean(), nullable=False),
+        sa.Column('status', sa.String(16), nullable=False),
+        sa.Column('processed', sa.Integer(), nullable=True),
+        sa.Column('relevant', sa.Integer(), nullable=True),
+        sa.Column('ignored', sa.Integer(), nullable=True),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('started_at', sa.DateTime(), nullable=True),
+        sa.Column('finished_at', sa.DateTime(), nullable=True),
+    )
+    op.create_index('ix_trigger_jobs_user_id', 'trigger_jobs', ['user_id'])
+
+    op.create_table(
+        'trigger_job_events',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('job_id', sa.String(36), sa.ForeignKey('trigger_jobs.id'), nullable=False),
+        sa.Column('kind', sa.String(32), nullable=False),
+        sa.Column('payload', sa.Text(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+    )
+    op.create_index('ix_trigger_job_events_job', 'trigger_job_events', ['job_id', 'id'])
+
+    with op.batch_alter_table('outbox_jobs') as batch:
+        batch.add_column(sa.Column('trigger_job_id', sa.String(36), nullable=True))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('outbox_jobs') as batch:
+        batch.drop_column('trigger_job_id')
+    op.drop_table('trigger_job_events')
+    op.drop_table('trigger_jobs')
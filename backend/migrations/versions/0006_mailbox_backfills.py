@@ -0,0 +1,41 @@
+"""mailbox backfill checkpoints and trigger job modes
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2024-11-22 00:00:00
+"""
+import sqlalchemy as sa
+from alembic import op
+
+revision = '0006'
+down_revision = '0005'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'mailbox_backfills',
+        sa.Column('account_id', sa.Integer(), sa.ForeignKey('gmail_accounts.id'), primary_key=True),
+        sa.Column('status', sa.String(16), nullable=False),
+        sa.Column('page_token', sa.String(255), nullable=True),
+        sa.Column('pages', sa.Integer(), nullable=False),
+        sa.Column('processed', sa.Integer(), nullable=False),
+        sa.Column('relevant', sa.Integer(), nullable=False),
+        sa.Column('skipped', sa.Integer(), nullable=False),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.Column('started_at', sa.DateTime(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.Column('finished_at', sa.DateTime(), nullable=True),
+    )
+
+    with op.batch_alter_table('trigger_jobs') as batch:
+        batch.add_column(sa.Column('mode', sa.String(16), nullable=False, server_default='latest'))
+        batch.add_column(sa.Column('max_messages', sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('trigger_jobs') as batch:
+        batch.drop_column('max_messages')
+        batch.drop_column('mode')
+    op.drop_table('mailbox_backfills')
@@ -0,0 +1,26 @@
+"""shared token buckets for outbound rate limiting
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2024-11-29 00:00:00
+"""
+import sqlalchemy as sa
+from alembic import op
+
+revision = '0007'
+down_revision = '0006'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'rate_limit_buckets',
+        sa.Column('key', sa.String(128), primary_key=True),
+        sa.Column('tokens', sa.Float(), nullable=False),
+        sa.Column('updated_at', sa.Float(), nullable=False),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('rate_limit_buckets')
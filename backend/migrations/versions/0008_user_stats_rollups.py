@@ -0,0 +1,69 @@
+"""per-user stats rollups maintained alongside processed_emails, plus the is_spam flag they are rebuilt from
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2024-12-06 00:00:00
+"""
+import sqlalchemy as sa
+from alembic import op
+
+revision = '0008'
+down_revision = '0007'
+branch_labels = None
+depends_on = None
+
+RELEVANT = 'SUM(CASE WHEN is_relevant THEN 1 ELSE 0 END)'
+
+
+def upgrade() -> None:
+    op.add_column('processed_emails', sa.Column('is_spam', sa.Boolean(), nullable=False, server_default=sa.false()))
+    op.create_table(
+        'user_stats',
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id'), primary_key=True),
+        sa.Column('processed', sa.Integer(), nullable=False),
+        sa.Column('relevant', sa.Integer(), nullable=False),
+        sa.Column('spam', sa.Integer(), nullable=False),
+        sa.Column('version', sa.Integer(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+    )
+    op.create_table(
+        'user_daily_stats',
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id'), primary_key=True),
+        sa.Column('day', sa.Date(), primary_key=True),
+        sa.Column('processed', sa.Integer(), nullable=False),
+        sa.Column('relevant', sa.Integer(), nullable=False),
+        sa.Column('spam', sa.Integer(), nullable=False),
+    )
+    op.create_table(
+        'user_sender_stats',
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id'), primary_key=True),
+        sa.Column('sender', sa.String(512), primary_key=True),
+        sa.Column('processed', sa.Integer(), nullable=False),
+        sa.Column('relevant', sa.Integer(), nullable=False),
+        sa.Column('last_seen_at', sa.DateTime(), nullable=False),
+    )
+    op.create_index('ix_user_sender_stats_top', 'user_sender_stats', ['user_id', sa.text('processed DESC')])
+
+    op.execute(
+        'INSERT INTO user_stats (user_id, processed, relevant, spam, version, updated_at) '
+        f'SELECT user_id, COUNT(*), {RELEVANT}, 0, 1, MAX(created_at) FROM processed_emails GROUP BY user_id'
+    )
+    op.execute(
+        'INSERT INTO user_daily_stats (user_id, day, processed, relevant, spam) '
+        f'SELECT user_id, DATE(created_at), COUNT(*), {RELEVANT}, 0 FROM processed_emails '
+        'GROUP BY user_id, DATE(created_at)'
+    )
+    op.execute(
+        'INSERT INTO user_sender_stats (user_id, sender, processed, relevant, last_seen_at) '
+        f"SELECT user_id, COALESCE(sender, ''), COUNT(*), {RELEVANT}, MAX(created_at) FROM processed_emails "
+        "GROUP BY user_id, COALESCE(sender, '')"
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_user_sender_stats_top', 'user_sender_stats')
+    op.drop_table('user_sender_stats')
+    op.drop_table('user_daily_stats')
+    op.drop_table('user_stats')
+    with op.batch_alter_table('processed_emails') as batch:
+        batch.drop_column('is_spam')
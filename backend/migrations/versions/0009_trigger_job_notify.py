@@ -0,0 +1,22 @@
+"""per-job switch for forwarding and notifying leads, off for mailbox backfills
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2024-12-13 00:00:00
+"""
+import sqlalchemy as sa
+from alembic import op
+
+revision = '0009'
+down_revision = '0008'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('trigger_jobs', sa.Column('notify', sa.Boolean(), nullable=False, server_default=sa.true()))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('trigger_jobs') as batch:
+        batch.drop_column('notify')
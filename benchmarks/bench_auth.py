@@ -0,0 +1,70 @@
+import argparse
+import os
+import tempfile
+import time
+
+
+def run(requests: int, ttl: float) -> None:
+    from fastapi import Depends, FastAPI
+    from fastapi.testclient import TestClient
+    from sqlalchemy import select
+    from sqlalchemy.ext.asyncio import AsyncSession
+
+    from backend.app.auth import Principal, create_access_token, get_current_principal, principal_cache, token_subject
+    from backend.app.database import Base, SessionLocal, async_engine, engine, get_async_db
+    from backend.app.models import GmailAccount, User
+    from benchmarks.bench_dedupe import count_queries
+
+    Base.metadata.create_all(bind=engine)
+    with SessionLocal() as db:
+        user = User(email='auth@example.com', hashed_password='x')
+        db.add(user)
+        db.flush()
+        db.add(GmailAccount(user_id=user.id, gmail_email=user.email, access_token='t'))
+        db.commit()
+
+    app = FastAPI()
+
+    @app.get('/per-request-lookup')
+    async def per_request_lookup(token: str, db: AsyncSession = Depends(get_async_db)):
+        current_user = await db.scalar(select(User).where(User.email == token_subject(token)))
+        account = await db.scalar(select(GmailAccount).where(GmailAccount.user_id == current_user.id))
+        return {'account_id': account.id}
+
+    @app.get('/principal')
+    async def principal_lookup(principal: Principal = Depends(get_current_principal)):
+        return {'account_id': principal.account_id}
+
+    token = create_access_token('auth@example.com')
+    principal_cache.ttl_seconds = ttl
+    print(f'{"mode":>20} {"requests":>9} {"queries/req":>12} {"req/s":>9}')
+    with TestClient(app) as client:
+        for mode, path, params in (
+            ('per_request_lookup', '/per-request-lookup', {'token': token}),
+            ('principal_cold', '/principal', {}),
+            ('principal_hot', '/principal', {}),
+        ):
+            if mode == 'principal_cold':
+                principal_cache.ttl_seconds = 0.0
+            elif mode == 'principal_hot':
+                principal_cache.ttl_seconds = ttl
+                client.get(path, headers={'Authorization': f'Bearer {token}'})
+            with count_queries(async_engine.sync_engine) as counter:
+                started = time.perf_counter()
+                for _ in range(requests):
+                    response = client.get(path, params=params, headers={'Authorization': f'Bearer {token}'})
+                    assert response.status_code == 200, response.text
+                elapsed = time.perf_counter() - started
+            if mode == 'principal_hot':
+                assert counter['queries'] == 0, counter
+            print(f'{mode:>20} {requests:>9} {counter["queries"] / requests:>12.2f} {requests / elapsed:>9.1f}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='DB round trips per authenticated request with the principal cache.')
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--ttl', type=float, default=60.0, help='principal cache TTL for the hot run')
+    args = parser.parse_args()
+    tmp = tempfile.mkdtemp()
+    os.environ.update(DATABASE_URL=f'sqlite:///{os.path.join(tmp, "auth.db")}')
+    run(args.requests, args.ttl)
@@ -0,0 +1,102 @@
+import argparse
+import gc
+import os
+import tempfile
+import time
+import tracemalloc
+
+
+class SimulatedCrash(Exception):
+    pass
+
+
+def run_size(size: int, chunk_size: int, crash_after: int) -> int:
+    from sqlalchemy import create_engine, func, select
+    from sqlalchemy.orm import sessionmaker
+
+    from backend.app.config import settings
+    from backend.app.database import Base
+    from backend.app.models import GmailAccount, MailboxBackfill, ProcessedEmail, User
+    from backend.app.services import gmail_client
+    from backend.app.services.backfill import backfill_mailbox
+    from benchmarks.fake_gmail import FakeGmail
+
+    engine = create_engine(f'sqlite:///{os.path.join(tempfile.mkdtemp(), "backfill.db")}')
+    Base.metadata.create_all(engine)
+    Session = sessionmaker(bind=engine)
+
+    def crash(kind: str, items: list[dict]) -> None:
+        if items[0]['page'] >= crash_after:
+            raise SimulatedCrash(f'crashed after page {items[0]["page"]}')
+
+    with FakeGmail(message_count=size) as fake, Session() as db:
+        settings.GMAIL_API_ROOT_URL = fake.url
+        settings.GMAIL_USER_QUOTA_UNITS_PER_SECOND = settings.GMAIL_PROJECT_QUOTA_UNITS_PER_SECOND = 10 ** 9
+        gmail_client.load_gmail_discovery.cache_clear()
+        gmail_client.service_cache.clear()
+        user = User(email=f'backfill{size}@example.com', hashed_password='x')
+        db.add(user)
+        db.flush()
+        account = GmailAccount(user_id=user.id, gmail_email=user.email, access_token='fake-token')
+        db.add(account)
+        db.commit()
+
+        try:
+            backfill_mailbox(db, account, chunk_size=chunk_size, progress=crash)
+        except SimulatedCrash:
+            pass
+        checkpoint = db.get(MailboxBackfill, account.id)
+        assert checkpoint.status == 'failed' and checkpoint.pages == crash_after, checkpoint.status
+
+        retained = [0]
+
+        def measure(kind: str, items: list[dict]) -> None:
+            gc.collect()
+            retained.append(tracemalloc.get_traced_memory()[0] - baseline)
+
+        gc.collect()
+        tracemalloc.start()
+        baseline = tracemalloc.get_traced_memory()[0]
+        started = time.perf_counter()
+        totals = backfill_mailbox(db, account, chunk_size=chunk_size, progress=measure)
+        elapsed = time.perf_counter() - started
+        peak = tracemalloc.get_traced_memory()[1] - baseline
+        tracemalloc.stop()
+
+        db.refresh(checkpoint)
+        stored = db.scalar(select(func.count()).select_from(ProcessedEmail))
+        pages = -(-size // chunk_size)
+        assert checkpoint.status == 'done' and checkpoint.processed == size == stored, (checkpoint.processed, stored)
+        assert totals['processed'] == size - crash_after * chunk_size, totals
+        assert fake.calls['messages.list'] == pages, 'resume re-listed pages before the checkpoint'
+        assert fake.calls['messages.get'] == size, 'resume re-fetched messages that were already stored'
+        print(
+            f'{size:>7} {pages:>6} {fake.calls["messages.list"]:>6} {fake.calls["messages.get"]:>7} '
+            f'{totals["processed"]:>9} {elapsed:>8.1f} {max(retained) / 2**20:>11.1f} {peak / 2**20:>8.1f}'
+        )
+    engine.dispose()
+    return max(retained)
+
+
+def run(sizes: list[int], chunk_size: int, crash_after: int) -> None:
+    print(
+        f'{"size":>7} {"pages":>6} {"lists":>6} {"gets":>7} {"resumed":>9} {"wall_s":>8} '
+        f'{"retained_mb":>11} {"peak_mb":>8}'
+    )
+    retained = [run_size(size, chunk_size, crash_after) for size in sorted(sizes)]
+    assert retained[-1] <= retained[0] * 1.5 + 2**20, 'backfill memory grows with the size of the mailbox'
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Chunked mailbox backfill against a paginated fake Gmail: crash, resume, and peak memory.'
+    )
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000], help='mailbox sizes to backfill')
+    parser.add_argument('--chunk-size', type=int, default=100)
+    parser.add_argument('--crash-after', type=int, default=3, help='pages committed before the simulated crash')
+    args = parser.parse_args()
+    os.environ.update(
+        DATABASE_URL=f'sqlite:///{os.path.join(tempfile.mkdtemp(), "app.db")}',
+        OUTBOX_WORKER_IN_PROCESS='false',
+    )
+    run(args.sizes, args.chunk_size, args.crash_after)
@@ -0,0 +1,135 @@
+import argparse
+import base64
+import os
+import random
+import statistics
+import time
+import tracemalloc
+from email.message import EmailMessage
+from email.parser import BytesParser
+from email.policy import default
+from typing import Any
+
+PARAGRAPH = (
+    'Hi team, following up on our call about pricing for 40 seats. We would like a quote and a demo next week. '
+    'Please also send the proposal and the security questionnaire. '
+)
+
+
+def synthetic_mime(index: int, text_kb: int, html_kb: int, attachment_kb: int) -> EmailMessage:
+    message = EmailMessage()
+    message['Subject'] = f'Large message #{index}'
+    message['From'] = f'sender{index % 97}@example.com'
+    message['To'] = 'me@example.com'
+    text = (PARAGRAPH * (text_kb * 1024 // len(PARAGRAPH) + 1))[:text_kb * 1024]
+    message.set_content(text)
+    markup = f'<html><head><style>p {{color: red}}</style></head><body><p>{PARAGRAPH}</p>'
+    markup += '<div>' + '<span>filler &amp; more</span>' * (html_kb * 1024 // 40) + '</div></body></html>'
+    message.add_alternative(markup, subtype='html')
+    message.add_attachment(
+        random.Random(index).randbytes(attachment_kb * 1024),
+        maintype='application',
+        subtype='pdf',
+        filename=f'deck-{index}.pdf',
+    )
+    return message
+
+
+def encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).decode()
+
+
+def gmail_part(part: EmailMessage, index: int) -> dict[str, Any]:
+    headers = [{'name': name, 'value': str(value)} for name, value in part.items()]
+    if part.is_multipart():
+        return {
+            'mimeType': part.get_content_type(),
+            'filename': '',
+            'headers': headers,
+            'body': {'size': 0},
+            'parts': [gmail_part(child, index) for child in part.iter_parts()],
+        }
+    data = part.get_payload(decode=True)
+    if part.get_filename():
+        body = {'attachmentId': f'att-{index}-{part.get_filename()}', 'size': len(data)}
+    else:
+        body = {'data': encode(data), 'size': len(data)}
+    filename = part.get_filename() or ''
+    return {'mimeType': part.get_content_type(), 'filename': filename, 'headers': headers, 'body': body}
+
+
+def gmail_formats(index: int, text_kb: int, html_kb: int, attachment_kb: int) -> tuple[dict, dict]:
+    mime = synthetic_mime(index, text_kb, html_kb, attachment_kb)
+    base = {'id': f'm{index:08d}', 'threadId': f't{index:08d}', 'snippet': PARAGRAPH[:200]}
+    return dict(base, raw=encode(mime.as_bytes())), dict(base, payload=gmail_part(mime, index))
+
+
+def naive_body(raw_message: dict) -> str:
+    from backend.app.services.gmail_client import strip_html
+
+    parsed = BytesParser(policy=default).parsebytes(base64.urlsafe_b64decode(raw_message['raw']))
+    for part in parsed.walk():
+        part.get_payload(decode=True)
+    body = parsed.get_body(preferencelist=('plain', 'html'))
+    content = body.get_content()
+    return strip_html(content) if body.get_content_type() == 'text/html' else content
+
+
+def measure(fn, messages: list[dict]) -> tuple[float, float, int]:
+    timings, peaks, length = [], [], 0
+    tracemalloc.start()
+    for message in messages:
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        started = time.perf_counter()
+        result = fn(message)
+        timings.append(time.perf_counter() - started)
+        peaks.append(tracemalloc.get_traced_memory()[1] - before)
+        length = max(length, len(result))
+        del result
+    tracemalloc.stop()
+    return statistics.mean(timings) * 1000, max(peaks) / 2**20, length
+
+
+def run(count: int, text_kb: int, html_kb: int, attachment_kb: int, max_bytes: int) -> None:
+    from backend.app.config import settings
+    from backend.app.services import gmail_client
+    from benchmarks.fake_gmail import FakeGmail
+
+    settings.EMAIL_BODY_MAX_BYTES = max_bytes
+    formats = [gmail_formats(i, text_kb, html_kb, attachment_kb) for i in range(count)]
+    raw_messages = [raw for raw, _ in formats]
+    full_messages = [full for _, full in formats]
+    raw_kb = statistics.mean(len(m['raw']) for m in raw_messages) / 1024
+    print(f'messages={count} raw_size_kb={raw_kb:.0f} text_kb={text_kb} html_kb={html_kb} body_cap={max_bytes}')
+    print(f'{"mode":>22} {"ms_per_msg":>11} {"peak_mb":>8} {"body_chars":>11}')
+
+    for label, fn, messages in (
+        ('raw + email parser', naive_body, raw_messages),
+        ('full + bounded walk', lambda m: gmail_client.compact_message(m)['body'], full_messages),
+    ):
+        ms, peak, length = measure(fn, messages)
+        print(f'{label:>22} {ms:>11.2f} {peak:>8.2f} {length:>11}')
+    _, bounded_peak, bounded_length = measure(lambda m: gmail_client.compact_message(m)['body'], full_messages)
+    assert bounded_length <= max_bytes, bounded_length
+    assert bounded_peak * 2**20 <= max(2**20, 40 * max_bytes), f'bounded extraction peaked at {bounded_peak:.2f} MB'
+
+    settings.EMAIL_BODY_EXTRACTION = True
+    with FakeGmail() as fake:
+        fake.messages = full_messages
+        fetched = gmail_client.fetch_messages_batched(fake.service(), [m['id'] for m in full_messages])
+    fields = [gmail_client.extract_email_fields(message) for message in fetched]
+    assert len(fields) == count and all('pricing for 40 seats' in f['body'] for f in fields)
+    print(f'fetched {len(fetched)} messages in full format over {fake.calls["batch"]} batch calls, bodies capped')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Per-message time and memory of full-body extraction from large MIME.')
+    parser.add_argument('--count', type=int, default=50)
+    parser.add_argument('--text-kb', type=int, default=256)
+    parser.add_argument('--html-kb', type=int, default=512)
+    parser.add_argument('--attachment-kb', type=int, default=5120)
+    parser.add_argument('--max-bytes', type=int, default=16384)
+    args = parser.parse_args()
+    os.environ.setdefault('DATABASE_URL', 'sqlite://')
+    run(args.count, args.text_kb, args.html_kb, args.attachment_kb, args.max_bytes)
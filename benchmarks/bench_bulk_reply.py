@@ -0,0 +1,162 @@
+import argparse
+import asyncio
+import base64
+import os
+import tempfile
+import time
+import timeit
+from email import message_from_bytes
+
+INTENTS = ('book a demo next week', 'send the pricing sheet', 'loop in the solutions team')
+
+
+def make_replies(count: int) -> list[dict[str, str]]:
+    return [
+        {
+            'to_email': f'lead{index}@example.com',
+            'original_context': f'Evaluating tools for {10 + index % 90} seats. Could you share details? #{index}',
+            'intent': INTENTS[index % len(INTENTS)],
+        }
+        for index in range(count)
+    ]
+
+
+def decode_sent(sent: list[dict]) -> dict[str, tuple[str, str]]:
+    decoded = {}
+    for item in sent:
+        message = message_from_bytes(base64.urlsafe_b64decode(item['raw']))
+        decoded[message['to']] = (message['subject'], message.get_payload(decode=True).decode())
+    return decoded
+
+
+async def send_sequential(token: str, replies: list[dict[str, str]]) -> float:
+    import httpx
+
+    from backend.app.main import app
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url='http://bench', timeout=None) as client:
+        started = time.perf_counter()
+        for reply in replies:
+            response = await client.post(
+                '/automation/reply',
+                params=reply,
+                headers={'Authorization': f'Bearer {token}'},
+            )
+            assert response.status_code == 200, response.text
+        return time.perf_counter() - started
+
+
+async def send_bulk(token: str, replies: list[dict[str, str]]) -> tuple[float, dict]:
+    import httpx
+
+    from backend.app.main import app
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url='http://bench', timeout=None) as client:
+        started = time.perf_counter()
+        response = await client.post(
+            '/automation/reply/bulk',
+            json={'replies': replies},
+            headers={'Authorization': f'Bearer {token}'},
+        )
+        elapsed = time.perf_counter() - started
+    assert response.status_code == 200, response.text
+    return elapsed, response.json()
+
+
+def encode_costs(replies: list[dict[str, str]]) -> tuple[float, float]:
+    from email.mime.text import MIMEText
+
+    from backend.app.services.email_processor import REPLY_SUBJECT, render_reply
+    from backend.app.services.gmail_client import encode_message
+
+    def mime_per_message() -> None:
+        for reply in replies:
+            body = (
+                'Hi,\n\n'
+                'Thank you for reaching out.\n\n'
+                f'Based on your message: "{reply["original_context"][:500]}"\n'
+                f'Our intended response: {reply["intent"]}.\n\n'
+                'Can we schedule a short call to discuss next steps?\n\nBest regards'
+            )
+            mime = MIMEText(body)
+            mime['to'] = reply['to_email']
+            mime['subject'] = REPLY_SUBJECT
+            base64.urlsafe_b64encode(mime.as_bytes()).decode()
+
+    def template_and_encoder() -> None:
+        for reply in replies:
+            encode_message(reply['to_email'], REPLY_SUBJECT, render_reply(reply['original_context'], reply['intent']))
+
+    rounds = 5
+    return (
+        timeit.timeit(mime_per_message, number=rounds) / rounds / len(replies),
+        timeit.timeit(template_and_encoder, number=rounds) / rounds / len(replies),
+    )
+
+
+def check_rate_limited(token: str) -> None:
+    from backend.app.config import settings
+    from backend.app.services.gmail_client import GMAIL_QUOTA_UNITS
+    from backend.app.services.rate_limit import rate_limiter
+
+    settings.GMAIL_USER_QUOTA_UNITS_PER_SECOND = 250.0
+    rate_limiter.max_wait = 0.0
+    _, body = asyncio.run(send_bulk(token, make_replies(10)))
+    allowed = int(settings.GMAIL_USER_QUOTA_UNITS_PER_SECOND // GMAIL_QUOTA_UNITS['messages.send'])
+    statuses = [result['status'] for result in body['results']]
+    assert body['sent'] <= allowed and body['rate_limited'] == 10 - body['sent'], body
+    assert all(result['retry_after'] for result in body['results'] if result['status'] == 'rate_limited')
+    print(f'quota 250 units/s, no waiting: {statuses.count("sent")} sent, {body["rate_limited"]} reported rate_limited')
+
+
+def run(recipients: int, latency: float, concurrency: int) -> None:
+    from backend.app.config import settings
+    from backend.app.services.email_processor import REPLY_SUBJECT, render_reply
+    from benchmarks.bench_outbox import configure
+    from benchmarks.fake_gmail import FakeGmail
+    from benchmarks.fake_twilio import FakeTwilio
+    from benchmarks.load_test import seed
+
+    token = seed(1)[0]
+    replies = make_replies(recipients)
+    settings.GMAIL_SEND_CONCURRENCY = concurrency
+    with FakeGmail(latency=latency) as fake_gmail, FakeTwilio() as fake_twilio:
+        configure(fake_gmail, fake_twilio)
+        sequential = asyncio.run(send_sequential(token, replies))
+        sequential_sent = decode_sent(fake_gmail.sent)
+        fake_gmail.sent.clear()
+        fake_gmail.reset()
+
+        bulk, body = asyncio.run(send_bulk(token, replies))
+        bulk_sent = decode_sent(fake_gmail.sent)
+        assert body['sent'] == recipients and fake_gmail.calls['messages.send'] == recipients, body['sent']
+        assert [result['to_email'] for result in body['results']] == [reply['to_email'] for reply in replies]
+        assert bulk_sent == sequential_sent, 'bulk replies differ from the per-request replies'
+        for reply in replies[:: max(1, recipients // 50)]:
+            expected = (REPLY_SUBJECT, render_reply(reply['original_context'], reply['intent']))
+            assert bulk_sent[reply['to_email']] == expected, reply['to_email']
+        fake_gmail.reset()
+        check_rate_limited(token)
+
+    mime_cost, encoder_cost = encode_costs(replies)
+    print(f'{recipients} recipients, {latency * 1000:.0f}ms Gmail latency, {concurrency} sends in flight per account')
+    print(f'{"mode":>24} {"wall_s":>8} {"per_reply_ms":>13} {"replies/s":>10}')
+    for mode, seconds in (('POST /reply per lead', sequential), ('POST /reply/bulk', bulk)):
+        print(f'{mode:>24} {seconds:>8.2f} {seconds / recipients * 1000:>13.2f} {recipients / seconds:>10.1f}')
+    print(f'render + encode per reply: {mime_cost * 1e6:.0f}us with MIMEText, {encoder_cost * 1e6:.0f}us precompiled')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Per-lead /automation/reply calls vs one /automation/reply/bulk call.')
+    parser.add_argument('--recipients', type=int, default=1000)
+    parser.add_argument('--latency', type=float, default=0.02, help='simulated Gmail latency in seconds')
+    parser.add_argument('--concurrency', type=int, default=8, help='GMAIL_SEND_CONCURRENCY for the bulk call')
+    parser.add_argument('--database-url')
+    args = parser.parse_args()
+    os.environ.update(
+        DATABASE_URL=args.database_url or f'sqlite:///{os.path.join(tempfile.mkdtemp(), "bulk_reply.db")}',
+        OUTBOX_WORKER_IN_PROCESS='false',
+    )
+    run(args.recipients, args.latency, args.concurrency)
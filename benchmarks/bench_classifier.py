@@ -0,0 +1,68 @@
+import argparse
+import random
+import time
+
+from backend.app.agents.email_agent import KEYWORDS, SPAM_HINTS, classify_emails, get_email_agent
+
+FILLER = (
+    'hello team leader buyer thanks for the update on the quarterly roadmap please find attached notes '
+    'from yesterday meeting and let me know about availability next week regards'
+).split()
+
+
+def synthetic_corpus(size: int, seed: int = 7) -> list[dict]:
+    rng = random.Random(seed)
+    hints = sorted(KEYWORDS) + sorted(SPAM_HINTS)
+    corpus = []
+    for _ in range(size):
+        words = rng.choices(FILLER, k=30)
+        if rng.random() < 0.3:
+            words.insert(rng.randrange(len(words)), rng.choice(hints))
+        corpus.append(
+            {
+                'subject': ' '.join(words[:6]).title(),
+                'sender': 'someone@example.com',
+                'snippet': ' '.join(words[6:]),
+                'is_relevant': False,
+                'confidence_reason': '',
+                'matched_rule': '',
+            }
+        )
+    return corpus
+
+
+def substring_classify(state: dict) -> bool:
+    text = f"{state['subject']} {state['snippet']}".lower()
+    if any(token in text for token in SPAM_HINTS):
+        return False
+    return any(token in text for token in KEYWORDS)
+
+
+def measure(label: str, size: int, fn) -> None:
+    started = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - started
+    print(f'{label:>28} {size:>8} {elapsed:>8.3f} {size / elapsed:>12,.0f}')
+
+
+def run(size: int, per_email_sample: int) -> None:
+    corpus = synthetic_corpus(size)
+    sample = corpus[:per_email_sample]
+    agent = get_email_agent()
+    print(f'{"path":>28} {"emails":>8} {"wall_s":>8} {"emails_per_s":>12}')
+    measure('per-email invoke (old path)', len(sample), lambda: [agent.invoke(dict(e)) for e in sample])
+    measure('compiled graph .batch', len(sample), lambda: agent.batch([dict(e) for e in sample]))
+    measure('classify_emails', size, lambda: classify_emails(corpus))
+
+    results = classify_emails(corpus)
+    changed = sum(1 for state, result in zip(corpus, results) if substring_classify(state) != result['is_relevant'])
+    fired = sum(1 for result in results if result['matched_rule'])
+    print(f'rules fired on {fired} emails; {changed} verdicts differ from substring matching (e.g. "buyer", "leader")')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Keyword classifier throughput on a synthetic corpus.')
+    parser.add_argument('--size', type=int, default=100_000)
+    parser.add_argument('--per-email-sample', type=int, default=2_000)
+    args = parser.parse_args()
+    run(args.size, args.per_email_sample)
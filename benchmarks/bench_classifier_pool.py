@@ -0,0 +1,46 @@
+import argparse
+import os
+import time
+
+from backend.app.agents.classifier_pool import ClassifierPool
+from backend.app.agents.email_agent import get_batch_email_agent
+from benchmarks.bench_classifier import synthetic_corpus
+
+
+def verdicts(results: list[dict]) -> list[tuple[bool, str]]:
+    return [(result['is_relevant'], result['matched_rule']) for result in results]
+
+
+def run(size: int, processes: list[int], chunk_size: int) -> None:
+    corpus = synthetic_corpus(size)
+    print(f'cores={os.cpu_count()} emails={size} chunk_size={chunk_size}')
+    print(f'{"mode":>12} {"warmup_s":>9} {"wall_s":>8} {"emails_per_s":>13} {"speedup":>8}')
+
+    started = time.perf_counter()
+    expected = verdicts(get_batch_email_agent().invoke({'emails': corpus})['emails'])
+    baseline = time.perf_counter() - started
+    print(f'{"in-process":>12} {0:>9.2f} {baseline:>8.2f} {size / baseline:>13,.0f} {1:>8.2f}')
+
+    for count in processes:
+        pool = ClassifierPool(processes=count, chunk_size=chunk_size, min_batch=0)
+        try:
+            started = time.perf_counter()
+            pids = pool.start()
+            warmup = time.perf_counter() - started
+            started = time.perf_counter()
+            results = pool.classify(corpus)
+            elapsed = time.perf_counter() - started
+        finally:
+            pool.stop()
+        assert verdicts(results) == expected, 'process pool verdicts differ from in-process classification'
+        label = f'{len(pids)} procs'
+        print(f'{label:>12} {warmup:>9.2f} {elapsed:>8.2f} {size / elapsed:>13,.0f} {baseline / elapsed:>8.2f}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Classification throughput in-process vs a warm process pool.')
+    parser.add_argument('--size', type=int, default=200_000)
+    parser.add_argument('--processes', type=int, nargs='+', default=sorted({1, 2, 4, os.cpu_count() or 1}))
+    parser.add_argument('--chunk-size', type=int, default=2000)
+    args = parser.parse_args()
+    run(args.size, args.processes, args.chunk_size)
@@ -0,0 +1,88 @@
+import argparse
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from unittest import mock
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from backend.app.config import settings
+from backend.app.database import Base
+from backend.app.models import ProcessedEmail
+from backend.app.services import email_processor
+from benchmarks.fake_gmail import synthetic_message
+
+
+@contextmanager
+def count_queries(engine):
+    counter = {'queries': 0}
+
+    def on_execute(*args) -> None:
+        counter['queries'] += 1
+
+    event.listen(engine, 'before_cursor_execute', on_execute)
+    try:
+        yield counter
+    finally:
+        event.remove(engine, 'before_cursor_execute', on_execute)
+
+
+def per_row_dedupe(db, account, raw_messages) -> None:
+    for raw in raw_messages:
+        fields = email_processor.extract_email_fields(raw)
+        if db.query(ProcessedEmail).filter(ProcessedEmail.gmail_message_id == fields['id']).first():
+            continue
+        db.add(ProcessedEmail(user_id=account.user_id, gmail_message_id=fields['id'], subject=fields['subject']))
+        db.flush()
+    db.commit()
+
+
+def classify_nothing(states: list[dict]) -> list[dict]:
+    return [dict(state, is_relevant=False, confidence_reason='') for state in states]
+
+
+def bulk_dedupe(db, account, raw_messages) -> None:
+    with mock.patch.object(email_processor, 'fetch_latest_messages', return_value=raw_messages), \
+            mock.patch.object(email_processor, 'classify_emails', classify_nothing):
+        email_processor.process_latest_emails(db, account, batch_size=len(raw_messages))
+
+
+def run(sizes: list[int], database_url: str) -> None:
+    engine = create_engine(database_url)
+    Session = sessionmaker(bind=engine)
+    account = mock.Mock(user_id=1, history_id=None)
+    print(f'{"size":>6} {"mode":>8} {"queries":>8} {"wall_s":>8}')
+    for size in sizes:
+        raw_messages = [synthetic_message(i) for i in range(size)]
+        for mode, dedupe in (('per_row', per_row_dedupe), ('bulk', bulk_dedupe)):
+            Base.metadata.drop_all(engine)
+            Base.metadata.create_all(engine)
+            now = datetime.utcnow()
+            with Session() as db:
+                email_processor.insert_new_processed_emails(
+                    db,
+                    [
+                        {'user_id': 1, 'gmail_message_id': m['id'], 'is_relevant': False, 'created_at': now}
+                        for m in raw_messages[::2]
+                    ],
+                )
+                db.commit()
+            with Session() as db, count_queries(engine) as counter:
+                started = time.perf_counter()
+                dedupe(db, account, raw_messages)
+                elapsed = time.perf_counter() - started
+            if mode == 'bulk':
+                chunks = -(-size // email_processor.BULK_CHUNK_SIZE)
+                per_chunk = 3 if settings.PROCESSED_EMAILS_PARTITIONED else 2
+                rollups = 3
+                assert counter['queries'] <= per_chunk * chunks + rollups + 1, counter
+            print(f'{size:>6} {mode:>8} {counter["queries"]:>8} {elapsed:>8.3f}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Per-row vs set-based ProcessedEmail dedupe and insert.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 1000, 10000])
+    parser.add_argument('--database-url', default='sqlite://')
+    args = parser.parse_args()
+    run(args.sizes, args.database_url)
@@ -0,0 +1,33 @@
+import argparse
+import time
+
+from backend.app.services.gmail_client import fetch_messages_batched
+from benchmarks.fake_gmail import FakeGmail
+
+
+def fetch_sequential(service, message_ids: list[str]) -> list[dict]:
+    return [service.users().messages().get(userId='me', id=message_id).execute() for message_id in message_ids]
+
+
+def run(sizes: list[int], latency: float) -> None:
+    print(f'{"size":>6} {"mode":>10} {"round_trips":>12} {"wall_s":>8}')
+    for size in sizes:
+        with FakeGmail(message_count=size, latency=latency) as fake:
+            service = fake.service()
+            listed = service.users().messages().list(userId='me', maxResults=size).execute()
+            message_ids = [msg['id'] for msg in listed['messages']]
+            for mode, fetch in (('sequential', fetch_sequential), ('batched', fetch_messages_batched)):
+                fake.reset()
+                started = time.perf_counter()
+                messages = fetch(service, message_ids)
+                elapsed = time.perf_counter() - started
+                assert len(messages) == size
+                print(f'{size:>6} {mode:>10} {fake.round_trips + 1:>12} {elapsed:>8.3f}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Sequential vs batched Gmail message fetch against a local fake.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 100, 1000])
+    parser.add_argument('--latency', type=float, default=0.02, help='simulated per-request server latency in seconds')
+    args = parser.parse_args()
+    run(args.sizes, args.latency)
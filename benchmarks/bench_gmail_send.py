@@ -0,0 +1,57 @@
+import argparse
+import time
+from types import SimpleNamespace
+
+from google.oauth2.credentials import Credentials
+from googleapiclient.discovery import build
+
+from backend.app.config import settings
+from backend.app.services import gmail_client
+from benchmarks.fake_gmail import FakeGmail
+
+
+def fake_account(account_id: int = 1) -> SimpleNamespace:
+    return SimpleNamespace(
+        id=account_id,
+        access_token='fake-token',
+        refresh_token=None,
+        token_expiry=None,
+        token_uri=None,
+        client_id=None,
+        client_secret=None,
+        scopes=None,
+    )
+
+
+def send_uncached(fake: FakeGmail, account: SimpleNamespace, count: int) -> None:
+    for i in range(count):
+        creds = Credentials(token=account.access_token)
+        service = build('gmail', 'v1', credentials=creds, client_options={'api_endpoint': fake.url})
+        body = {'raw': gmail_client.base64.urlsafe_b64encode(f'message {i}'.encode()).decode()}
+        service.users().messages().send(userId='me', body=body).execute()
+
+
+def send_cached(fake: FakeGmail, account: SimpleNamespace, count: int) -> None:
+    for i in range(count):
+        gmail_client.send_email(account, 'sales@example.com', f'Lead {i}', f'message {i}')
+
+
+def run(count: int) -> None:
+    with FakeGmail() as fake:
+        settings.GMAIL_API_ROOT_URL = fake.url
+        settings.GMAIL_USER_QUOTA_UNITS_PER_SECOND = settings.GMAIL_PROJECT_QUOTA_UNITS_PER_SECOND = 10 ** 9
+        gmail_client.load_gmail_discovery.cache_clear()
+        gmail_client.service_cache.clear()
+        account = fake_account()
+        print(f'{"mode":>9} {"sends":>6} {"per_send_ms":>12}')
+        for mode, send in (('uncached', send_uncached), ('cached', send_cached)):
+            started = time.perf_counter()
+            send(fake, account, count)
+            elapsed = time.perf_counter() - started
+            print(f'{mode:>9} {count:>6} {elapsed / count * 1000:>12.2f}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Per-message Gmail send cost with and without the service cache.')
+    parser.add_argument('--count', type=int, default=200)
+    run(parser.parse_args().count)
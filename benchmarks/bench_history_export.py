@@ -0,0 +1,111 @@
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+
+def seed(rows: int) -> str:
+    from sqlalchemy import insert
+
+    from backend.app.auth import create_access_token
+    from backend.app.database import Base, engine
+    from backend.app.models import ProcessedEmail, User
+
+    Base.metadata.create_all(bind=engine)
+    start = datetime.utcnow() - timedelta(days=365)
+    with engine.begin() as conn:
+        conn.execute(insert(User), [{'email': 'export@example.com', 'hashed_password': 'x'}])
+        for offset in range(0, rows, 20000):
+            conn.execute(
+                insert(ProcessedEmail),
+                [
+                    {
+                        'user_id': 1,
+                        'gmail_message_id': f'm{i:010d}',
+                        'subject': f'Re: pricing for {i % 50} seats',
+                        'sender': f'sender{i % 97}@example.com',
+                        'is_relevant': i % 5 == 0,
+                        'whatsapp_notified': False,
+                        'created_at': start + timedelta(seconds=i * 30),
+                    }
+                    for i in range(offset, min(offset + 20000, rows))
+                ],
+            )
+    return create_access_token('export@example.com')
+
+
+def buffered_export(fmt: str) -> tuple[int, int]:
+    from backend.app.database import SessionLocal
+    from backend.app.services.history import csv_lines, history_query, ndjson_lines
+
+    tracemalloc.reset_peak()
+    with SessionLocal() as db:
+        rows = db.execute(history_query(1)).all()
+        body = csv_lines(rows, header=True) if fmt == 'csv' else ndjson_lines(rows)
+    return body.count('\n'), tracemalloc.get_traced_memory()[1]
+
+
+def streamed_export(base_url: str, token: str, fmt: str, rows: int) -> tuple[int, int, int]:
+    import httpx
+
+    lines = 0
+    warmup_peak = 0
+    tracemalloc.reset_peak()
+    with httpx.stream(
+        'GET',
+        f'{base_url}/automation/history/export',
+        params={'format': fmt},
+        headers={'Authorization': f'Bearer {token}'},
+        timeout=600,
+    ) as response:
+        response.raise_for_status()
+        for chunk in response.iter_bytes():
+            lines += chunk.count(b'\n')
+            if not warmup_peak and lines >= rows // 10:
+                warmup_peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.reset_peak()
+    return lines, warmup_peak, tracemalloc.get_traced_memory()[1]
+
+
+def run(rows: int, fmt: str) -> None:
+    from backend.app.main import app
+    from benchmarks.load_test import serve
+
+    started = time.perf_counter()
+    token = seed(rows)
+    print(f'seeded rows={rows} in {time.perf_counter() - started:.1f}s')
+
+    server, thread, base_url = serve(app)
+    tracemalloc.start()
+    try:
+        started = time.perf_counter()
+        lines, warmup_peak, rest_peak = streamed_export(base_url, token, fmt, rows)
+        elapsed = time.perf_counter() - started
+        print(
+            f'streamed  lines={lines} wall_s={elapsed:.1f} peak_first_10%_mb={warmup_peak / 2**20:.1f} '
+            f'peak_remaining_90%_mb={rest_peak / 2**20:.1f}'
+        )
+        assert rest_peak <= warmup_peak * 1.5 + 2**20, 'export memory grows with the number of rows'
+
+        started = time.perf_counter()
+        lines, peak = buffered_export(fmt)
+        print(f'buffered  lines={lines} wall_s={time.perf_counter() - started:.1f} peak_mb={peak / 2**20:.1f}')
+    finally:
+        tracemalloc.stop()
+        server.should_exit = True
+        thread.join()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Memory profile of the streaming history export vs a buffered export.')
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--format', choices=['ndjson', 'csv'], default='ndjson')
+    args = parser.parse_args()
+    tmp = tempfile.mkdtemp()
+    os.environ.update(
+        DATABASE_URL=f'sqlite:///{os.path.join(tmp, "export.db")}',
+        OUTBOX_WORKER_IN_PROCESS='false',
+    )
+    run(args.rows, args.format)
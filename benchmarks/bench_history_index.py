@@ -0,0 +1,108 @@
+import argparse
+import json
+import random
+import statistics
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, insert, text
+from sqlalchemy.schema import CreateIndex, DropIndex
+
+from backend.app.database import Base
+from backend.app.models import ProcessedEmail, User
+from backend.app.services import history
+
+HISTORY_INDEXES = ('ix_processed_emails_user_created', 'ix_processed_emails_user_relevant_created')
+
+
+def history_query(user_id: int, relevant_only: bool, limit: int = 50):
+    return history.history_query(user_id, relevant=True if relevant_only else None).limit(limit)
+
+
+def seed(engine, rows: int, users: int) -> None:
+    rng = random.Random(7)
+    start = datetime.utcnow() - timedelta(days=365)
+    with engine.begin() as conn:
+        conn.execute(insert(User), [{'email': f'u{i}@example.com', 'hashed_password': 'x'} for i in range(users)])
+        for offset in range(0, rows, 10000):
+            conn.execute(
+                insert(ProcessedEmail),
+                [
+                    {
+                        'user_id': rng.randint(1, users),
+                        'gmail_message_id': f'm{i:010d}',
+                        'subject': f'subject {i}',
+                        'is_relevant': rng.random() < 0.2,
+                        'whatsapp_notified': False,
+                        'created_at': start + timedelta(seconds=rng.randint(0, 365 * 86400)),
+                    }
+                    for i in range(offset, min(offset + 10000, rows))
+                ],
+            )
+
+
+def plan(conn, stmt) -> tuple[str, bool]:
+    compiled = stmt.compile(conn, compile_kwargs={'literal_binds': True})
+    if conn.dialect.name == 'postgresql':
+        document = conn.scalar(text(f'EXPLAIN (FORMAT JSON) {compiled}'))
+        nodes, stack = [], [document[0]['Plan']]
+        while stack:
+            node = stack.pop()
+            nodes.append(node)
+            stack.extend(node.get('Plans', []))
+        uses_index = not any(
+            n['Node Type'] == 'Seq Scan' and n.get('Relation Name', '').startswith('processed_emails') for n in nodes
+        ) and any(n.get('Index Name', '').startswith(HISTORY_INDEXES) for n in nodes)
+        return json.dumps(document), uses_index
+    rows = [row[-1] for row in conn.execute(text(f'EXPLAIN QUERY PLAN {compiled}'))]
+    uses_index = any('USING INDEX ix_processed_emails_user_' in row for row in rows)
+    return ' | '.join(rows), uses_index and not any('USE TEMP B-TREE' in row for row in rows)
+
+
+def timed(conn, user_ids: list[int], relevant_only: bool) -> float:
+    samples = []
+    for user_id in user_ids:
+        started = time.perf_counter()
+        conn.execute(history_query(user_id, relevant_only)).all()
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples) * 1000
+
+
+def run(database_url: str, rows: int, users: int, samples: int) -> None:
+    engine = create_engine(database_url)
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    started = time.perf_counter()
+    seed(engine, rows, users)
+    print(f'seeded rows={rows} users={users} in {time.perf_counter() - started:.1f}s')
+
+    indexes = [index for index in ProcessedEmail.__table__.indexes if index.name in HISTORY_INDEXES]
+    user_ids = random.Random(3).sample(range(1, users + 1), min(samples, users))
+    print(f'{"query":>10} {"indexes":>8} {"p50_ms":>9}  plan')
+    with engine.connect() as conn:
+        conn.execute(text('ANALYZE'))
+        for relevant_only in (False, True):
+            name = 'relevant' if relevant_only else 'history'
+            explained, uses_index = plan(conn, history_query(user_ids[0], relevant_only))
+            assert uses_index, f'{name} query does not use a history index: {explained}'
+            print(f'{name:>10} {"yes":>8} {timed(conn, user_ids, relevant_only):>9.3f}  {explained[:100]}')
+
+        for index in indexes:
+            conn.execute(DropIndex(index))
+        for relevant_only in (False, True):
+            name = 'relevant' if relevant_only else 'history'
+            explained, _ = plan(conn, history_query(user_ids[1], relevant_only))
+            print(f'{name:>10} {"no":>8} {timed(conn, user_ids, relevant_only):>9.3f}  {explained[:100]}')
+        for index in indexes:
+            conn.execute(CreateIndex(index))
+        conn.commit()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Per-user history query plans and latency with and without indexes.')
+    parser.add_argument('--database-url', default='sqlite://')
+    parser.add_argument('--rows', type=int, default=500000)
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--samples', type=int, default=200, help='users queried per measurement')
+    args = parser.parse_args()
+    run(args.database_url, args.rows, args.users, args.samples)
@@ -0,0 +1,76 @@
+import argparse
+import random
+import time
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from backend.app.agents.email_agent import build_batch_agent
+from backend.app.agents.llm_classifier import ClassificationCache, LLMClassifier
+from backend.app.database import Base
+from benchmarks.stub_chat_model import RecordingChatModel
+
+SUBJECTS = [
+    'Quick question about your product',
+    'Your weekly digest',
+    'Pricing for 40 seats',
+    'Bitcoin lottery winner',
+    'We are interested in a pilot',
+    'Team offsite photos',
+]
+
+
+def corpus(size: int, distinct: int, seed: int = 3) -> list[dict]:
+    rng = random.Random(seed)
+    emails = []
+    for _ in range(size):
+        variant = rng.randrange(distinct)
+        subject = SUBJECTS[variant % len(SUBJECTS)]
+        emails.append(
+            {
+                'subject': f'{"Fwd: " if rng.random() < 0.2 else ""}{subject} v{variant}',
+                'sender': f'user{rng.randrange(50)}@example.com',
+                'snippet': f'Message body variant {variant}.',
+                'is_relevant': False,
+                'confidence_reason': '',
+                'matched_rule': '',
+            }
+        )
+    return emails
+
+
+def run(size: int, distinct: int, latency: float, batch_size: int, concurrency: int) -> None:
+    engine = create_engine('sqlite://')
+    Base.metadata.create_all(engine)
+    cache = ClassificationCache(max_size=10_000, session_factory=sessionmaker(bind=engine))
+    stub = RecordingChatModel(latency=latency)
+    agent = build_batch_agent(
+        LLMClassifier(chat_model=stub, cache=cache, batch_size=batch_size, max_concurrency=concurrency)
+    )
+    emails = corpus(size, distinct)
+
+    for run_label in ('cold', 'warm'):
+        stub.calls.clear()
+        started = time.perf_counter()
+        results = agent.invoke({'emails': [dict(email) for email in emails]})['emails']
+        elapsed = time.perf_counter() - started
+        tiers: dict[str, int] = {}
+        for result in results:
+            rule = result['matched_rule']
+            tier = rule if rule.startswith('llm') else rule.split(':')[0] or 'none'
+            tiers[tier] = tiers.get(tier, 0) + 1
+        print(
+            f'{run_label}: emails={size} wall_s={elapsed:.3f} model_calls={len(stub.calls)} '
+            f'emails_sent_to_model={stub.emails_seen} max_in_flight={stub.max_in_flight} tiers={tiers}'
+        )
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Tiered keyword/LLM classification against a recording stub model.')
+    parser.add_argument('--size', type=int, default=1000)
+    parser.add_argument('--distinct', type=int, default=120, help='distinct email bodies in the corpus')
+    parser.add_argument('--latency', type=float, default=0.05, help='simulated model latency per request')
+    parser.add_argument('--batch-size', type=int, default=10)
+    parser.add_argument('--concurrency', type=int, default=4)
+    args = parser.parse_args()
+    run(args.size, args.distinct, args.latency, args.batch_size, args.concurrency)
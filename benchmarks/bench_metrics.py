@@ -0,0 +1,129 @@
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+from unittest import mock
+
+METRICS_TOKEN = 'bench-metrics-token'
+
+
+def per_call_us(fn, calls: int = 100000) -> float:
+    started = time.perf_counter()
+    for _ in range(calls):
+        fn()
+    return (time.perf_counter() - started) / calls * 1e6
+
+
+def run_overhead(messages: int, rounds: int, max_overhead: float) -> None:
+    from backend.app import metrics
+    from backend.app.config import settings
+    from backend.app.database import SessionLocal
+    from backend.app.models import GmailAccount
+    from backend.app.services import email_processor
+    from benchmarks.fake_gmail import synthetic_message
+
+    def stage_call() -> None:
+        with metrics.stage('bench'):
+            pass
+
+    api_call_us = per_call_us(lambda: metrics.count_api_call('bench', 'call'))
+    print(f'per call: stage() {per_call_us(stage_call):.2f}us, count_api_call() {api_call_us:.2f}us')
+
+    timings: dict[bool, list[float]] = {True: [], False: []}
+    offset = 10 ** 6
+    with SessionLocal() as db:
+        account = db.query(GmailAccount).first()
+        for index in range(rounds * 2):
+            enabled = index % 2 == 0
+            settings.METRICS_ENABLED = enabled
+            batch = [synthetic_message(offset + i) for i in range(messages)]
+            offset += messages
+            with mock.patch.object(email_processor, 'fetch_latest_messages', return_value=batch):
+                started = time.perf_counter()
+                email_processor.process_latest_emails(db, account, batch_size=messages)
+                timings[enabled].append(time.perf_counter() - started)
+    settings.METRICS_ENABLED = True
+
+    off, on = statistics.median(timings[False]), statistics.median(timings[True])
+    overhead = on / off - 1
+    print(f'{"metrics":>8} {"runs":>5} {"messages":>9} {"median_ms":>10}')
+    print(f'{"off":>8} {rounds:>5} {messages:>9} {off * 1000:>10.1f}')
+    print(f'{"on":>8} {rounds:>5} {messages:>9} {on * 1000:>10.1f}   overhead {overhead:+.1%}')
+    assert overhead <= max_overhead, f'instrumentation overhead {overhead:.1%} exceeds {max_overhead:.0%}'
+
+
+async def run_profiled_trigger(token: str, batch_size: int) -> None:
+    import httpx
+
+    from backend.app.main import app
+
+    headers = {'Authorization': f'Bearer {token}'}
+    metrics_headers = {'Authorization': f'Bearer {METRICS_TOKEN}'}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url='http://bench') as client:
+        plain = await client.post('/automation/trigger', params={'batch_size': batch_size}, headers=headers)
+        profiled = await client.post(
+            '/automation/trigger',
+            params={'batch_size': batch_size},
+            headers={**headers, 'X-Profile': METRICS_TOKEN},
+        )
+        guessed = await client.post(
+            '/automation/trigger',
+            params={'batch_size': batch_size},
+            headers={**headers, 'X-Profile': '1'},
+        )
+        anonymous = await client.get('/metrics')
+        exposition = (await client.get('/metrics', headers=metrics_headers)).text
+
+    assert plain.status_code == profiled.status_code == guessed.status_code == 200, (plain.text, profiled.text)
+    assert 'server-timing' not in plain.headers and 'server-timing' not in guessed.headers
+    assert anonymous.status_code == 401, anonymous.status_code
+    timing = profiled.headers['server-timing']
+    print('Server-Timing for a profiled trigger:')
+    for entry in timing.split(', '):
+        print(f'  {entry}')
+    for name in ('gmail.messages.list', 'gmail.fetch', 'classify', 'db.dedupe', 'gmail_calls', 'db_queries'):
+        assert name in timing, f'{name} missing from Server-Timing'
+    for series in (
+        'lead_automation_stage_seconds_bucket{le="0.001",stage="gmail.fetch"}',
+        'lead_automation_api_calls_total{method="messages.get",outcome="ok",provider="gmail"}',
+        'lead_automation_run_db_queries_count{source="latest"}',
+        'lead_automation_classifications_total{relevant=',
+        'lead_automation_pool_size{pool="blocking_io"}',
+    ):
+        assert series in exposition, f'{series} missing from /metrics'
+    print(f'/metrics: {len(exposition.splitlines())} lines')
+
+
+def run(messages: int, rounds: int, max_overhead: float) -> None:
+    from backend.app.config import settings
+    from backend.app.services import gmail_client
+    from benchmarks.fake_gmail import FakeGmail
+    from benchmarks.load_test import seed
+
+    tokens = seed(1)
+    run_overhead(messages, rounds, max_overhead)
+    with FakeGmail(message_count=200) as fake:
+        settings.GMAIL_API_ROOT_URL = fake.url
+        settings.GMAIL_USER_QUOTA_UNITS_PER_SECOND = settings.GMAIL_PROJECT_QUOTA_UNITS_PER_SECOND = 10 ** 9
+        gmail_client.load_gmail_discovery.cache_clear()
+        gmail_client.service_cache.clear()
+        asyncio.run(run_profiled_trigger(tokens[0], 50))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Instrumentation overhead on the processing pipeline, the profiling header and /metrics.'
+    )
+    parser.add_argument('--messages', type=int, default=500, help='messages per processing run')
+    parser.add_argument('--rounds', type=int, default=15)
+    parser.add_argument('--max-overhead', type=float, default=0.05)
+    args = parser.parse_args()
+    os.environ.update(
+        DATABASE_URL=f'sqlite:///{os.path.join(tempfile.mkdtemp(), "app.db")}',
+        OUTBOX_WORKER_IN_PROCESS='false',
+        METRICS_TOKEN=METRICS_TOKEN,
+    )
+    run(args.messages, args.rounds, args.max_overhead)
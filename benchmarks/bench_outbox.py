@@ -0,0 +1,84 @@
+import argparse
+import os
+import tempfile
+import time
+from unittest import mock
+
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import sessionmaker
+
+from backend.app.config import settings
+from backend.app.database import Base
+from backend.app.models import GmailAccount, OutboxJob, ProcessedEmail, User
+from backend.app.services import email_processor, gmail_client
+from backend.app.services.outbox import OutboxWorker
+from benchmarks.fake_gmail import FakeGmail, synthetic_message
+from benchmarks.fake_twilio import FakeTwilio
+
+
+def configure(fake_gmail: FakeGmail, fake_twilio: FakeTwilio) -> None:
+    settings.GMAIL_API_ROOT_URL = fake_gmail.url
+    settings.GMAIL_USER_QUOTA_UNITS_PER_SECOND = settings.GMAIL_PROJECT_QUOTA_UNITS_PER_SECOND = 10 ** 9
+    settings.TWILIO_API_BASE_URL = fake_twilio.url
+    settings.TWILIO_ACCOUNT_SID = 'ACfake'
+    settings.TWILIO_AUTH_TOKEN = 'fake'
+    settings.TWILIO_WHATSAPP_FROM = 'whatsapp:+10000000000'
+    settings.TWILIO_WHATSAPP_TO = 'whatsapp:+10000000001'
+    settings.OUTBOX_RETRY_BASE_SECONDS = 0
+    gmail_client.load_gmail_discovery.cache_clear()
+    gmail_client.service_cache.clear()
+
+
+def seed(Session) -> GmailAccount:
+    with Session() as db:
+        user = User(email='bench@example.com', hashed_password='x')
+        db.add(user)
+        db.flush()
+        db.add(GmailAccount(user_id=user.id, gmail_email=user.email, access_token='fake-token'))
+        db.commit()
+
+
+def run(messages: int, concurrency: int, latency: float, twilio_failures: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp, \
+            FakeGmail(latency=latency) as fake_gmail, \
+            FakeTwilio(latency=latency, fail_first=twilio_failures) as fake_twilio:
+        configure(fake_gmail, fake_twilio)
+        engine = create_engine(f'sqlite:///{os.path.join(tmp, "outbox.db")}', connect_args={'check_same_thread': False})
+        Base.metadata.create_all(engine)
+        Session = sessionmaker(bind=engine, autoflush=False)
+        seed(Session)
+        raw_messages = [synthetic_message(i) for i in range(messages)]
+
+        with Session() as db, mock.patch.object(email_processor, 'fetch_latest_messages', return_value=raw_messages):
+            account = db.query(GmailAccount).one()
+            started = time.perf_counter()
+            result = email_processor.process_latest_emails(db, account, batch_size=messages)
+            trigger_s = time.perf_counter() - started
+
+        worker = OutboxWorker(session_factory=Session, concurrency=concurrency)
+        started = time.perf_counter()
+        worker.drain()
+        drain_s = time.perf_counter() - started
+        worker.stop()
+
+        with Session() as db:
+            statuses = dict(db.execute(select(OutboxJob.status, func.count()).group_by(OutboxJob.status)).all())
+            notified = db.scalar(select(func.count()).where(ProcessedEmail.whatsapp_notified.is_(True)))
+        assert notified == result['relevant'] == fake_twilio.calls['accepted'] == len(fake_gmail.sent), statuses
+        print(
+            f'messages={messages} relevant={result["relevant"]} concurrency={concurrency} '
+            f'trigger_s={trigger_s:.3f} drain_s={drain_s:.3f} jobs={statuses} '
+            f'gmail_sends={len(fake_gmail.sent)} twilio_calls={fake_twilio.calls["http"]} '
+            f'twilio_failures={fake_twilio.calls["failed"]}'
+        )
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Trigger latency and outbox drain time against fake Gmail/Twilio.')
+    parser.add_argument('--messages', type=int, default=50)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8])
+    parser.add_argument('--latency', type=float, default=0.1, help='simulated Gmail/Twilio latency in seconds')
+    parser.add_argument('--twilio-failures', type=int, default=3, help='fail the first N Twilio calls')
+    args = parser.parse_args()
+    for concurrency in args.concurrency:
+        run(args.messages, concurrency, args.latency, args.twilio_failures)
@@ -0,0 +1,272 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any
+
+HEADLINE = (
+    ('results.throughput_per_s', True),
+    ('results.latency_ms.p50', False),
+    ('results.latency_ms.p99', False),
+    ('results.api_calls.gmail.http', False),
+    ('results.db_queries.per_message', False),
+)
+
+
+def git_revision() -> dict[str, Any]:
+    def git(*args: str) -> str:
+        return subprocess.run(['git', *args], capture_output=True, text=True, check=True).stdout.strip()
+
+    try:
+        return {'commit': git('rev-parse', '--short', 'HEAD'), 'dirty': bool(git('status', '--porcelain', '-uno'))}
+    except (OSError, subprocess.CalledProcessError):
+        return {'commit': None, 'dirty': None}
+
+
+def load_mailbox(path: str | None, messages: int) -> list[dict[str, Any]]:
+    from benchmarks.fake_gmail import synthetic_message
+
+    if not path:
+        return [synthetic_message(i) for i in range(messages)]
+    with open(path) as handle:
+        mailbox = [json.loads(line) for line in handle if line.strip()]
+    return mailbox[:messages] if messages else mailbox
+
+
+def percentile(values: list[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(q * len(ordered)) - 1))]
+
+
+def replay(fake, mailbox: list[dict[str, Any]], rate: float, arrivals: dict[str, float]) -> None:
+    started = time.perf_counter()
+    for index, message in enumerate(mailbox):
+        delay = started + index / rate - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        arrivals[message['id']] = time.perf_counter()
+        fake.deliver(message)
+
+
+def reset_database() -> None:
+    from backend.app.database import Base, engine
+
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+
+
+def run(args: argparse.Namespace) -> dict[str, Any]:
+    from sqlalchemy import func, select
+
+    from backend.app import metrics
+    from backend.app.config import settings
+    from backend.app.database import SessionLocal, engine
+    from backend.app.models import GmailAccount, OutboxJob
+    from backend.app.services import email_processor
+    from backend.app.services.outbox import OutboxWorker
+    from benchmarks.bench_outbox import configure, seed
+    from benchmarks.fake_gmail import FakeGmail
+    from benchmarks.fake_twilio import FakeTwilio
+
+    mailbox = load_mailbox(args.mailbox, args.messages)
+    if args.save_mailbox:
+        with open(args.save_mailbox, 'w') as handle:
+            handle.writelines(json.dumps(message) + '\n' for message in mailbox)
+
+    reset_database()
+    seed(SessionLocal)
+    with SessionLocal() as db:
+        db.query(GmailAccount).update({GmailAccount.history_id: '0'})
+        db.commit()
+
+    arrivals: dict[str, float] = {}
+    committed: dict[str, float] = {}
+    pending: list[str] = []
+    profile = metrics.Profile()
+    runs = relevant = 0
+
+    def on_progress(event: str, items: list[dict[str, Any]]) -> None:
+        if event == 'classified':
+            pending.extend(item['gmail_message_id'] for item in items)
+
+    with FakeGmail(latency=args.latency, quota_per_second=args.quota) as fake_gmail, \
+            FakeTwilio(latency=args.latency) as fake_twilio:
+        configure(fake_gmail, fake_twilio)
+        if args.quota:
+            settings.GMAIL_USER_QUOTA_UNITS_PER_SECOND = args.quota * args.headroom
+        if args.twilio_rate:
+            settings.TWILIO_MESSAGES_PER_SECOND = args.twilio_rate
+        settings.OUTBOX_POLL_INTERVAL_SECONDS = args.poll
+        worker = OutboxWorker(concurrency=args.concurrency)
+        queries_before = metrics.sample_value('db_queries_total')
+        token = metrics.current_profile.set(profile)
+
+        if args.rate:
+            feeder = threading.Thread(target=replay, args=(fake_gmail, mailbox, args.rate, arrivals), daemon=True)
+        else:
+            replay(fake_gmail, mailbox, float('inf'), arrivals)
+            feeder = None
+        started = time.perf_counter()
+        if not args.rate:
+            arrivals = dict.fromkeys(arrivals, started)
+        worker.start()
+        if feeder is not None:
+            feeder.start()
+
+        deadline = started + args.timeout
+        while len(committed) < len(mailbox) and time.perf_counter() < deadline:
+            with SessionLocal() as db:
+                account = db.query(GmailAccount).one()
+                result = email_processor.process_latest_emails(
+                    db,
+                    account,
+                    batch_size=args.batch_size,
+                    incremental=True,
+                    progress=on_progress,
+                )
+            now = time.perf_counter()
+            committed.update(dict.fromkeys(pending, now))
+            pending.clear()
+            runs += 1
+            relevant += result['relevant']
+            if not result['processed'] and len(committed) < len(mailbox):
+                time.sleep(args.poll)
+        ingest_seconds = time.perf_counter() - started
+
+        while time.perf_counter() < deadline:
+            with SessionLocal() as db:
+                outstanding = db.scalar(select(func.count()).where(OutboxJob.status == 'pending'))
+            if not outstanding and not worker.in_flight:
+                break
+            time.sleep(args.poll)
+        wall_seconds = time.perf_counter() - started
+        worker.stop()
+        metrics.current_profile.reset(token)
+
+        with SessionLocal() as db:
+            jobs = dict(db.execute(select(OutboxJob.status, func.count()).group_by(OutboxJob.status)).all())
+        total_queries = metrics.sample_value('db_queries_total') - queries_before
+        gmail_calls, twilio_calls = dict(fake_gmail.calls), dict(fake_twilio.calls)
+
+    latencies = [(committed[m] - arrivals[m]) * 1000 for m in committed if m in arrivals]
+    return {
+        'benchmark': 'pipeline',
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'git': git_revision(),
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'database': engine.dialect.name,
+        },
+        'params': {
+            'mailbox': args.mailbox or 'synthetic',
+            'messages': len(mailbox),
+            'rate': args.rate,
+            'batch_size': args.batch_size,
+            'latency': args.latency,
+            'quota': args.quota,
+            'concurrency': args.concurrency,
+            'twilio_rate': settings.TWILIO_MESSAGES_PER_SECOND,
+        },
+        'results': {
+            'processed': len(committed),
+            'relevant': relevant,
+            'runs': runs,
+            'ingest_seconds': round(ingest_seconds, 4),
+            'wall_seconds': round(wall_seconds, 4),
+            'throughput_per_s': round(len(committed) / ingest_seconds, 2) if ingest_seconds else 0.0,
+            'latency_ms': {
+                name: round(percentile(latencies, q), 2)
+                for name, q in (('p50', 0.5), ('p90', 0.9), ('p99', 0.99), ('max', 1.0))
+            },
+            'api_calls': {'gmail': gmail_calls, 'twilio': twilio_calls},
+            'db_queries': {
+                'pipeline': profile.counts.get('db_queries', 0),
+                'total': int(total_queries),
+                'per_message': round(profile.counts.get('db_queries', 0) / max(len(committed), 1), 3),
+            },
+            'outbox_jobs': jobs,
+            'stages_ms': {name: round(seconds * 1000, 1) for name, (_, seconds) in sorted(profile.stages.items())},
+        },
+    }
+
+
+def flatten(data: dict[str, Any], prefix: str = '') -> dict[str, float]:
+    flat: dict[str, float] = {}
+    for key, value in data.items():
+        name = f'{prefix}{key}'
+        if isinstance(value, dict):
+            flat.update(flatten(value, f'{name}.'))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = value
+    return flat
+
+
+def compare(baseline_path: str, candidate_path: str, tolerance: float) -> int:
+    with open(baseline_path) as handle:
+        baseline = json.load(handle)
+    with open(candidate_path) as handle:
+        candidate = json.load(handle)
+    if baseline['params'] != candidate['params']:
+        print(f'warning: params differ\n  {baseline["params"]}\n  {candidate["params"]}')
+    old, new = flatten(baseline['results'], 'results.'), flatten(candidate['results'], 'results.')
+    print(f'{baseline["git"]["commit"]} -> {candidate["git"]["commit"]}')
+    print(f'{"metric":<48} {"baseline":>12} {"candidate":>12} {"change":>8}')
+    for name in sorted(old.keys() & new.keys()):
+        change = f'{new[name] / old[name] - 1:+.1%}' if old[name] else ''
+        print(f'{name:<48} {old[name]:>12g} {new[name]:>12g} {change:>8}')
+
+    regressions = []
+    for name, higher_is_better in HEADLINE:
+        if not old.get(name) or name not in new:
+            continue
+        change = new[name] / old[name] - 1
+        if (-change if higher_is_better else change) > tolerance:
+            regressions.append(f'{name} {change:+.1%}')
+    if regressions:
+        print(f'regressions beyond {tolerance:.0%}: {", ".join(regressions)}')
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Replay a mailbox through the incremental pipeline and outbox against fake Gmail/Twilio.'
+    )
+    parser.add_argument('--messages', type=int, default=2000, help='synthetic messages, or a cap on --mailbox')
+    parser.add_argument('--mailbox', help='JSON lines of recorded Gmail message resources to replay')
+    parser.add_argument('--save-mailbox', help='write the replayed mailbox as JSON lines')
+    parser.add_argument('--rate', type=float, default=0, help='arrivals per second; 0 delivers everything up front')
+    parser.add_argument('--batch-size', type=int, default=100, help='messages per incremental run')
+    parser.add_argument('--latency', type=float, default=0.02, help='simulated Gmail/Twilio latency in seconds')
+    parser.add_argument('--quota', type=float, default=0, help='fake Gmail quota units per second; 0 is unlimited')
+    parser.add_argument('--headroom', type=float, default=0.9, help='client quota as a fraction of --quota')
+    parser.add_argument('--twilio-rate', type=float, help='client Twilio messages per second; defaults to settings')
+    parser.add_argument('--concurrency', type=int, default=8, help='outbox workers')
+    parser.add_argument('--poll', type=float, default=0.05, help='pipeline and outbox idle poll interval')
+    parser.add_argument('--timeout', type=float, default=600)
+    parser.add_argument('--database-url', help='SQLAlchemy URL; the schema is dropped and recreated')
+    parser.add_argument('--output', help='write the JSON report here instead of stdout')
+    parser.add_argument('--compare', nargs=2, metavar=('BASELINE', 'CANDIDATE'), help='diff two JSON reports')
+    parser.add_argument('--tolerance', type=float, default=0.1, help='allowed headline regression for --compare')
+    args = parser.parse_args()
+    if args.compare:
+        sys.exit(compare(*args.compare, args.tolerance))
+
+    os.environ.update(
+        DATABASE_URL=args.database_url or f'sqlite:///{os.path.join(tempfile.mkdtemp(), "app.db")}',
+        OUTBOX_WORKER_IN_PROCESS='false',
+    )
+    report = json.dumps(run(args), indent=2)
+    if args.output:
+        with open(args.output, 'w') as handle:
+            handle.write(report + '\n')
+    print(report)
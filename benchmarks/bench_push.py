@@ -0,0 +1,73 @@
+import argparse
+import os
+import tempfile
+import time
+
+
+def run(bursts: int, per_burst: int, new_per_burst: int) -> None:
+    from fastapi.testclient import TestClient
+    from sqlalchemy import func, select
+
+    from backend.app.config import settings
+    from backend.app.database import SessionLocal
+    from backend.app.main import app
+    from backend.app.migrate import create_schema
+    from backend.app.models import GmailAccount, ProcessedEmail, User
+    from backend.app.services import gmail_client
+    from backend.app.services.gmail_watch import renew_expiring_watches
+    from backend.app.services.scheduler import polling_scheduler
+    from benchmarks.fake_gmail import FakeGmail
+    from benchmarks.fake_pubsub import publish_burst
+
+    create_schema()
+    with FakeGmail(message_count=5, email_address='mailbox@example.com') as fake, TestClient(app) as client:
+        settings.GMAIL_API_ROOT_URL = fake.url
+        settings.GMAIL_USER_QUOTA_UNITS_PER_SECOND = settings.GMAIL_PROJECT_QUOTA_UNITS_PER_SECOND = 10 ** 9
+        gmail_client.load_gmail_discovery.cache_clear()
+        with SessionLocal() as db:
+            user = User(email='push@example.com', hashed_password='x')
+            db.add(user)
+            db.flush()
+            db.add(GmailAccount(user_id=user.id, gmail_email=user.email, access_token='fake-token'))
+            db.commit()
+            renewed = renew_expiring_watches(db)
+
+        post = lambda body: client.post('/push/gmail', params={'token': settings.GMAIL_PUSH_TOKEN}, json=body)
+        latencies = []
+        for _ in range(bursts):
+            before = len(fake.messages)
+            fake.add_messages(new_per_burst)
+            started = time.perf_counter()
+            publish_burst(post, fake.email_address, before, per_burst)
+            while True:
+                with SessionLocal() as db:
+                    done = db.scalar(select(func.count()).select_from(ProcessedEmail))
+                if done >= len(fake.messages) - 5:
+                    break
+                time.sleep(0.05)
+            latencies.append(time.perf_counter() - started)
+
+        metrics = polling_scheduler.metrics()['accounts'][0]
+        print(
+            f'watches_renewed={renewed} notifications={metrics["push_notifications"]} polls={metrics["polls"]} '
+            f'history_calls={fake.calls["history.list"]} processed={done} '
+            f'notification_to_processed_s(avg)={sum(latencies) / len(latencies):.2f}'
+        )
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Coalescing of Gmail push notification bursts into incremental syncs.')
+    parser.add_argument('--bursts', type=int, default=3)
+    parser.add_argument('--per-burst', type=int, default=25, help='notifications posted per burst')
+    parser.add_argument('--new-per-burst', type=int, default=4, help='new inbox messages per burst')
+    args = parser.parse_args()
+    tmp = tempfile.mkdtemp()
+    os.environ.update(
+        DATABASE_URL=f'sqlite:///{os.path.join(tmp, "push.db")}',
+        GMAIL_PUSH_ENABLED='true',
+        GMAIL_PUSH_TOKEN='local-token',
+        GMAIL_PUSH_COALESCE_SECONDS='0.5',
+        GMAIL_PUSH_TOPIC='projects/local/topics/gmail',
+        OUTBOX_WORKER_IN_PROCESS='false',
+    )
+    run(args.bursts, args.per_burst, args.new_per_burst)
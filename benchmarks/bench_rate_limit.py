@@ -0,0 +1,214 @@
+import argparse
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+from types import SimpleNamespace
+
+UNLIMITED = 10 ** 9
+
+
+def fake_account(account_id: int = 1) -> SimpleNamespace:
+    return SimpleNamespace(
+        id=account_id,
+        access_token='fake-token',
+        refresh_token=None,
+        token_expiry=None,
+        token_uri=None,
+        client_id=None,
+        client_secret=None,
+        scopes=None,
+    )
+
+
+def gmail_workload(fake, workers: int, sends: int) -> tuple[float, int, int]:
+    from backend.app.services import gmail_client
+
+    ids = [m['id'] for m in fake.messages]
+    share = -(-len(ids) // workers)
+    fetched, errors = [], []
+
+    def worker(index: int) -> None:
+        try:
+            service = fake.service()
+            mine = ids[index * share:(index + 1) * share]
+            for start in range(0, len(mine), gmail_client.GMAIL_BATCH_SIZE):
+                chunk = mine[start:start + gmail_client.GMAIL_BATCH_SIZE]
+                fetched.append(len(gmail_client.fetch_messages_batched(service, chunk, account_id=1)))
+            for i in range(sends):
+                gmail_client.send_email(fake_account(), 'sales@example.com', f'Lead {index}-{i}', 'hello')
+        except Exception as exc:
+            errors.append(exc)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(workers)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - started, sum(fetched), len(errors)
+
+
+def run_gmail(messages: int, quota: float, headroom: float, workers: int, sends: int) -> None:
+    from backend.app.config import settings
+    from backend.app.services import gmail_client
+    from benchmarks.fake_gmail import FakeGmail
+
+    print(f'gmail: messages={messages} workers={workers} sends/worker={sends} server_quota={quota:.0f} units/s')
+    print(f'{"limiter":>8} {"wall_s":>7} {"fetched":>8} {"sent":>5} {"429s":>5} {"errors":>7} {"units/s":>8}')
+    settings.GMAIL_PROJECT_QUOTA_UNITS_PER_SECOND = UNLIMITED
+    throttled = {}
+    for label, client_quota in (('off', UNLIMITED), ('on', quota * headroom)):
+        with FakeGmail(message_count=messages, quota_per_second=quota) as fake:
+            settings.GMAIL_API_ROOT_URL = fake.url
+            settings.GMAIL_USER_QUOTA_UNITS_PER_SECOND = client_quota
+            gmail_client.load_gmail_discovery.cache_clear()
+            gmail_client.service_cache.clear()
+            elapsed, fetched, errors = gmail_workload(fake, workers, sends)
+            units = fetched * 5 + len(fake.sent) * 100
+            throttled[label] = fake.calls['throttled']
+            print(
+                f'{label:>8} {elapsed:>7.2f} {fetched:>8} {len(fake.sent):>5} {fake.calls["throttled"]:>5} '
+                f'{errors:>7} {units / elapsed:>8.0f}'
+            )
+            if label == 'on':
+                assert errors == 0 and fetched == messages and len(fake.sent) == workers * sends
+    assert throttled['off'] > 0, 'the fake server never throttled; raise --messages or lower --quota'
+    assert throttled['on'] <= throttled['off'] // 10, throttled
+
+
+def take_tokens(store_kind: str, database_url: str, count: int, rate: float) -> float:
+    from sqlalchemy import create_engine
+
+    from backend.app.services.rate_limit import DatabaseBucketStore, MemoryBucketStore, RateLimiter
+
+    bind = create_engine(database_url)
+    store = DatabaseBucketStore(bind) if store_kind == 'database' else MemoryBucketStore()
+    limiter = RateLimiter(store, max_wait=600)
+    started = time.time()
+    for _ in range(count):
+        limiter.acquire('Gmail', 'gmail:project', 1, rate)
+    bind.dispose()
+    return time.time() - started
+
+
+def run_shared(processes: int, count: int, rate: float) -> None:
+    from sqlalchemy import create_engine
+
+    from backend.app.database import Base
+
+    database_url = f'sqlite:///{os.path.join(tempfile.mkdtemp(), "buckets.db")}'
+    Base.metadata.create_all(create_engine(database_url))
+    total = processes * count
+    print(f'shared bucket: processes={processes} tokens/process={count} rate={rate:.0f}/s burst={rate:.0f}')
+    print(f'{"store":>9} {"wall_s":>7} {"combined/s":>11}')
+    observed = {}
+    context = multiprocessing.get_context('spawn')
+    for store_kind in ('memory', 'database'):
+        with context.Pool(processes) as pool:
+            elapsed = max(pool.starmap(take_tokens, [(store_kind, database_url, count, rate)] * processes))
+        observed[store_kind] = (total - rate) / elapsed
+        print(f'{store_kind:>9} {elapsed:>7.2f} {observed[store_kind]:>11.1f}')
+    combined = observed['database']
+    assert combined <= rate * 1.15, f'workers together exceeded the shared rate: {combined:.1f}/s'
+
+
+def run_twilio(sends: int, jobs: int) -> None:
+    from sqlalchemy import create_engine, select
+    from sqlalchemy.orm import sessionmaker
+
+    from backend.app.config import settings
+    from backend.app.database import Base
+    from backend.app.models import OutboxJob, User
+    from backend.app.services import whatsapp
+    from backend.app.services.outbox import OutboxWorker, enqueue_jobs, whatsapp_notify_job
+    from backend.app.services.rate_limit import CircuitBreaker, CircuitOpenError, RateLimitedError
+    from benchmarks.fake_twilio import FakeTwilio
+
+    settings.TWILIO_ACCOUNT_SID = 'ACfake'
+    settings.TWILIO_AUTH_TOKEN = 'fake'
+    settings.TWILIO_WHATSAPP_FROM = 'whatsapp:+10000000000'
+    settings.TWILIO_WHATSAPP_TO = 'whatsapp:+10000000001'
+    settings.RATE_LIMIT_BACKOFF_BASE_SECONDS = 0.1
+    settings.RATE_LIMIT_MAX_RETRIES = 3
+    reset_seconds = 3.0
+
+    print(f'twilio outage: sends={sends} retries/send={settings.RATE_LIMIT_MAX_RETRIES}')
+    print(f'{"breaker":>8} {"wall_s":>7} {"http_calls":>11} {"fast_fails":>11}')
+    for label, threshold in (('off', UNLIMITED), ('on', settings.TWILIO_CIRCUIT_FAILURE_THRESHOLD)):
+        whatsapp.twilio_breaker = CircuitBreaker('Twilio', threshold, reset_seconds)
+        with FakeTwilio() as fake:
+            settings.TWILIO_API_BASE_URL = fake.url
+            fake.outage = True
+            fast_fails = http_calls = 0
+            started = time.perf_counter()
+            for i in range(sends):
+                try:
+                    whatsapp.send_whatsapp_summary(f'lead {i}')
+                except RateLimitedError as exc:
+                    fast_fails += isinstance(exc, CircuitOpenError) and fake.calls['http'] == http_calls
+                http_calls = fake.calls['http']
+            elapsed = time.perf_counter() - started
+            print(f'{label:>8} {elapsed:>7.2f} {fake.calls["http"]:>11} {fast_fails:>11}')
+    assert whatsapp.twilio_breaker.is_open and fast_fails >= sends - 2, fast_fails
+
+    engine = create_engine(
+        f'sqlite:///{os.path.join(tempfile.mkdtemp(), "outbox.db")}',
+        connect_args={'check_same_thread': False},
+    )
+    Base.metadata.create_all(engine)
+    Session = sessionmaker(bind=engine, autoflush=False)
+    with Session() as db:
+        user = User(email='breaker@example.com', hashed_password='x')
+        db.add(user)
+        db.flush()
+        leads = [whatsapp_notify_job(user.id, f'm{i:08d}', f'lead{i}@example.com', f'lead {i}') for i in range(jobs)]
+        enqueue_jobs(db, leads)
+        db.commit()
+
+    worker = OutboxWorker(session_factory=Session, concurrency=1)
+    with FakeTwilio() as fake:
+        settings.TWILIO_API_BASE_URL = fake.url
+        worker.drain()
+        with Session() as db:
+            parked = db.execute(select(OutboxJob.status, OutboxJob.attempts)).all()
+        assert fake.calls['http'] == 0 and all(row == ('pending', 0) for row in parked), parked
+
+        time.sleep(reset_seconds)
+        deadline = time.monotonic() + 10
+        while fake.calls['accepted'] < jobs and time.monotonic() < deadline:
+            worker.drain()
+            time.sleep(0.05)
+        with Session() as db:
+            finished = db.execute(select(OutboxJob.status, OutboxJob.attempts)).all()
+    worker.stop()
+    engine.dispose()
+    assert all(row == ('done', 1) for row in finished), finished
+    print(
+        f'outbox during outage: {jobs} jobs parked without Twilio calls or spent attempts; '
+        f'after recovery: {fake.calls["accepted"]} delivered with {fake.calls["http"]} calls'
+    )
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Outbound rate limiting against throttling fake Gmail/Twilio servers and a shared bucket store.'
+    )
+    parser.add_argument('--messages', type=int, default=1000)
+    parser.add_argument('--quota', type=float, default=1000, help='fake Gmail per-user quota units per second')
+    parser.add_argument('--headroom', type=float, default=0.9, help='client quota as a fraction of the server quota')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--sends', type=int, default=5, help='Gmail sends per worker (100 units each)')
+    parser.add_argument('--processes', type=int, default=2)
+    parser.add_argument('--tokens', type=int, default=100, help='tokens each process takes from the shared bucket')
+    parser.add_argument('--rate', type=float, default=50)
+    parser.add_argument('--twilio-sends', type=int, default=10)
+    args = parser.parse_args()
+    os.environ.update(
+        DATABASE_URL=f'sqlite:///{os.path.join(tempfile.mkdtemp(), "app.db")}',
+        OUTBOX_WORKER_IN_PROCESS='false',
+    )
+    run_gmail(args.messages, args.quota, args.headroom, args.workers, args.sends)
+    run_shared(args.processes, args.tokens, args.rate)
+    run_twilio(args.twilio_sends, jobs=10)
@@ -0,0 +1,79 @@
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from backend.app.database import Base
+from backend.app.models import GmailAccount, User
+from backend.app.services.scheduler import PollingScheduler
+
+
+def seed_accounts(Session, count: int) -> None:
+    with Session() as db:
+        users = [User(email=f'user{i}@example.com', hashed_password='x') for i in range(count)]
+        db.add_all(users)
+        db.flush()
+        db.add_all(GmailAccount(user_id=u.id, gmail_email=u.email, access_token='t') for u in users)
+        db.commit()
+
+
+def make_process(latency: float, busy_ids: set[int], huge_id: int):
+    def process(db, account, batch_size: int, incremental: bool) -> dict[str, int]:
+        time.sleep(latency)
+        if account.id == huge_id:
+            processed = batch_size
+        elif account.id in busy_ids:
+            processed = random.randint(1, 5)
+        else:
+            processed = 0
+        return {'processed': processed, 'relevant': 0, 'ignored': processed}
+
+    return process
+
+
+def run(accounts: int, seconds: float, concurrency: int, latency: float) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f'sqlite:///{os.path.join(tmp, "scheduler.db")}', connect_args={'check_same_thread': False})
+        Base.metadata.create_all(engine)
+        Session = sessionmaker(bind=engine)
+        seed_accounts(Session, accounts)
+        busy_ids = set(random.Random(1).sample(range(2, accounts + 1), accounts // 10))
+        scheduler = PollingScheduler(
+            session_factory=Session,
+            process=make_process(latency, busy_ids, huge_id=1),
+            max_concurrency=concurrency,
+            batch_size=25,
+            min_interval=0.5,
+            max_interval=5.0,
+        )
+        scheduler.start()
+        time.sleep(seconds)
+        scheduler.stop()
+
+    metrics = scheduler.metrics()['accounts']
+    polls = {m['account_id']: m['polls'] for m in metrics}
+    lags = [m['lag_seconds'] for m in metrics if m['lag_seconds'] is not None]
+    never = sum(1 for m in metrics if m['lag_seconds'] is None)
+    idle = [polls[i] for i in polls if i != 1 and i not in busy_ids]
+    busy = [polls[i] for i in busy_ids]
+    print(
+        f'accounts={accounts} concurrency={concurrency} seconds={seconds} total_polls={sum(polls.values())}\n'
+        f'huge_inbox_polls={polls[1]} busy_median_polls={statistics.median(busy)} '
+        f'idle_median_polls={statistics.median(idle)} never_polled={never}\n'
+        f'lag_p50_s={statistics.median(lags):.2f} lag_max_s={max(lags):.2f}'
+    )
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Fairness and lag of the polling scheduler with one huge inbox.')
+    parser.add_argument('--accounts', type=int, default=300)
+    parser.add_argument('--seconds', type=float, default=10.0)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--latency', type=float, default=0.02, help='simulated time per poll')
+    args = parser.parse_args()
+    run(args.accounts, args.seconds, args.concurrency, args.latency)
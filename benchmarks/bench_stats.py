@@ -0,0 +1,191 @@
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+from unittest import mock
+
+SEED_CHUNK = 20000
+SENDERS = 5000
+
+
+def seed_rows(user_id: int, start: int, stop: int, now: datetime) -> None:
+    from backend.app.database import SessionLocal
+    from backend.app.models import ProcessedEmail
+    from backend.app.services.stats import update_rollups
+
+    rng = random.Random(start)
+    with SessionLocal() as db:
+        for offset in range(start, stop, SEED_CHUNK):
+            rows = []
+            for index in range(offset, min(offset + SEED_CHUNK, stop)):
+                roll = rng.random()
+                rows.append(
+                    {
+                        'user_id': user_id,
+                        'gmail_message_id': f'seed{index:010d}',
+                        'subject': f'Message {index}',
+                        'sender': f'sender{int(rng.paretovariate(1.2)) % SENDERS}@example.com',
+                        'snippet': 'seeded',
+                        'is_relevant': roll < 0.4,
+                        'is_spam': roll > 0.9,
+                        'forwarded_to': None,
+                        'whatsapp_notified': False,
+                        'created_at': now - timedelta(seconds=rng.randrange(365 * 86400)),
+                    }
+                )
+            db.execute(ProcessedEmail.__table__.insert(), rows)
+            update_rollups(db, rows)
+            db.commit()
+
+
+def naive_stats(user_id: int, days: int, top: int, today) -> dict:
+    from sqlalchemy import case, func, select
+
+    from backend.app.database import SessionLocal
+    from backend.app.models import ProcessedEmail
+
+    relevant = func.sum(case((ProcessedEmail.is_relevant.is_(True), 1), else_=0))
+    spam = func.sum(case((ProcessedEmail.is_spam.is_(True), 1), else_=0))
+    day = func.date(ProcessedEmail.created_at)
+    mine = ProcessedEmail.user_id == user_id
+    with SessionLocal() as db:
+        processed, leads, spammed = db.execute(select(func.count(), relevant, spam).where(mine)).one()
+        since = datetime.combine(today - timedelta(days=days - 1), datetime.min.time())
+        daily = db.execute(
+            select(day, func.count(), relevant, spam).where(mine, ProcessedEmail.created_at >= since).group_by(day)
+        ).all()
+        senders = db.execute(
+            select(ProcessedEmail.sender, func.count().label('n'))
+            .where(mine)
+            .group_by(ProcessedEmail.sender)
+            .order_by(func.count().desc())
+            .limit(top)
+        ).all()
+    return {
+        'processed': processed,
+        'relevant': leads or 0,
+        'spam': spammed or 0,
+        'daily': {str(d): (n, r, s) for d, n, r, s in daily},
+        'top_counts': [n for _, n in senders],
+    }
+
+
+async def time_endpoint(token: str, days: int, top: int, requests: int) -> tuple[float, float, dict, str]:
+    import httpx
+
+    from backend.app.main import app
+
+    headers = {'Authorization': f'Bearer {token}'}
+    params = {'days': days, 'top': top}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url='http://bench') as client:
+        full, conditional = [], []
+        for _ in range(requests):
+            started = time.perf_counter()
+            response = await client.get('/automation/stats', params=params, headers=headers)
+            full.append(time.perf_counter() - started)
+            assert response.status_code == 200, response.text
+            etag = response.headers['etag']
+            started = time.perf_counter()
+            conditional_headers = {**headers, 'If-None-Match': etag}
+            revalidated = await client.get('/automation/stats', params=params, headers=conditional_headers)
+            conditional.append(time.perf_counter() - started)
+            assert revalidated.status_code == 304 and not revalidated.content, revalidated.status_code
+    return statistics.median(full), statistics.median(conditional), response.json(), etag
+
+
+def check_matches(served: dict, naive: dict) -> None:
+    totals = ('processed', 'relevant', 'spam')
+    assert [served[name] for name in totals] == [naive[name] for name in totals], (served, naive)
+    for row in served['daily']:
+        assert (row['processed'], row['relevant'], row['spam']) == naive['daily'].get(row['day'], (0, 0, 0)), row
+    assert [s['processed'] for s in served['top_senders']] == naive['top_counts']
+
+
+def check_incremental(token: str, etag: str, days: int, top: int, messages: int) -> None:
+    import httpx
+
+    from backend.app.database import SessionLocal
+    from backend.app.main import app
+    from backend.app.models import GmailAccount
+    from backend.app.services import email_processor
+    from benchmarks.fake_gmail import synthetic_message
+
+    async def fetch(extra_headers: dict) -> httpx.Response:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url='http://bench') as client:
+            return await client.get(
+                '/automation/stats',
+                params={'days': days, 'top': top},
+                headers={'Authorization': f'Bearer {token}', **extra_headers},
+            )
+
+    before = asyncio.run(fetch({})).json()
+    batch = [synthetic_message(10 ** 9 + i) for i in range(messages)]
+    with SessionLocal() as db, mock.patch.object(email_processor, 'fetch_latest_messages', return_value=batch):
+        account = db.query(GmailAccount).one()
+        result = email_processor.process_latest_emails(db, account, batch_size=messages)
+    after = asyncio.run(fetch({'If-None-Match': etag}))
+    assert after.status_code == 200, 'ETag did not change after new emails were processed'
+    stats = after.json()
+    assert stats['processed'] == before['processed'] + result['processed']
+    assert stats['relevant'] == before['relevant'] + result['relevant']
+    assert stats['spam'] == before['spam'] + messages // 5
+    print(
+        f'incremental: +{result["processed"]} processed, +{result["relevant"]} leads, '
+        f'+{stats["spam"] - before["spam"]} spam reflected in the rollups; old ETag now gets 200'
+    )
+
+
+def run(sizes: list[int], days: int, top: int, requests: int, max_growth: float) -> None:
+    from backend.app import metrics
+    from benchmarks.load_test import seed
+
+    token = seed(1)[0]
+    now = datetime.utcnow()
+    seeded = 0
+    timings = {}
+    print(f'{"rows":>10} {"seed_s":>7} {"naive_ms":>9} {"stats_ms":>9} {"304_ms":>7} {"q_200+304":>10}')
+    for size in sizes:
+        started = time.perf_counter()
+        seed_rows(1, seeded, size, now)
+        seed_s = time.perf_counter() - started
+        seeded = size
+
+        started = time.perf_counter()
+        naive = naive_stats(1, days, top, now.date())
+        naive_ms = (time.perf_counter() - started) * 1000
+        queries = metrics.sample_value('db_queries_total')
+        full, conditional, served, etag = asyncio.run(time_endpoint(token, days, top, requests))
+        queries = (metrics.sample_value('db_queries_total') - queries) / requests
+        check_matches(served, naive)
+        timings[size] = full
+        print(
+            f'{size:>10} {seed_s:>7.1f} {naive_ms:>9.1f} {full * 1000:>9.2f} {conditional * 1000:>7.2f} '
+            f'{queries:>10.1f}'
+        )
+    smallest, largest = timings[sizes[0]], timings[sizes[-1]]
+    assert largest <= smallest * max_growth, f'stats slowed from {smallest * 1000:.1f}ms to {largest * 1000:.1f}ms'
+    check_incremental(token, etag, days, top, messages=50)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='/automation/stats served from rollups vs aggregating processed_emails, as history grows.'
+    )
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 1000000, 10000000])
+    parser.add_argument('--days', type=int, default=30)
+    parser.add_argument('--top', type=int, default=10)
+    parser.add_argument('--requests', type=int, default=50)
+    parser.add_argument('--max-growth', type=float, default=2.0, help='allowed stats latency ratio, largest/smallest')
+    parser.add_argument('--database-url')
+    args = parser.parse_args()
+    os.environ.update(
+        DATABASE_URL=args.database_url or f'sqlite:///{os.path.join(tempfile.mkdtemp(), "stats.db")}',
+        OUTBOX_WORKER_IN_PROCESS='false',
+    )
+    run(args.sizes, args.days, args.top, args.requests, args.max_growth)
@@ -0,0 +1,77 @@
+import argparse
+import os
+import tempfile
+import time
+from unittest import mock
+
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import sessionmaker
+
+from backend.app.config import settings
+from backend.app.database import Base
+from backend.app.models import GmailAccount, OutboxJob, ProcessedEmail
+from backend.app.services import email_processor
+from backend.app.services.outbox import WHATSAPP_NOTIFY, OutboxWorker
+from benchmarks.bench_outbox import configure, seed
+from benchmarks.fake_gmail import FakeGmail, synthetic_message
+from benchmarks.fake_twilio import FakeTwilio
+
+
+def run(messages: int, concurrency: int, window: float, max_items: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp, FakeGmail() as fake_gmail, FakeTwilio() as fake_twilio:
+        configure(fake_gmail, fake_twilio)
+        settings.WHATSAPP_DIGEST_WINDOW_SECONDS = window
+        settings.WHATSAPP_DIGEST_MAX_ITEMS = max_items
+        engine = create_engine(f'sqlite:///{os.path.join(tmp, "digest.db")}', connect_args={'check_same_thread': False})
+        Base.metadata.create_all(engine)
+        Session = sessionmaker(bind=engine, autoflush=False)
+        seed(Session)
+        raw_messages = [synthetic_message(i) for i in range(messages)]
+
+        with Session() as db, mock.patch.object(email_processor, 'fetch_latest_messages', return_value=raw_messages):
+            account = db.query(GmailAccount).one()
+            result = email_processor.process_latest_emails(db, account, batch_size=messages)
+
+        worker = OutboxWorker(session_factory=Session, concurrency=concurrency)
+        started = time.perf_counter()
+        deadline = time.monotonic() + window + 10
+        while True:
+            worker.drain()
+            with Session() as db:
+                outstanding = db.scalar(
+                    select(func.count()).where(OutboxJob.kind == WHATSAPP_NOTIFY, OutboxJob.status != 'done')
+                )
+            if not outstanding or time.monotonic() > deadline:
+                break
+            time.sleep(0.05)
+        elapsed = time.perf_counter() - started
+        worker.stop()
+
+        with Session() as db:
+            notified = db.scalar(select(func.count()).where(ProcessedEmail.whatsapp_notified.is_(True)))
+            relevant = db.scalar(select(func.count()).where(ProcessedEmail.is_relevant.is_(True)))
+        engine.dispose()
+
+    mode = f'digest {window:g}s/{max_items}' if window else 'per lead'
+    print(
+        f'{mode:>16} {result["relevant"]:>6} {fake_twilio.calls["http"]:>7} {fake_twilio.calls["connections"]:>7} '
+        f'{notified:>9} {max(len(m["Body"]) for m in fake_twilio.messages):>9} {elapsed:>7.2f}'
+    )
+    assert outstanding == 0 and notified == relevant == result['relevant'], (outstanding, notified, relevant)
+    assert fake_twilio.calls['connections'] <= concurrency, 'Twilio connections were not reused'
+    if window:
+        assert fake_twilio.calls['http'] == -(-result['relevant'] // max_items), fake_twilio.calls['http']
+        assert all(len(m['Body']) <= 1600 for m in fake_twilio.messages)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Twilio requests per burst of leads: one message per lead vs digests.')
+    parser.add_argument('--messages', type=int, default=125, help='synthetic emails, 40%% of them leads')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--window', type=float, default=1.0)
+    parser.add_argument('--max-items', type=int, nargs='+', default=[20, 100])
+    args = parser.parse_args()
+    print(f'{"mode":>16} {"leads":>6} {"twilio":>7} {"conns":>7} {"notified":>9} {"max_body":>9} {"wall_s":>7}')
+    run(args.messages, args.concurrency, 0, 1)
+    for max_items in args.max_items:
+        run(args.messages, args.concurrency, args.window, max_items)
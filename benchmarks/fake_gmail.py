@@ -0,0 +1,262 @@
+import json
+import threading
+import time
+from collections import Counter
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any
+from urllib.parse import parse_qs, urlsplit
+
+MESSAGES_PATH = '/gmail/v1/users/me/messages'
+HISTORY_PATH = '/gmail/v1/users/me/history'
+PROFILE_PATH = '/gmail/v1/users/me/profile'
+WATCH_PATH = '/gmail/v1/users/me/watch'
+QUOTA_UNITS = {'messages.list': 5, 'messages.get': 5, 'messages.send': 100, 'history.list': 2, 'getProfile': 1, 'watch': 100}
+
+
+def route_name(method: str, path: str) -> str | None:
+    if path == MESSAGES_PATH:
+        return 'messages.list' if method == 'GET' else None
+    if path == MESSAGES_PATH + '/send':
+        return 'messages.send'
+    if path.startswith(MESSAGES_PATH + '/'):
+        return 'messages.get'
+    return {HISTORY_PATH: 'history.list', PROFILE_PATH: 'getProfile', WATCH_PATH: 'watch'}.get(path)
+
+
+def synthetic_message(index: int) -> dict[str, Any]:
+    topics = ['pricing for 40 seats', 'weekly newsletter', 'bitcoin lottery winner', 'demo next week', 'team lunch']
+    return {
+        'id': f'm{index:08d}',
+        'threadId': f't{index:08d}',
+        'historyId': str(index + 1),
+        'snippet': f'Hello, following up about {topics[index % len(topics)]}.',
+        'payload': {
+            'headers': [
+                {'name': 'Subject', 'value': f'Re: {topics[index % len(topics)]} #{index}'},
+                {'name': 'From', 'value': f'sender{index % 97}@example.com'},
+                {'name': 'To', 'value': 'me@example.com'},
+                {'name': 'Date', 'value': 'Mon, 1 Jan 2024 00:00:00 +0000'},
+            ],
+        },
+    }
+
+
+class FakeGmail:
+    def __init__(
+        self,
+        message_count: int = 0,
+        latency: float = 0.0,
+        quota_per_second: float = 0.0,
+        email_address: str = 'me@example.com',
+    ):
+        self.email_address = email_address
+        self.messages = [synthetic_message(i) for i in range(message_count)]
+        self.latency = latency
+        self.quota_per_second = quota_per_second
+        self.retry_after = 1
+        self._quota = quota_per_second
+        self._quota_at = time.monotonic()
+        self.calls: Counter[str] = Counter()
+        self.fail_next: dict[str, int] = {}
+        self.history_floor = 0
+        self._by_id: dict[str, dict[str, Any]] = {}
+        self.sent: list[dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), self._handler_class())
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}/'
+
+    @property
+    def round_trips(self) -> int:
+        return self.calls['http']
+
+    def __enter__(self) -> 'FakeGmail':
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def reset(self) -> None:
+        self.calls.clear()
+
+    def service(self):
+        import httplib2
+        from googleapiclient.discovery import build_from_document
+        from googleapiclient.discovery_cache import get_static_doc
+
+        document = dict(json.loads(get_static_doc('gmail', 'v1')), rootUrl=self.url)
+        return build_from_document(document, http=httplib2.Http())
+
+    def over_quota(self, name: str | None) -> bool:
+        if not self.quota_per_second or name is None:
+            return False
+        with self._lock:
+            now = time.monotonic()
+            self._quota = min(self.quota_per_second, self._quota + (now - self._quota_at) * self.quota_per_second)
+            self._quota_at = now
+            if self._quota >= QUOTA_UNITS[name]:
+                self._quota -= QUOTA_UNITS[name]
+                return False
+            self.calls['throttled'] += 1
+            return True
+
+    def find_message(self, message_id: str) -> dict[str, Any] | None:
+        index = int(message_id[1:]) if message_id[1:].isdigit() else -1
+        if 0 <= index < len(self.messages) and self.messages[index]['id'] == message_id:
+            return self.messages[index]
+        with self._lock:
+            if len(self._by_id) != len(self.messages):
+                self._by_id = {m['id']: m for m in self.messages}
+            return self._by_id.get(message_id)
+
+    def get_message(self, message_id: str, query: dict[str, list[str]]) -> tuple[int, dict[str, Any]]:
+        message = self.find_message(message_id)
+        if message is None:
+            return 404, {'error': {'code': 404, 'message': 'Requested entity was not found.'}}
+        with self._lock:
+            if self.fail_next.get(message_id):
+                self.fail_next[message_id] -= 1
+                return 503, {'error': {'code': 503, 'message': 'Backend Error'}}
+        if query.get('format', ['full'])[0] == 'metadata':
+            wanted = {name.lower() for name in query.get('metadataHeaders', [])}
+            headers = [h for h in message['payload']['headers'] if not wanted or h['name'].lower() in wanted]
+            message = dict(message, payload={'headers': headers})
+        return 200, message
+
+    def add_messages(self, count: int) -> None:
+        start = len(self.messages)
+        self.messages.extend(synthetic_message(i) for i in range(start, start + count))
+
+    def deliver(self, message: dict[str, Any]) -> None:
+        with self._lock:
+            self.messages.append(dict(message, historyId=str(len(self.messages) + 1)))
+
+    def list_history(self, query: dict[str, list[str]]) -> tuple[int, dict[str, Any]]:
+        start_history_id = int(query['startHistoryId'][0])
+        if start_history_id < self.history_floor:
+            return 404, {'error': {'code': 404, 'message': 'Requested entity was not found.'}}
+        max_results = int(query.get('maxResults', ['100'])[0])
+        offset = int(query.get('pageToken', ['0'])[0])
+        messages = self.messages[:]
+        newer = [m for m in messages if int(m['historyId']) > start_history_id]
+        page = newer[offset:offset + max_results]
+        body: dict[str, Any] = {
+            'history': [
+                {'id': m['historyId'], 'messagesAdded': [{'message': {'id': m['id'], 'labelIds': ['INBOX']}}]}
+                for m in page
+            ],
+            'historyId': str(len(messages)),
+        }
+        if offset + max_results < len(newer):
+            body['nextPageToken'] = str(offset + max_results)
+        return 200, body
+
+    def list_messages(self, query: dict[str, list[str]]) -> tuple[int, dict[str, Any]]:
+        max_results = int(query.get('maxResults', ['100'])[0])
+        start = int(query.get('pageToken', ['0'])[0])
+        newest_first = self.messages[::-1]
+        page = newest_first[start:start + max_results]
+        body: dict[str, Any] = {'messages': [{'id': m['id'], 'threadId': m['threadId']} for m in page]}
+        if start + max_results < len(newest_first):
+            body['nextPageToken'] = str(start + max_results)
+        body['resultSizeEstimate'] = len(page)
+        return 200, body
+
+    def route(self, method: str, path: str, query: dict[str, list[str]], body: bytes) -> tuple[int, dict[str, Any]]:
+        if self.over_quota(route_name(method, path)):
+            error = {'code': 429, 'message': 'User-rate limit exceeded.', 'errors': [{'reason': 'rateLimitExceeded'}]}
+            return 429, {'error': error}
+        if method == 'GET' and path == MESSAGES_PATH:
+            self.calls['messages.list'] += 1
+            return self.list_messages(query)
+        if method == 'POST' and path == MESSAGES_PATH + '/send':
+            self.calls['messages.send'] += 1
+            with self._lock:
+                self.sent.append(json.loads(body or b'{}'))
+                sent_id = f's{len(self.sent):08d}'
+            return 200, {'id': sent_id, 'threadId': sent_id, 'labelIds': ['SENT']}
+        if method == 'POST' and path == WATCH_PATH:
+            self.calls['watch'] += 1
+            expiration = int((time.time() + 7 * 24 * 3600) * 1000)
+            return 200, {'historyId': str(len(self.messages)), 'expiration': str(expiration)}
+        if method == 'GET' and path == HISTORY_PATH:
+            self.calls['history.list'] += 1
+            return self.list_history(query)
+        if method == 'GET' and path == PROFILE_PATH:
+            self.calls['getProfile'] += 1
+            return 200, {'emailAddress': self.email_address, 'historyId': str(len(self.messages))}
+        if method == 'GET' and path.startswith(MESSAGES_PATH + '/'):
+            self.calls['messages.get'] += 1
+            return self.get_message(path.rsplit('/', 1)[1], query)
+        return 404, {'error': {'code': 404, 'message': f'No route for {method} {path}'}}
+
+    def handle_batch(self, content_type: str, body: bytes) -> tuple[str, bytes]:
+        self.calls['batch'] += 1
+        envelope = BytesParser(policy=HTTP).parsebytes(f'Content-Type: {content_type}\r\n\r\n'.encode() + body)
+        boundary = 'batch_fake_gmail_boundary'
+        parts: list[bytes] = []
+        for part in envelope.iter_parts():
+            inner = part.get_payload(decode=True) or part.get_payload().encode()
+            request_line, _, rest = inner.partition(b'\r\n' if b'\r\n' in inner else b'\n')
+            method, target = request_line.decode().split(' ')[:2]
+            _, _, inner_body = rest.partition(b'\r\n\r\n' if b'\r\n\r\n' in rest else b'\n\n')
+            split = urlsplit(target)
+            status, payload = self.route(method, split.path, parse_qs(split.query), inner_body)
+            content_id = part['Content-ID'].strip('<>')
+            retry_after = f'Retry-After: {self.retry_after}\r\n' if status == 429 else ''
+            parts.append(
+                (
+                    f'--{boundary}\r\nContent-Type: application/http\r\nContent-ID: <response-{content_id}>\r\n\r\n'
+                    f'HTTP/1.1 {status} X\r\nContent-Type: application/json; charset=UTF-8\r\n{retry_after}\r\n'
+                    f'{json.dumps(payload)}\r\n'
+                ).encode()
+            )
+        parts.append(f'--{boundary}--\r\n'.encode())
+        return f'multipart/mixed; boundary={boundary}', b''.join(parts)
+
+    def _handler_class(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args) -> None:
+                pass
+
+            def _dispatch(self, method: str) -> None:
+                fake.calls['http'] += 1
+                if fake.latency:
+                    time.sleep(fake.latency)
+                length = int(self.headers.get('Content-Length') or 0)
+                body = self.rfile.read(length) if length else b''
+                split = urlsplit(self.path)
+                if method == 'POST' and split.path == '/batch':
+                    content_type, data = fake.handle_batch(self.headers['Content-Type'], body)
+                    status = 200
+                else:
+                    status, payload = fake.route(method, split.path, parse_qs(split.query), body)
+                    content_type, data = 'application/json; charset=UTF-8', json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(data)))
+                if status == 429:
+                    self.send_header('Retry-After', str(fake.retry_after))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self) -> None:
+                self._dispatch('GET')
+
+            def do_POST(self) -> None:
+                self._dispatch('POST')
+
+        return Handler
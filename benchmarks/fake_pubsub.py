@@ -0,0 +1,44 @@
+import argparse
+import base64
+import json
+import time
+
+import requests
+
+
+def push_payload(email_address: str, history_id: int, message_id: str = '1') -> dict:
+    data = json.dumps({'emailAddress': email_address, 'historyId': history_id}).encode()
+    return {
+        'message': {'data': base64.b64encode(data).decode(), 'messageId': message_id},
+        'subscription': 'projects/local/subscriptions/gmail-push',
+    }
+
+
+def publish_burst(post, email_address: str, start_history_id: int, count: int, interval: float = 0.0) -> list[int]:
+    statuses = []
+    for i in range(count):
+        response = post(push_payload(email_address, start_history_id + i + 1, message_id=str(i)))
+        statuses.append(response.status_code)
+        if interval:
+            time.sleep(interval)
+    return statuses
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Post Pub/Sub-style Gmail push notifications to a running API.')
+    parser.add_argument('--url', default='http://localhost:8000/push/gmail')
+    parser.add_argument('--token', default='')
+    parser.add_argument('--email', required=True)
+    parser.add_argument('--history-id', type=int, default=1)
+    parser.add_argument('--count', type=int, default=20)
+    parser.add_argument('--interval', type=float, default=0.01)
+    args = parser.parse_args()
+    with requests.Session() as session:
+        statuses = publish_burst(
+            lambda body: session.post(args.url, params={'token': args.token}, json=body, timeout=10),
+            args.email,
+            args.history_id,
+            args.count,
+            args.interval,
+        )
+    print({status: statuses.count(status) for status in set(statuses)})
@@ -0,0 +1,99 @@
+import json
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+
+class FakeTwilio:
+    def __init__(
+        self,
+        latency: float = 0.0,
+        fail_first: int = 0,
+        fail_status: int = 500,
+        messages_per_second: float = 0.0,
+    ):
+        self.latency = latency
+        self.fail_first = fail_first
+        self.fail_status = fail_status
+        self.outage = False
+        self.messages_per_second = messages_per_second
+        self.retry_after = 1
+        self._tokens = messages_per_second
+        self._tokens_at = time.monotonic()
+        self.calls: Counter[str] = Counter()
+        self.messages: list[dict[str, str]] = []
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), self._handler_class())
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def __enter__(self) -> 'FakeTwilio':
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def handle(self, body: bytes) -> tuple[int, dict]:
+        with self._lock:
+            self.calls['http'] += 1
+            if self.outage:
+                self.calls['failed'] += 1
+                return 503, {'code': 503, 'message': 'Service Unavailable'}
+            if self.messages_per_second:
+                now = time.monotonic()
+                self._tokens = min(
+                    self.messages_per_second,
+                    self._tokens + (now - self._tokens_at) * self.messages_per_second,
+                )
+                self._tokens_at = now
+                if self._tokens < 1:
+                    self.calls['throttled'] += 1
+                    return 429, {'code': 20429, 'message': 'Too Many Requests'}
+                self._tokens -= 1
+            if self.fail_first > 0:
+                self.fail_first -= 1
+                self.calls['failed'] += 1
+                return self.fail_status, {'code': self.fail_status, 'message': 'Injected failure'}
+            form = {key: values[0] for key, values in parse_qs(body.decode()).items()}
+            self.messages.append(form)
+            self.calls['accepted'] += 1
+            return 201, {'sid': f'SM{len(self.messages):032d}', 'status': 'queued', 'to': form.get('To')}
+
+    def _handler_class(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args) -> None:
+                pass
+
+            def setup(self) -> None:
+                super().setup()
+                with fake._lock:
+                    fake.calls['connections'] += 1
+
+            def do_POST(self) -> None:
+                if fake.latency:
+                    time.sleep(fake.latency)
+                body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+                status, payload = fake.handle(body)
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                if status == 429:
+                    self.send_header('Retry-After', str(fake.retry_after))
+                self.end_headers()
+                self.wfile.write(data)
+
+        return Handler
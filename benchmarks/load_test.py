@@ -0,0 +1,159 @@
+import argparse
+import asyncio
+import os
+import socket
+import statistics
+import tempfile
+import threading
+import time
+
+
+def build_sync_app():
+    from fastapi import Depends, FastAPI, HTTPException
+    from fastapi.security import OAuth2PasswordBearer
+    from jose import jwt
+    from sqlalchemy.orm import Session
+
+    from backend.app.auth import create_access_token, verify_password
+    from backend.app.config import settings
+    from backend.app.database import get_db
+    from backend.app.models import GmailAccount, User
+    from backend.app.schemas import LoginRequest, TokenResponse, TriggerResponse
+    from backend.app.services.email_processor import lock_mailbox, process_latest_emails
+
+    app = FastAPI()
+    oauth2_scheme = OAuth2PasswordBearer(tokenUrl='/auth/login')
+
+    def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> User:
+        email = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])['sub']
+        return db.query(User).filter(User.email == email).first()
+
+    @app.post('/auth/login', response_model=TokenResponse)
+    def login(payload: LoginRequest, db: Session = Depends(get_db)):
+        user = db.query(User).filter(User.email == payload.email).first()
+        if not user or not verify_password(payload.password, user.hashed_password):
+            raise HTTPException(status_code=401, detail='Invalid email or password')
+        return TokenResponse(access_token=create_access_token(user.email))
+
+    @app.post('/automation/trigger', response_model=TriggerResponse)
+    def trigger(current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+        account = db.query(GmailAccount).filter(GmailAccount.user_id == current_user.id).first()
+        if not lock_mailbox(db, account.id):
+            raise HTTPException(status_code=409, detail='Mailbox is already being processed')
+        return TriggerResponse(**process_latest_emails(db=db, account=account, batch_size=10))
+
+    return app
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def serve(app):
+    import uvicorn
+
+    server = uvicorn.Server(uvicorn.Config(app, host='127.0.0.1', port=free_port(), log_level='warning'))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    return server, thread, f'http://127.0.0.1:{server.config.port}'
+
+
+def seed(users: int) -> list[str]:
+    from backend.app.auth import create_access_token, hash_password
+    from backend.app.database import Base, SessionLocal, engine
+    from backend.app.models import GmailAccount, User
+
+    Base.metadata.create_all(bind=engine)
+    hashed = hash_password('load-test-password')
+    with SessionLocal() as db:
+        rows = [User(email=f'load{i}@example.com', hashed_password=hashed) for i in range(users)]
+        db.add_all(rows)
+        db.flush()
+        db.add_all(GmailAccount(user_id=u.id, gmail_email=u.email, access_token='fake-token') for u in rows)
+        db.commit()
+        return [create_access_token(u.email) for u in rows]
+
+
+async def drive(base_url: str, requests: int, concurrency: int, make_request) -> tuple[float, list[float], int]:
+    import httpx
+
+    slots = asyncio.Semaphore(concurrency)
+    latencies: list[float] = []
+    errors = 0
+
+    async def one(client, index: int) -> None:
+        nonlocal errors
+        async with slots:
+            started = time.perf_counter()
+            try:
+                response = await make_request(client, index)
+                failed = response.status_code != 200
+            except httpx.HTTPError:
+                failed = True
+            latencies.append(time.perf_counter() - started)
+            errors += failed
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=120) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(one(client, i) for i in range(requests)))
+        return time.perf_counter() - started, latencies, errors
+
+
+def report(endpoint: str, mode: str, elapsed: float, latencies: list[float], errors: int) -> None:
+    latencies.sort()
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    print(
+        f'{endpoint:>20} {mode:>6} {len(latencies) / elapsed:>9.1f} {statistics.median(latencies) * 1000:>9.1f} '
+        f'{p99 * 1000:>9.1f} {errors:>6}'
+    )
+
+
+def run(users: int, requests: int, concurrency: int, latency: float) -> None:
+    from backend.app.config import settings
+    from backend.app.main import app
+    from backend.app.services import gmail_client
+    from benchmarks.fake_gmail import FakeGmail
+
+    with FakeGmail(message_count=50, latency=latency) as fake:
+        settings.GMAIL_API_ROOT_URL = fake.url
+        settings.GMAIL_USER_QUOTA_UNITS_PER_SECOND = settings.GMAIL_PROJECT_QUOTA_UNITS_PER_SECOND = 10 ** 9
+        gmail_client.load_gmail_discovery.cache_clear()
+        tokens = seed(users)
+
+        async def login(client, index: int):
+            payload = {'email': f'load{index % users}@example.com', 'password': 'load-test-password'}
+            return await client.post('/auth/login', json=payload)
+
+        async def trigger(client, index: int):
+            headers = {'Authorization': f'Bearer {tokens[index % users]}'}
+            return await client.post('/automation/trigger', headers=headers)
+
+        print(f'{"endpoint":>20} {"mode":>6} {"req/s":>9} {"p50_ms":>9} {"p99_ms":>9} {"errors":>6}')
+        for mode, target in (('sync', build_sync_app()), ('async', app)):
+            server, thread, base_url = serve(target)
+            try:
+                for endpoint, make_request in (('/auth/login', login), ('/automation/trigger', trigger)):
+                    report(endpoint, mode, *asyncio.run(drive(base_url, requests, concurrency, make_request)))
+            finally:
+                server.should_exit = True
+                thread.join()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Concurrent load on /auth/login and /automation/trigger: sync vs async.')
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=64)
+    parser.add_argument('--latency', type=float, default=0.05, help='simulated Gmail round-trip time')
+    args = parser.parse_args()
+    tmp = tempfile.mkdtemp()
+    os.environ.update(
+        DATABASE_URL=f'sqlite:///{os.path.join(tmp, "load.db")}',
+        OUTBOX_WORKER_IN_PROCESS='false',
+    )
+    run(args.users, args.requests, args.concurrency, args.latency)
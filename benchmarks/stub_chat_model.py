@@ -0,0 +1,46 @@
+import json
+import threading
+import time
+from typing import Any
+
+from langchain_core.messages import AIMessage
+from langchain_core.runnables import RunnableLambda
+
+
+class RecordingChatModel:
+    def __init__(self, latency: float = 0.0, relevant_marker: str = 'interested'):
+        self.latency = latency
+        self.relevant_marker = relevant_marker
+        self.calls: list[list[tuple[str, str]]] = []
+        self.max_in_flight = 0
+        self._in_flight = 0
+        self._lock = threading.Lock()
+
+    @property
+    def emails_seen(self) -> int:
+        return sum(len(json.loads(messages[-1][1])) for messages in self.calls)
+
+    def invoke(self, messages: list[tuple[str, str]], config: dict | None = None) -> AIMessage:
+        with self._lock:
+            self.calls.append(messages)
+            self._in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self._in_flight)
+        try:
+            if self.latency:
+                time.sleep(self.latency)
+            emails: list[dict[str, Any]] = json.loads(messages[-1][1])
+            verdicts = [
+                {
+                    'index': email['index'],
+                    'relevant': self.relevant_marker in f"{email['subject']} {email['snippet']}".lower(),
+                    'reason': 'stub verdict',
+                }
+                for email in emails
+            ]
+            return AIMessage(content=json.dumps(verdicts))
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+    def batch(self, inputs: list, config: dict | None = None, return_exceptions: bool = False) -> list:
+        return RunnableLambda(self.invoke).batch(inputs, config=config, return_exceptions=return_exceptions)
@@ -1,13 +1,30 @@
+import json
+
 import requests
 import streamlit as st
+from requests.adapters import HTTPAdapter
 
 API_BASE = st.sidebar.text_input('FastAPI URL', 'http://localhost:8000')
 
+
+@st.cache_resource
+def http_session() -> requests.Session:
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=8)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+http = http_session()
+
 st.title('Lead Mail Agent Dashboard')
 st.caption('Login, connect Gmail, trigger LangGraph classification, and reply via AI draft.')
 
 if 'token' not in st.session_state:
     st.session_state.token = ''
+if 'responses' not in st.session_state:
+    st.session_state.responses = {}
 
 with st.expander('1) Authentication', expanded=True):
     auth_mode = st.radio('Choose', ['Login', 'Register'], horizontal=True)
@@ -16,7 +33,7 @@ with st.expander('1) Authentication', expanded=True):
 
     if st.button('Submit Auth'):
         endpoint = '/auth/login' if auth_mode == 'Login' else '/auth/register'
-        resp = requests.post(f'{API_BASE}{endpoint}', json={'email': email, 'password': password}, timeout=30)
+        resp = http.post(f'{API_BASE}{endpoint}', json={'email': email, 'password': password}, timeout=30)
         if resp.ok:
             st.session_state.token = resp.json()['access_token']
             st.success('Authenticated')
@@ -25,9 +42,22 @@ with st.expander('1) Authentication', expanded=True):
 
 headers = {'Authorization': f"Bearer {st.session_state.token}"} if st.session_state.token else {}
 
+
+def get_cached(path: str, params: dict) -> dict:
+    key = (API_BASE, path, tuple(sorted(params.items())), st.session_state.token)
+    cached = st.session_state.responses.get(key)
+    request_headers = dict(headers, **({'If-None-Match': cached[0]} if cached else {}))
+    resp = http.get(f'{API_BASE}{path}', params=params, headers=request_headers, timeout=30)
+    if resp.status_code == 304 and cached:
+        return cached[1]
+    resp.raise_for_status()
+    if resp.headers.get('ETag'):
+        st.session_state.responses[key] = (resp.headers['ETag'], resp.json())
+    return resp.json()
+
 with st.expander('2) Connect Gmail', expanded=True):
     if st.button('Get Gmail Connect URL'):
-        resp = requests.get(f'{API_BASE}/auth/gmail/connect', headers=headers, timeout=30)
+        resp = http.get(f'{API_BASE}/auth/gmail/connect', headers=headers, timeout=30)
         if resp.ok:
             url = resp.json()['authorization_url']
             st.write('Open this URL and approve Gmail permissions:')
@@ -35,14 +65,67 @@ with st.expander('2) Connect Gmail', expanded=True):
         else:
             st.error(resp.text)
 
+
+def stream_events(job_id: str):
+    with http.get(
+        f'{API_BASE}/automation/trigger/jobs/{job_id}/events',
+        headers=headers,
+        stream=True,
+        timeout=(10, 120),
+    ) as resp:
+        resp.raise_for_status()
+        kind = 'message'
+        for line in resp.iter_lines(decode_unicode=True):
+            if line.startswith('event:'):
+                kind = line.split(':', 1)[1].strip()
+            elif line.startswith('data:'):
+                yield kind, json.loads(line.split(':', 1)[1])
+
+
 with st.expander('3) Trigger Email Agent', expanded=True):
-    batch_size = st.slider('Emails to fetch', min_value=1, max_value=10, value=5)
+    batch_size = st.slider('Emails to fetch', min_value=1, max_value=100, value=10)
     if st.button('Run Agent'):
-        resp = requests.post(f'{API_BASE}/automation/trigger?batch_size={batch_size}', headers=headers, timeout=60)
-        if resp.ok:
-            st.json(resp.json())
-        else:
+        resp = http.post(
+            f'{API_BASE}/automation/trigger/jobs',
+            params={'batch_size': batch_size},
+            headers=headers,
+            timeout=30,
+        )
+        if not resp.ok:
             st.error(resp.text)
+        else:
+            job_id = resp.json()['job_id']
+            status = st.status(f'Job {job_id} queued', expanded=True)
+            progress = st.progress(0.0)
+            table = st.empty()
+            messages: dict[str, dict] = {}
+            try:
+                for kind, data in stream_events(job_id):
+                    row = messages.setdefault(data.get('gmail_message_id', ''), {})
+                    if kind == 'fetched':
+                        row.update(subject=data['subject'], sender=data['sender'], stage='fetched')
+                        if data['already_processed']:
+                            row['stage'] = 'already processed'
+                    elif kind == 'classified':
+                        row.update(relevant=data['is_relevant'], reason=data['reason'], stage='classified')
+                    elif kind == 'queued':
+                        row['stage'] = 'queued'
+                    elif kind in ('forwarded', 'notified'):
+                        row[kind] = data['status']
+                    elif kind == 'summary':
+                        status.update(label=f'Processed {data["processed"]} emails, sending notifications')
+                        st.json(data)
+                    elif kind == 'error':
+                        status.update(label=data['error'], state='error')
+                    elif kind in ('end', 'timeout'):
+                        status.update(label=f'Job {data["status"]}', state='complete')
+
+                    rows = [dict(gmail_message_id=k, **v) for k, v in messages.items() if k]
+                    done = sum(1 for r in rows if r.get('stage') != 'fetched')
+                    progress.progress(done / len(rows) if rows else 0.0)
+                    table.dataframe(rows, use_container_width=True)
+            except requests.RequestException as exc:
+                status.update(label=f'Lost the progress stream: {exc}', state='error')
 
 with st.expander('4) WhatsApp-approved Reply', expanded=True):
     to_email = st.text_input('Reply To')
@@ -50,7 +133,7 @@ with st.expander('4) WhatsApp-approved Reply', expanded=True):
     intent = st.text_input('Intent for reply', 'Professional follow-up with meeting request')
 
     if st.button('Generate + Send Reply'):
-        resp = requests.post(
+        resp = http.post(
             f'{API_BASE}/automation/reply',
             headers=headers,
             params={'to_email': to_email, 'original_context': context, 'intent': intent},
@@ -60,3 +143,20 @@ with st.expander('4) WhatsApp-approved Reply', expanded=True):
             st.success('Reply sent through Gmail API')
         else:
             st.error(resp.text)
+
+with st.expander('5) Dashboard', expanded=True):
+    days = st.slider('Days', min_value=7, max_value=90, value=30)
+    if not st.session_state.token:
+        st.info('Log in to see your lead stats.')
+    else:
+        try:
+            stats = get_cached('/automation/stats', {'days': days, 'top': 10})
+        except requests.RequestException as exc:
+            st.error(str(exc))
+        else:
+            processed_col, leads_col, spam_col = st.columns(3)
+            processed_col.metric('Processed', stats['processed'])
+            leads_col.metric('Leads', stats['relevant'], f"{stats['lead_rate']:.0%}", delta_color='off')
+            spam_col.metric('Spam rate', f"{stats['spam_rate']:.1%}")
+            st.line_chart(stats['daily'], x='day', y=['processed', 'relevant', 'spam'])
+            st.dataframe(stats['top_senders'], use_container_width=True)
@@ -0,0 +1,48 @@
+import os
+import tempfile
+
+import pytest
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+
+os.environ['DATABASE_URL'] = os.environ.get('TEST_DATABASE_URL') or (
+    f'sqlite:///{os.path.join(tempfile.mkdtemp(), "test.db")}'
+)
+os.environ.update(
+    ASYNC_DATABASE_URL='',
+    OUTBOX_WORKER_IN_PROCESS='false',
+    WARM_UP_ON_STARTUP='false',
+    SCHEDULER_ENABLED='false',
+    GMAIL_PUSH_ENABLED='false',
+    TWILIO_ACCOUNT_SID='',
+)
+
+from backend.app.database import ASYNC_DATABASE_URL, AsyncSessionLocal, Base, SessionLocal, engine  # noqa: E402
+from backend.app.models import GmailAccount, User  # noqa: E402
+
+AsyncSessionLocal.configure(bind=create_async_engine(ASYNC_DATABASE_URL, poolclass=NullPool))
+
+
+@pytest.fixture(autouse=True)
+def schema():
+    Base.metadata.create_all(engine)
+    yield
+    Base.metadata.drop_all(engine)
+
+
+@pytest.fixture
+def db():
+    with SessionLocal() as session:
+        yield session
+
+
+@pytest.fixture
+def account(db) -> GmailAccount:
+    user = User(email='owner@example.com', hashed_password='x')
+    db.add(user)
+    db.flush()
+    gmail_account = GmailAccount(user_id=user.id, gmail_email='owner.mailbox@gmail.com', access_token='token')
+    db.add(gmail_account)
+    db.commit()
+    return gmail_account
+
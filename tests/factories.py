@@ -0,0 +1,9 @@
+from typing import Any
+
+
+def gmail_message(message_id: str, subject: str, sender: str = 'lead@example.com') -> dict[str, Any]:
+    return {
+        'id': message_id,
+        'snippet': subject,
+        'payload': {'headers': [{'name': 'Subject', 'value': subject}, {'name': 'From', 'value': sender}]},
+    }
@@ -0,0 +1,74 @@
+import pytest
+from sqlalchemy import func, select
+
+from backend.app.models import MailboxBackfill, OutboxJob, ProcessedEmail
+from backend.app.services import backfill
+from backend.app.services.backfill import backfill_mailbox
+from tests.factories import gmail_message
+
+
+@pytest.fixture
+def mailbox(monkeypatch) -> dict:
+    calls = {'lists': [], 'gets': 0}
+    message_ids = [f'm{index}' for index in range(10)]
+
+    def iter_pages(account, page_size, page_token=None, query=None):
+        offset = int(page_token or 0)
+        while True:
+            calls['lists'].append(offset)
+            next_offset = offset + page_size
+            next_token = str(next_offset) if next_offset < len(message_ids) else None
+            yield message_ids[offset:next_offset], next_token
+            if next_token is None:
+                return
+            offset = next_offset
+
+    def fetch(account, ids):
+        calls['gets'] += len(ids)
+        return [gmail_message(message_id, f'Pricing request {message_id}') for message_id in ids]
+
+    monkeypatch.setattr(backfill, 'iter_message_id_pages', iter_pages)
+    monkeypatch.setattr(backfill, 'fetch_messages', fetch)
+    return calls
+
+
+def count(db, model) -> int:
+    return db.scalar(select(func.count()).select_from(model))
+
+
+def test_backfill_stores_leads_without_enqueueing_forwards_by_default(db, account, mailbox):
+    totals = backfill_mailbox(db, account, chunk_size=4)
+
+    assert totals['relevant'] == 10
+    assert count(db, ProcessedEmail) == 10
+    assert count(db, OutboxJob) == 0
+
+
+def test_backfill_with_notify_enqueues_forwards(db, account, mailbox):
+    backfill_mailbox(db, account, chunk_size=4, notify=True)
+
+    assert count(db, OutboxJob) >= 10
+
+
+class SimulatedCrash(Exception):
+    pass
+
+
+def test_backfill_resumes_after_a_crash_without_relisting_or_refetching(db, account, mailbox):
+    def crash_after_two_pages(kind: str, items: list[dict]) -> None:
+        if items[0]['page'] == 2:
+            raise SimulatedCrash
+
+    with pytest.raises(SimulatedCrash):
+        backfill_mailbox(db, account, chunk_size=3, progress=crash_after_two_pages)
+    checkpoint = db.get(MailboxBackfill, account.id)
+    assert (checkpoint.status, checkpoint.pages, checkpoint.processed) == ('failed', 2, 6)
+
+    totals = backfill_mailbox(db, account, chunk_size=3)
+    db.refresh(checkpoint)
+
+    assert totals['processed'] == 4
+    assert (checkpoint.status, checkpoint.pages, checkpoint.processed) == ('done', 4, 10)
+    assert mailbox['lists'] == [0, 3, 6, 9]
+    assert mailbox['gets'] == 10
+    assert count(db, ProcessedEmail) == 10
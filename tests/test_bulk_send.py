@@ -0,0 +1,113 @@
+import threading
+import time
+from datetime import datetime, timedelta
+
+import httplib2
+import pytest
+from googleapiclient.errors import HttpError
+
+from backend.app.config import settings
+from backend.app.services import gmail_client
+from backend.app.services.email_processor import send_replies
+
+
+@pytest.fixture
+def gmail(monkeypatch) -> dict:
+    calls = {'builds': 0, 'refreshes': 0, 'https': set(), 'threads': set(), 'sent': []}
+    lock = threading.Lock()
+    build = gmail_client.get_gmail_service
+
+    def counting_build(*args, **kwargs):
+        calls['builds'] += 1
+        return build(*args, **kwargs)
+
+    def fake_refresh(credentials, request) -> None:
+        time.sleep(0.05)
+        with lock:
+            calls['refreshes'] += 1
+        credentials.token = 'fresh-token'
+        credentials.expiry = datetime.utcnow() + timedelta(hours=1)
+
+    def fake_execute(request, account_id, method):
+        assert request.http.credentials.token == 'fresh-token'
+        with lock:
+            calls['https'].add((threading.get_ident(), id(request.http)))
+            calls['threads'].add(threading.get_ident())
+            calls['sent'].append(method)
+        return {'id': f'sent-{len(calls["sent"])}'}
+
+    monkeypatch.setattr(settings, 'GMAIL_SEND_CONCURRENCY', 4)
+    monkeypatch.setattr(gmail_client, 'get_gmail_service', counting_build)
+    monkeypatch.setattr('google.oauth2.credentials.Credentials.refresh', fake_refresh)
+    monkeypatch.setattr(gmail_client, 'execute_gmail', fake_execute)
+    monkeypatch.setattr(gmail_client, 'send_slots', {})
+    gmail_client.service_cache.clear()
+    yield calls
+    gmail_client.service_cache.clear()
+
+
+def test_bulk_send_shares_the_cached_client_and_refreshes_once(db, account, gmail):
+    account.refresh_token = 'refresh'
+    account.token_expiry = datetime.utcnow() - timedelta(minutes=5)
+    replies = [
+        {'to_email': f'lead{index}@example.com', 'original_context': 'Pricing?', 'intent': 'send pricing'}
+        for index in range(20)
+    ]
+
+    results = send_replies(account, replies)
+
+    assert [result['status'] for result in results] == ['sent'] * 20
+    assert [result['to_email'] for result in results] == [reply['to_email'] for reply in replies]
+    assert gmail['builds'] == 1
+    assert gmail['refreshes'] == 1
+    assert len(gmail['https']) == len(gmail['threads']) <= 4
+    assert len({http for _, http in gmail['https']}) == len(gmail['threads'])
+    assert account.access_token == 'fresh-token'
+
+
+def reply_to(index: int) -> dict:
+    return {'to_email': f'lead{index}@example.com', 'original_context': 'Pricing?', 'intent': 'send pricing'}
+
+
+def test_bulk_send_refreshes_tokens_without_a_stored_expiry(db, account, gmail):
+    account.refresh_token = 'refresh'
+    account.token_expiry = None
+
+    results = send_replies(account, [reply_to(index) for index in range(5)])
+
+    assert [result['status'] for result in results] == ['sent'] * 5
+    assert gmail['refreshes'] == 1
+
+
+def test_bulk_send_refreshes_and_retries_once_on_401(db, account, gmail, monkeypatch):
+    account.refresh_token = 'refresh'
+    account.token_expiry = datetime.utcnow() + timedelta(hours=1)
+    attempts: list[str] = []
+
+    def revoked_then_ok(request, account_id, method):
+        token = request.http.credentials.token
+        attempts.append(token)
+        if token != 'fresh-token':
+            raise HttpError(httplib2.Response({'status': 401}), b'Invalid Credentials')
+        return {'id': 'sent'}
+
+    monkeypatch.setattr(gmail_client, 'execute_gmail', revoked_then_ok)
+
+    results = send_replies(account, [reply_to(0)])
+
+    assert [result['status'] for result in results] == ['sent']
+    assert attempts == ['token', 'fresh-token']
+    assert gmail['refreshes'] == 1
+
+
+def test_bulk_send_does_not_wait_for_a_running_sync(db, account, gmail):
+    account.refresh_token = 'refresh'
+    account.token_expiry = datetime.utcnow() + timedelta(hours=1)
+    account.access_token = 'fresh-token'
+    entry = gmail_client.service_cache.checkout(account)
+
+    with entry.lock:
+        results = send_replies(account, [reply_to(index) for index in range(3)])
+
+    assert [result['status'] for result in results] == ['sent'] * 3
+    assert gmail['refreshes'] == 0
@@ -0,0 +1,73 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy import func, select
+
+from backend.app.config import settings
+from backend.app.models import OutboxJob, ProcessedEmail, ProcessedEmailKey
+from backend.app.services.email_processor import (
+    find_processed_message_ids,
+    insert_new_processed_emails,
+    process_messages,
+)
+from tests.factories import gmail_message
+
+
+def email_row(user_id: int, message_id: str) -> dict:
+    return {
+        'user_id': user_id,
+        'gmail_message_id': message_id,
+        'subject': 'Pricing',
+        'sender': 'lead@example.com',
+        'snippet': 'Pricing',
+        'is_relevant': True,
+        'forwarded_to': None,
+        'created_at': datetime.utcnow(),
+    }
+
+
+@pytest.fixture(params=[False, True], ids=['plain', 'keyed'])
+def partitioned(request, monkeypatch) -> bool:
+    monkeypatch.setattr(settings, 'PROCESSED_EMAILS_PARTITIONED', request.param)
+    return request.param
+
+
+def test_insert_claims_only_new_ids(db, account, partitioned):
+    first = insert_new_processed_emails(db, [email_row(account.user_id, m) for m in ('m1', 'm2')])
+    second = insert_new_processed_emails(db, [email_row(account.user_id, m) for m in ('m2', 'm3')])
+    db.commit()
+
+    assert first == {'m1', 'm2'}
+    assert second == {'m3'}
+    assert db.scalar(select(func.count()).select_from(ProcessedEmail)) == 3
+    assert find_processed_message_ids(db, ['m1', 'm3', 'm4']) == {'m1', 'm3'}
+    keys = db.scalar(select(func.count()).select_from(ProcessedEmailKey))
+    assert keys == (3 if partitioned else 0)
+
+
+def test_insert_chunks_past_bulk_size(db, account, monkeypatch):
+    monkeypatch.setattr('backend.app.services.email_processor.BULK_CHUNK_SIZE', 2)
+    rows = [email_row(account.user_id, f'm{i}') for i in range(5)]
+
+    assert insert_new_processed_emails(db, rows) == {f'm{i}' for i in range(5)}
+    assert find_processed_message_ids(db, [f'm{i}' for i in range(6)]) == {f'm{i}' for i in range(5)}
+
+
+def test_process_messages_skips_duplicates_within_and_across_runs(db, account):
+    batch = [
+        gmail_message('a1', 'Pricing for 40 seats'),
+        gmail_message('a1', 'Pricing for 40 seats'),
+        gmail_message('a2', 'Weekly newsletter'),
+    ]
+
+    result, jobs = process_messages(db, account, batch)
+    db.commit()
+    again, again_jobs = process_messages(db, account, batch + [gmail_message('a3', 'Demo next week')])
+    db.commit()
+
+    assert result == {'processed': 2, 'relevant': 1, 'ignored': 1}
+    assert [job['gmail_message_id'] for job in jobs] == ['a1']
+    assert again == {'processed': 1, 'relevant': 1, 'ignored': 0}
+    assert [job['gmail_message_id'] for job in again_jobs] == ['a3']
+    assert db.scalar(select(func.count()).select_from(ProcessedEmail)) == 3
+    assert db.scalars(select(OutboxJob.gmail_message_id).order_by(OutboxJob.id)).all() == ['a1', 'a3']
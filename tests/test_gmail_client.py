@@ -0,0 +1,52 @@
+import httplib2
+import pytest
+from googleapiclient.errors import HttpError
+
+from backend.app.config import settings
+from backend.app.services.gmail_client import execute_gmail
+from backend.app.services.rate_limit import SendOutcomeUnknownError
+
+
+class FakeRequest:
+    def __init__(self, *errors: Exception):
+        self.errors = list(errors)
+        self.calls = 0
+
+    def execute(self) -> dict:
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return {'id': 'sent'}
+
+
+def http_error(status: int, content: bytes = b'') -> HttpError:
+    return HttpError(httplib2.Response({'status': status}), content)
+
+
+@pytest.fixture(autouse=True)
+def no_backoff_sleep(monkeypatch):
+    monkeypatch.setattr(settings, 'RATE_LIMIT_BACKOFF_BASE_SECONDS', 0.0)
+
+
+@pytest.mark.parametrize('error', [TimeoutError('read timed out'), ConnectionResetError(), http_error(503)])
+def test_send_is_not_retried_once_it_may_have_landed(error):
+    request = FakeRequest(error)
+
+    with pytest.raises(SendOutcomeUnknownError):
+        execute_gmail(request, None, 'messages.send')
+    assert request.calls == 1
+
+
+@pytest.mark.parametrize('error', [http_error(429), http_error(403, b'{"reason": "rateLimitExceeded"}')])
+def test_rate_limited_send_is_retried(error):
+    request = FakeRequest(error)
+
+    assert execute_gmail(request, None, 'messages.send') == {'id': 'sent'}
+    assert request.calls == 2
+
+
+def test_reads_are_retried_on_timeouts():
+    request = FakeRequest(TimeoutError('read timed out'), http_error(503))
+
+    assert execute_gmail(request, None, 'getProfile') == {'id': 'sent'}
+    assert request.calls == 3
@@ -0,0 +1,140 @@
+import asyncio
+import json
+import tracemalloc
+from collections.abc import Iterator
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import insert
+
+from backend.app.auth import create_access_token, principal_cache
+from backend.app.main import app
+from backend.app.models import ProcessedEmail, User
+from backend.app.services import history
+from backend.app.services.history import decode_cursor, encode_cursor, history_query, stream_history
+
+START = datetime(2024, 6, 1, 12, 0)
+
+
+@pytest.fixture
+def client(account) -> Iterator[TestClient]:
+    principal_cache.clear()
+    client = TestClient(app)
+    client.headers['Authorization'] = f'Bearer {create_access_token("owner@example.com")}'
+    yield client
+    principal_cache.clear()
+
+
+@pytest.fixture
+def emails(db, account) -> list[str]:
+    stranger = User(email='stranger@example.com', hashed_password='x')
+    db.add(stranger)
+    db.flush()
+    rows = [
+        ProcessedEmail(
+            user_id=account.user_id,
+            gmail_message_id=f'm{index}',
+            subject=f'Subject {index}',
+            sender='buyer@example.com' if index % 2 else 'news@example.com',
+            is_relevant=bool(index % 2),
+            # pairs of emails share a timestamp so paging has to break ties on id
+            created_at=START + timedelta(minutes=index // 2),
+        )
+        for index in range(7)
+    ]
+    rows.append(
+        ProcessedEmail(user_id=stranger.id, gmail_message_id='other', sender='buyer@example.com', created_at=START)
+    )
+    db.add_all(rows)
+    db.commit()
+    return [f'm{index}' for index in reversed(range(7))]
+
+
+def walk(client: TestClient, limit: int, **params) -> list[list[str]]:
+    pages, cursor = [], None
+    while True:
+        body = client.get('/automation/history', params={**params, 'limit': limit, 'cursor': cursor}).json()
+        pages.append([item['gmail_message_id'] for item in body['items']])
+        cursor = body['next_cursor']
+        if cursor is None:
+            return pages
+
+
+def test_cursor_round_trips():
+    assert decode_cursor(encode_cursor(START, 42)) == (START, 42)
+
+
+def test_invalid_cursor_is_rejected(client):
+    response = client.get('/automation/history', params={'cursor': 'not-a-cursor'})
+
+    assert response.status_code == 400
+
+
+def test_keyset_pages_cover_only_the_callers_emails_once_newest_first(client, emails):
+    pages = walk(client, limit=2)
+
+    assert [len(page) for page in pages] == [2, 2, 2, 1]
+    assert [message_id for page in pages for message_id in page] == emails
+
+
+def test_filters_apply_across_pages(client, emails):
+    relevant = walk(client, limit=1, relevant=True)
+    by_sender = walk(client, limit=2, sender='NEWS@')
+    window = walk(client, limit=5, since=START + timedelta(minutes=1), until=START + timedelta(minutes=3))
+
+    assert [page[0] for page in relevant] == ['m5', 'm3', 'm1']
+    assert [message_id for page in by_sender for message_id in page] == ['m6', 'm4', 'm2', 'm0']
+    assert window == [['m5', 'm4', 'm3', 'm2']]
+
+
+def test_export_streams_only_the_callers_emails(client, emails):
+    response = client.get('/automation/history/export', params={'sender': 'buyer'})
+
+    exported = [json.loads(line)['gmail_message_id'] for line in response.text.splitlines()]
+    assert exported == ['m5', 'm3', 'm1']
+
+
+def seed_history(db, user_id: int, rows: int, offset: int = 0) -> None:
+    db.execute(
+        insert(ProcessedEmail),
+        [
+            {
+                'user_id': user_id,
+                'gmail_message_id': f'bulk{index}',
+                'subject': f'Re: pricing for {index % 50} seats',
+                'sender': f'sender{index % 97}@example.com',
+                'is_relevant': index % 5 == 0,
+                'whatsapp_notified': False,
+                'created_at': START + timedelta(seconds=index),
+            }
+            for index in range(offset, offset + rows)
+        ],
+    )
+    db.commit()
+
+
+def export(user_id: int) -> tuple[list[int], int]:
+    async def consume() -> list[int]:
+        return [chunk.count('\n') async for chunk in stream_history(history_query(user_id), 'ndjson')]
+
+    tracemalloc.start()
+    try:
+        chunks = asyncio.run(consume())
+        return chunks, tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def test_export_streams_in_batches_with_flat_memory(db, account, monkeypatch):
+    monkeypatch.setattr(history, 'EXPORT_BATCH_SIZE', 100)
+    seed_history(db, account.user_id, 500)
+    export(account.user_id)
+    small_chunks, small_peak = export(account.user_id)
+
+    seed_history(db, account.user_id, 3500, offset=500)
+    large_chunks, large_peak = export(account.user_id)
+
+    assert sum(small_chunks) == 500 and sum(large_chunks) == 4000
+    assert max(large_chunks) <= 100
+    assert large_peak < small_peak * 2
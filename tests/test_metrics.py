@@ -0,0 +1,57 @@
+import threading
+
+import pytest
+from fastapi.testclient import TestClient
+
+from backend.app.config import settings
+from backend.app.executors import CountingThreadPoolExecutor
+from backend.app.main import app
+
+METRICS_TOKEN = 'metrics-secret'
+
+
+@pytest.fixture
+def client() -> TestClient:
+    return TestClient(app)
+
+
+@pytest.fixture
+def metrics_token(monkeypatch) -> str:
+    monkeypatch.setattr(settings, 'METRICS_TOKEN', METRICS_TOKEN)
+    return METRICS_TOKEN
+
+
+@pytest.mark.parametrize('path', ['/metrics', '/scheduler/metrics'])
+def test_metrics_endpoints_are_disabled_without_a_token(client, path):
+    assert client.get(path).status_code == 404
+
+
+@pytest.mark.parametrize('path', ['/metrics', '/scheduler/metrics'])
+def test_metrics_endpoints_require_the_bearer_token(client, metrics_token, path):
+    assert client.get(path).status_code == 401
+    assert client.get(path, headers={'Authorization': 'Bearer guess'}).status_code == 401
+    assert client.get(path, headers={'Authorization': f'Bearer {metrics_token}'}).status_code == 200
+
+
+def test_profile_header_needs_the_metrics_token(client, metrics_token):
+    assert 'server-timing' not in client.get('/health', headers={settings.PROFILE_HEADER: '1'}).headers
+    assert 'server-timing' in client.get('/health', headers={settings.PROFILE_HEADER: metrics_token}).headers
+
+
+def test_counting_executor_reports_running_and_queued_work():
+    executor = CountingThreadPoolExecutor(1)
+    started, release = threading.Event(), threading.Event()
+
+    def blocked() -> None:
+        started.set()
+        release.wait()
+
+    futures = [executor.submit(blocked), executor.submit(lambda: None)]
+    started.wait()
+    assert (executor.running(), executor.queued()) == (1, 1)
+
+    release.set()
+    for future in futures:
+        future.result()
+    executor.shutdown()
+    assert (executor.running(), executor.queued()) == (0, 0)
@@ -0,0 +1,106 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import func, select
+
+from backend.app.config import settings
+from backend.app.models import OutboxJob
+from backend.app.services import outbox
+from backend.app.services.outbox import OutboxWorker, claim_due_jobs, enqueue_jobs, forward_email_job
+from backend.app.services.rate_limit import RateLimitedError, SendOutcomeUnknownError
+
+
+@pytest.fixture
+def sent(monkeypatch) -> list[tuple]:
+    calls: list[tuple] = []
+    monkeypatch.setattr(outbox, 'send_email', lambda account, to, subject, body: calls.append((to, subject)))
+    return calls
+
+
+@pytest.fixture
+def worker():
+    worker = OutboxWorker(concurrency=2)
+    yield worker
+    worker.stop()
+
+
+def enqueue_forward(db, account, message_id: str = 'm1') -> OutboxJob:
+    enqueue_jobs(db, [forward_email_job(account.user_id, message_id, 'sales@example.com', f'FWD {message_id}', 'b')])
+    db.commit()
+    return db.scalar(select(OutboxJob).where(OutboxJob.gmail_message_id == message_id))
+
+
+def failing_send(exc: Exception):
+    def send(account, to, subject, body):
+        raise exc
+
+    return send
+
+
+def test_enqueue_is_idempotent(db, account):
+    enqueue_forward(db, account)
+    enqueue_forward(db, account)
+
+    assert db.scalar(select(func.count()).select_from(OutboxJob)) == 1
+
+
+def test_drain_sends_and_settles_done(db, account, sent, worker):
+    job = enqueue_forward(db, account)
+
+    worker.drain()
+    db.refresh(job)
+
+    assert sent == [('sales@example.com', 'FWD m1')]
+    assert (job.status, job.attempts, job.locked_at, job.last_error) == ('done', 1, None, None)
+
+
+def test_failure_is_retried_with_backoff_then_marked_failed(db, account, worker, monkeypatch):
+    monkeypatch.setattr(outbox, 'send_email', failing_send(RuntimeError('smtp down')))
+    monkeypatch.setattr(settings, 'OUTBOX_MAX_ATTEMPTS', 2)
+    job = enqueue_forward(db, account)
+
+    worker.run_job(claim_due_jobs(db, 1)[0])
+    db.refresh(job)
+    assert (job.status, job.attempts, job.last_error) == ('pending', 1, 'smtp down')
+    assert job.next_attempt_at > datetime.utcnow()
+    assert claim_due_jobs(db, 1) == []
+
+    job.next_attempt_at = datetime.utcnow()
+    db.commit()
+    worker.run_job(claim_due_jobs(db, 1)[0])
+    db.refresh(job)
+    assert (job.status, job.attempts) == ('failed', 2)
+
+
+def test_rate_limited_job_is_rescheduled_without_spending_an_attempt(db, account, worker, monkeypatch):
+    monkeypatch.setattr(outbox, 'send_email', failing_send(RateLimitedError('Gmail', 30)))
+    job = enqueue_forward(db, account)
+
+    worker.run_job(claim_due_jobs(db, 1)[0])
+    db.refresh(job)
+
+    assert (job.status, job.attempts) == ('pending', 0)
+    assert timedelta(seconds=25) < job.next_attempt_at - datetime.utcnow() <= timedelta(seconds=30)
+
+
+def test_expired_lease_is_reclaimed(db, account):
+    job = enqueue_forward(db, account)
+    assert claim_due_jobs(db, 5) == [job.id]
+    assert claim_due_jobs(db, 5) == []
+
+    job.locked_at = datetime.utcnow() - timedelta(seconds=settings.OUTBOX_LEASE_SECONDS + 1)
+    db.commit()
+
+    assert claim_due_jobs(db, 5) == [job.id]
+    db.refresh(job)
+    assert (job.status, job.attempts) == ('in_progress', 2)
+
+
+def test_send_with_unknown_outcome_is_not_retried(db, account, worker, monkeypatch):
+    monkeypatch.setattr(outbox, 'send_email', failing_send(SendOutcomeUnknownError('timed out')))
+    job = enqueue_forward(db, account)
+
+    worker.run_job(claim_due_jobs(db, 1)[0])
+    db.refresh(job)
+
+    assert (job.status, job.attempts, job.last_error) == ('failed', 1, 'timed out')
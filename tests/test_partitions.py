@@ -0,0 +1,130 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import select, text
+
+from backend.app.database import engine
+from backend.app.models import ProcessedEmailKey
+from backend.app.services import partitions
+from backend.app.services.history import history_query
+from backend.app.services.partitions import (
+    add_months,
+    drop_expired_partitions,
+    ensure_partitions,
+    list_partitions,
+    month_start,
+    partition_name,
+    purge_expired_keys,
+)
+
+postgres_only = pytest.mark.skipif(engine.dialect.name != 'postgresql', reason='partitioning needs Postgres')
+sqlite_only = pytest.mark.skipif(engine.dialect.name != 'sqlite', reason='checks the SQLite query plan')
+
+
+def add_key(message_id: str, created_at: datetime) -> None:
+    with engine.begin() as conn:
+        conn.execute(ProcessedEmailKey.__table__.insert().values(gmail_message_id=message_id, created_at=created_at))
+
+
+def remaining_keys() -> set[str]:
+    with engine.connect() as conn:
+        return set(conn.scalars(select(ProcessedEmailKey.gmail_message_id)))
+
+
+@sqlite_only
+@pytest.mark.parametrize(
+    ('relevant', 'index'),
+    [(None, 'ix_processed_emails_user_created'), (True, 'ix_processed_emails_user_relevant_created')],
+)
+def test_history_pages_are_read_in_index_order(relevant, index):
+    stmt = history_query(1, relevant=relevant, after=(datetime(2024, 6, 1), 100)).limit(50)
+    compiled = stmt.compile(engine)
+    params = tuple(compiled.params[name] for name in compiled.positiontup)
+    with engine.connect() as conn:
+        plan = ' | '.join(row[-1] for row in conn.exec_driver_sql(f'EXPLAIN QUERY PLAN {compiled}', params))
+
+    assert f'USING INDEX {index}' in plan
+    assert 'TEMP B-TREE' not in plan
+
+
+def test_purge_expired_keys_only_touches_the_given_range():
+    add_key('before', datetime(2024, 1, 31, 23, 59, 59))
+    add_key('inside', datetime(2024, 2, 1))
+    add_key('end', datetime(2024, 3, 1))
+
+    assert purge_expired_keys(engine, datetime(2024, 2, 1), datetime(2024, 3, 1)) == 1
+    assert remaining_keys() == {'before', 'end'}
+
+
+@pytest.fixture
+def months() -> dict[str, datetime]:
+    current = month_start(datetime.utcnow())
+    return {'expired': add_months(current, -3), 'boundary': add_months(current, -1), 'current': current}
+
+
+@pytest.fixture
+def partitioned_table(account, months):
+    with engine.begin() as conn:
+        conn.execute(text('DROP TABLE processed_emails'))
+        conn.execute(
+            text(
+                'CREATE TABLE processed_emails (id SERIAL, user_id INTEGER NOT NULL REFERENCES users (id), '
+                'gmail_message_id VARCHAR(128) NOT NULL, subject VARCHAR(512), sender VARCHAR(512), snippet TEXT, '
+                'is_relevant BOOLEAN NOT NULL, is_spam BOOLEAN NOT NULL DEFAULT false, forwarded_to VARCHAR(255), '
+                'whatsapp_notified BOOLEAN NOT NULL, created_at TIMESTAMP WITHOUT TIME ZONE NOT NULL, '
+                'PRIMARY KEY (id, created_at)) PARTITION BY RANGE (created_at)'
+            )
+        )
+        conn.execute(text('CREATE TABLE processed_emails_default PARTITION OF processed_emails DEFAULT'))
+    month = months['expired']
+    while month < months['current']:
+        with engine.begin() as conn:
+            conn.execute(
+                text(
+                    f'CREATE TABLE {partition_name(month)} PARTITION OF processed_emails '
+                    f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{add_months(month, 1):%Y-%m-%d}')"
+                )
+            )
+        month = add_months(month, 1)
+    ensure_partitions(engine, ahead_months=1)
+
+    for label, month in months.items():
+        created_at = month + timedelta(days=1)
+        with engine.begin() as conn:
+            conn.execute(
+                text(
+                    'INSERT INTO processed_emails (user_id, gmail_message_id, is_relevant, whatsapp_notified, '
+                    'created_at) VALUES (:user_id, :message_id, false, false, :created_at)'
+                ),
+                {'user_id': account.user_id, 'message_id': label, 'created_at': created_at},
+            )
+        add_key(label, created_at)
+
+
+def retention_days_mid(month: datetime) -> int:
+    return (datetime.utcnow() - (month + timedelta(days=15))).days
+
+
+@postgres_only
+def test_drop_expired_partitions_detaches_with_a_default_partition(partitioned_table, months):
+    dropped = drop_expired_partitions(engine, retention_days=retention_days_mid(months['boundary']))
+
+    assert dropped == [partition_name(months['expired']), partition_name(add_months(months['expired'], 1))]
+    assert partition_name(months['boundary']) in list_partitions(engine)
+    with engine.connect() as conn:
+        assert conn.scalar(text("SELECT to_regclass('processed_emails_default')")) is not None
+        assert set(conn.scalars(text('SELECT gmail_message_id FROM processed_emails'))) == {'boundary', 'current'}
+    assert remaining_keys() == {'boundary', 'current'}
+
+
+@postgres_only
+def test_keys_survive_when_the_drop_fails(partitioned_table, months, monkeypatch):
+    monkeypatch.setattr(partitions, 'LOCK_TIMEOUT', '50ms')
+
+    with engine.connect() as reader:
+        reader.execute(text('SELECT count(*) FROM processed_emails'))
+        dropped = drop_expired_partitions(engine, retention_days=retention_days_mid(months['boundary']))
+        reader.rollback()
+
+    assert dropped == []
+    assert remaining_keys() == {'expired', 'boundary', 'current'}
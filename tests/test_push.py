@@ -0,0 +1,187 @@
+import base64
+import json
+import time
+from types import SimpleNamespace
+
+import pytest
+from fastapi.testclient import TestClient
+
+from backend.app.auth import create_oauth_state_token
+from backend.app.config import settings
+from backend.app.main import app
+from backend.app.models import GmailAccount
+from backend.app.routers import auth as auth_router
+from backend.app.services import push_auth
+from backend.app.services.scheduler import polling_scheduler
+
+PUSH_TOKEN = 'push-secret'
+AUDIENCE = 'https://api.example.com/push/gmail'
+PUSH_SENDER = 'gmail-push@project.iam.gserviceaccount.com'
+
+
+@pytest.fixture
+def client() -> TestClient:
+    return TestClient(app)
+
+
+@pytest.fixture
+def polls(monkeypatch) -> list[int]:
+    requested: list[int] = []
+    monkeypatch.setattr(settings, 'GMAIL_PUSH_ENABLED', True)
+    monkeypatch.setattr(settings, 'GMAIL_PUSH_TOKEN', PUSH_TOKEN)
+    monkeypatch.setattr(polling_scheduler, 'request_poll', lambda account_id, delay: requested.append(account_id))
+    return requested
+
+
+def notification(email_address: str, history_id: int) -> dict:
+    data = json.dumps({'emailAddress': email_address, 'historyId': history_id}).encode()
+    return {'message': {'data': base64.b64encode(data).decode(), 'messageId': '1'}}
+
+
+def push(client: TestClient, body: dict, token: str = PUSH_TOKEN, headers: dict | None = None):
+    return client.post('/push/gmail', params={'token': token}, json=body, headers=headers)
+
+
+@pytest.fixture(scope='module')
+def signing_keys() -> dict[str, tuple[str, str]]:
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric import rsa
+
+    keys = {}
+    for key_id in ('old', 'new'):
+        key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        private = key.private_bytes(
+            serialization.Encoding.PEM,
+            serialization.PrivateFormat.PKCS8,
+            serialization.NoEncryption(),
+        ).decode()
+        public = key.public_key().public_bytes(
+            serialization.Encoding.PEM,
+            serialization.PublicFormat.SubjectPublicKeyInfo,
+        ).decode()
+        keys[key_id] = (private, public)
+    return keys
+
+
+@pytest.fixture
+def published_certs(polls, signing_keys, monkeypatch) -> dict[str, str]:
+    certs = {'old': signing_keys['old'][1]}
+    monkeypatch.setattr(settings, 'GMAIL_PUSH_TOKEN', '')
+    monkeypatch.setattr(settings, 'GMAIL_PUSH_AUDIENCE', AUDIENCE)
+    monkeypatch.setattr(settings, 'GMAIL_PUSH_SERVICE_ACCOUNT', PUSH_SENDER)
+    monkeypatch.setattr(push_auth, 'fetch_google_certs', lambda: dict(certs))
+    monkeypatch.setattr(push_auth, 'google_certs', push_auth.GoogleCerts(3600, 0))
+    return certs
+
+
+def oidc_headers(signing_keys, key_id: str = 'old', **claims) -> dict[str, str]:
+    from google.auth import crypt, jwt
+
+    now = int(time.time())
+    payload = {
+        'iss': 'https://accounts.google.com',
+        'aud': AUDIENCE,
+        'email': PUSH_SENDER,
+        'email_verified': True,
+        'iat': now,
+        'exp': now + 600,
+        **claims,
+    }
+    signer = crypt.RSASigner.from_string(signing_keys[key_id][0], key_id=key_id)
+    return {'Authorization': f'Bearer {jwt.encode(signer, payload).decode()}'}
+
+
+def test_push_maps_the_gmail_mailbox_address_to_its_account(client, account, polls):
+    response = push(client, notification('owner.mailbox@gmail.com', 10))
+
+    assert response.json() == {'status': 'queued'}
+    assert polls == [account.id]
+
+
+def test_push_for_the_login_email_or_an_unknown_mailbox_is_ignored(client, account, polls):
+    assert push(client, notification('owner@example.com', 10)).json() == {'status': 'ignored'}
+    assert push(client, notification('someone@gmail.com', 10)).json() == {'status': 'ignored'}
+    assert polls == []
+
+
+def test_push_older_than_the_stored_history_is_up_to_date(client, db, account, polls):
+    account.history_id = '50'
+    db.commit()
+
+    assert push(client, notification('owner.mailbox@gmail.com', 50)).json() == {'status': 'up to date'}
+    assert push(client, notification('owner.mailbox@gmail.com', 51)).json() == {'status': 'queued'}
+    assert polls == [account.id]
+
+
+def test_oauth_callback_stores_the_gmail_profile_address(client, db, account, monkeypatch):
+    credentials = SimpleNamespace(
+        token='new-token',
+        expiry=None,
+        refresh_token='refresh',
+        token_uri='https://oauth2.googleapis.com/token',
+        client_id='client',
+        client_secret='secret',
+        scopes=None,
+    )
+    flow = SimpleNamespace(fetch_token=lambda code: None, credentials=credentials)
+    monkeypatch.setattr(auth_router, 'build_gmail_flow', lambda state: flow)
+    monkeypatch.setattr(auth_router, 'fetch_gmail_address', lambda account, creds: 'new.mailbox@gmail.com')
+    state = create_oauth_state_token(account.user_id, 'owner@example.com')
+
+    response = client.get('/auth/gmail/callback', params={'code': 'c', 'state': state})
+
+    assert response.json() == {'status': 'gmail connected'}
+    db.expire_all()
+    stored = db.get(GmailAccount, account.id)
+    assert (stored.gmail_email, stored.access_token) == ('new.mailbox@gmail.com', 'new-token')
+
+
+def test_push_is_rejected_when_no_authentication_is_configured(client, account, polls, monkeypatch):
+    monkeypatch.setattr(settings, 'GMAIL_PUSH_TOKEN', '')
+
+    response = push(client, notification('owner.mailbox@gmail.com', 10), token='')
+
+    assert response.status_code == 503
+    assert polls == []
+
+
+@pytest.mark.parametrize('token', ['', 'wrong', 'push-sécret'])
+def test_push_with_a_wrong_token_is_forbidden(client, account, polls, token):
+    assert push(client, notification('owner.mailbox@gmail.com', 10), token=token).status_code == 403
+    assert polls == []
+
+
+def test_push_with_a_valid_oidc_jwt_is_accepted(client, account, published_certs, signing_keys, polls):
+    response = push(client, notification('owner.mailbox@gmail.com', 10), token='', headers=oidc_headers(signing_keys))
+
+    assert response.json() == {'status': 'queued'}
+    assert polls == [account.id]
+
+
+@pytest.mark.parametrize(
+    'claims',
+    [
+        {'aud': 'https://elsewhere.example.com'},
+        {'iss': 'https://evil.example.com'},
+        {'email': 'someone@project.iam.gserviceaccount.com'},
+        {'email_verified': False},
+        {'iat': int(time.time()) - 7200, 'exp': int(time.time()) - 3600},
+    ],
+    ids=['audience', 'issuer', 'sender', 'unverified', 'expired'],
+)
+def test_push_with_a_bad_oidc_jwt_is_forbidden(client, account, published_certs, signing_keys, polls, claims):
+    headers = oidc_headers(signing_keys, **claims)
+
+    assert push(client, notification('owner.mailbox@gmail.com', 10), token='', headers=headers).status_code == 403
+    assert push(client, notification('owner.mailbox@gmail.com', 10), token='').status_code == 403
+    assert polls == []
+
+
+def test_push_jwt_signed_with_a_rotated_key_refetches_the_certs(client, account, published_certs, signing_keys, polls):
+    headers = oidc_headers(signing_keys, key_id='new')
+    assert push(client, notification('owner.mailbox@gmail.com', 10), token='', headers=headers).status_code == 403
+
+    published_certs['new'] = signing_keys['new'][1]
+
+    assert push(client, notification('owner.mailbox@gmail.com', 11), token='', headers=headers).status_code == 200
+    assert polls == [account.id]
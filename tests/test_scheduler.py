@@ -0,0 +1,36 @@
+import time
+
+from backend.app.services import scheduler as scheduler_module
+from backend.app.services.scheduler import PollingScheduler
+
+
+def settle(scheduler: PollingScheduler, timeout: float = 5.0) -> None:
+    deadline = time.monotonic() + timeout
+    while scheduler.in_flight and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+def test_push_poll_survives_mailbox_lock_contention(account, monkeypatch):
+    polled: list[int] = []
+
+    def process(db, account, batch_size, incremental):
+        polled.append(account.id)
+        return {'processed': 0}
+
+    scheduler = PollingScheduler(process=process, min_interval=0.0, periodic=False)
+    monkeypatch.setattr(scheduler_module, 'lock_mailbox', lambda db, account_id: False)
+    try:
+        scheduler.request_poll(account.id)
+        assert scheduler.dispatch() == 1
+        settle(scheduler)
+        schedule = scheduler.schedules[account.id]
+        assert polled == []
+        assert schedule.next_poll_at != float('inf')
+
+        monkeypatch.setattr(scheduler_module, 'lock_mailbox', lambda db, account_id: True)
+        assert scheduler.dispatch() == 1
+        settle(scheduler)
+        assert polled == [account.id]
+        assert schedule.next_poll_at == float('inf')
+    finally:
+        scheduler.stop()
@@ -0,0 +1,28 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from backend.app import main
+
+
+@pytest.fixture
+def pool_starts(monkeypatch) -> list[int]:
+    starts: list[int] = []
+    monkeypatch.setattr(main.classifier_pool, 'processes', 2)
+    monkeypatch.setattr(main.classifier_pool, 'start', lambda: starts.append(main.classifier_pool.processes))
+    return starts
+
+
+def test_startup_does_not_spawn_classifier_workers(pool_starts):
+    with TestClient(main.app) as client:
+        assert client.get('/health').json() == {'status': 'ok'}
+
+    assert pool_starts == []
+
+
+def test_warm_up_spawns_classifier_workers(pool_starts, monkeypatch):
+    for name in ('warm_agents', 'warm_gmail_client', 'twilio_session'):
+        monkeypatch.setattr(main, name, lambda: None)
+
+    main.warm_up()
+
+    assert pool_starts == [2]
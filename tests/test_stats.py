@@ -0,0 +1,98 @@
+import pytest
+from sqlalchemy import delete, select
+
+from backend.app.models import ProcessedEmail, UserDailyStats, UserSenderStats, UserStats
+from backend.app.services.email_processor import process_messages
+from backend.app.services.stats import backfill_spam_flags, rebuild_rollups
+from tests.factories import gmail_message
+
+
+def rollups(db) -> tuple:
+    db.expire_all()
+    totals = db.execute(select(UserStats.user_id, UserStats.processed, UserStats.relevant, UserStats.spam)).all()
+    daily = db.execute(
+        select(UserDailyStats.day, UserDailyStats.processed, UserDailyStats.relevant, UserDailyStats.spam)
+    ).all()
+    senders = db.execute(
+        select(UserSenderStats.sender, UserSenderStats.processed, UserSenderStats.relevant).order_by(
+            UserSenderStats.sender
+        )
+    ).all()
+    return sorted(totals), sorted(daily), senders
+
+
+@pytest.fixture
+def processed(db, account):
+    process_messages(
+        db,
+        account,
+        [
+            gmail_message('lead', 'Pricing for 40 seats', sender='buyer@example.com'),
+            gmail_message('spam', 'You are a lottery winner', sender='prince@example.com'),
+            gmail_message('news', 'Weekly newsletter', sender='buyer@example.com'),
+        ],
+    )
+    db.commit()
+
+
+def test_processing_updates_the_rollups(db, account, processed):
+    totals, daily, senders = rollups(db)
+
+    assert totals == [(account.user_id, 3, 1, 1)]
+    assert [row[1:] for row in daily] == [(3, 1, 1)]
+    assert senders == [('buyer@example.com', 2, 1), ('prince@example.com', 1, 0)]
+    assert db.scalar(select(ProcessedEmail.is_spam).where(ProcessedEmail.gmail_message_id == 'spam')) is True
+
+
+def test_rebuild_matches_the_incremental_rollups_including_spam(db, account, processed):
+    incremental = rollups(db)
+
+    rebuild_rollups(db)
+    db.commit()
+
+    assert rollups(db) == incremental
+
+
+def test_rebuild_drops_counts_for_deleted_rows(db, account, processed):
+    db.execute(delete(ProcessedEmail).where(ProcessedEmail.gmail_message_id == 'spam'))
+    rebuild_rollups(db)
+    db.commit()
+
+    totals, daily, senders = rollups(db)
+    assert totals == [(account.user_id, 2, 1, 0)]
+    assert senders == [('buyer@example.com', 2, 1)]
+
+
+def test_backfill_derives_spam_for_rows_stored_without_a_verdict(db, account):
+    db.add_all(
+        [
+            ProcessedEmail(user_id=account.user_id, gmail_message_id='old-spam', subject='Casino bonus', snippet=''),
+            ProcessedEmail(user_id=account.user_id, gmail_message_id='old-news', subject='Weekly', snippet='Updates'),
+            ProcessedEmail(
+                user_id=account.user_id, gmail_message_id='old-lead', subject='Demo', snippet='', is_relevant=True
+            ),
+        ]
+    )
+    db.commit()
+
+    assert backfill_spam_flags(db) == 1
+    rebuild_rollups(db)
+    db.commit()
+
+    totals, _, _ = rollups(db)
+    assert totals == [(account.user_id, 3, 1, 1)]
+
+
+def test_backfill_keeps_spam_that_was_only_detectable_in_the_body(db, account):
+    message = gmail_message('body-spam', 'Quick hello', sender='promo@example.com')
+    message['body'] = 'Claim your casino bonus today'
+    process_messages(db, account, [message])
+    db.commit()
+
+    backfill_spam_flags(db)
+    rebuild_rollups(db)
+    db.commit()
+
+    assert db.scalar(select(ProcessedEmail.is_spam).where(ProcessedEmail.gmail_message_id == 'body-spam')) is True
+    totals, _, _ = rollups(db)
+    assert totals == [(account.user_id, 1, 0, 1)]
@@ -0,0 +1,53 @@
+from types import SimpleNamespace
+
+import pytest
+import requests
+
+from backend.app.config import settings
+from backend.app.services import whatsapp
+from backend.app.services.rate_limit import SendOutcomeUnknownError, twilio_breaker
+from backend.app.services.whatsapp import send_whatsapp_summary
+
+
+class FakeSession:
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)
+        self.posts = 0
+
+    def post(self, url, **kwargs):
+        self.posts += 1
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return SimpleNamespace(status_code=outcome, ok=outcome < 400, headers={})
+
+
+@pytest.fixture(autouse=True)
+def twilio(monkeypatch):
+    for name in ('TWILIO_ACCOUNT_SID', 'TWILIO_AUTH_TOKEN', 'TWILIO_WHATSAPP_FROM', 'TWILIO_WHATSAPP_TO'):
+        monkeypatch.setattr(settings, name, 'configured')
+    monkeypatch.setattr(settings, 'RATE_LIMIT_BACKOFF_BASE_SECONDS', 0.0)
+    yield
+    twilio_breaker.record_success()
+
+
+def use_session(monkeypatch, session: FakeSession) -> FakeSession:
+    monkeypatch.setattr(whatsapp, 'twilio_session', lambda: session)
+    return session
+
+
+@pytest.mark.parametrize('outcome', [requests.ReadTimeout('read timed out'), 500, 503])
+def test_send_is_not_retried_once_twilio_may_have_accepted_it(monkeypatch, outcome):
+    session = use_session(monkeypatch, FakeSession(outcome, 201))
+
+    with pytest.raises(SendOutcomeUnknownError):
+        send_whatsapp_summary('New lead')
+    assert session.posts == 1
+
+
+@pytest.mark.parametrize('outcome', [requests.ConnectTimeout('connect timed out'), requests.ConnectionError(), 429])
+def test_send_is_retried_when_twilio_did_not_take_it(monkeypatch, outcome):
+    session = use_session(monkeypatch, FakeSession(outcome, 201))
+
+    assert send_whatsapp_summary('New lead') is True
+    assert session.posts == 2